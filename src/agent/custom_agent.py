@@ -8,6 +8,7 @@ import pdb
 import platform
 import time
 import traceback
+from dataclasses import replace
 from typing import (
     Any,
     Awaitable,
@@ -19,6 +20,7 @@ from typing import (
     Type,
     TypeVar,
 )
+from urllib.parse import urlsplit
 
 from browser_use.agent.gif import create_history_gif
 from browser_use.agent.message_manager.utils import (
@@ -43,7 +45,9 @@ from browser_use.agent.views import (
 from browser_use.browser.browser import Browser
 from browser_use.browser.context import BrowserContext
 from browser_use.browser.views import BrowserState, BrowserStateHistory
+from browser_use.controller.registry.views import ActionModel
 from browser_use.controller.service import Controller
+from browser_use.dom.history_tree_processor.view import DOMHistoryElement
 from browser_use.telemetry.views import (
     AgentEndTelemetryEvent,
     AgentRunTelemetryEvent,
@@ -54,11 +58,20 @@ from json_repair import repair_json
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from PIL import Image, ImageDraw, ImageFont
+from pydantic import ValidationError
 
 from src.utils.agent_state import AgentState
+from src.utils.element_serializer import ElementSerializationSettings
+from src.utils.llm import DeepSeekR1ChatOllama, DeepSeekR1ChatOpenAI
+from src.utils.llm_cache import cached_ainvoke
+from src.utils.screenshot_processing import ScreenshotSettings, hash_distance, perceptual_hash
+from src.utils.step_profiler import Span, StepProfiler
+from src.utils.stream_json import StreamingActionParser
 
 from .custom_message_manager import CustomMessageManager, CustomMessageManagerSettings
 from .custom_views import CustomAgentOutput, CustomAgentState, CustomAgentStepInfo
+from .history_replay import ReplayReport, find_replay_element, urls_match
+from .plan_cache import PlanCache, action_signature, get_plan_cache
 
 logger = logging.getLogger(__name__)
 
@@ -113,6 +126,18 @@ class CustomAgent(Agent):
             page_extraction_llm: Optional[BaseChatModel] = None,
             planner_llm: Optional[BaseChatModel] = None,
             planner_interval: int = 1,  # Run planner every N steps
+            # Vision screenshot resizing / re-encoding, SCREENSHOT_* env vars by default
+            screenshot_settings: Optional[ScreenshotSettings] = None,
+            # Compact / diff serialization of interactive elements, ELEMENTS_* env vars by default
+            element_settings: Optional[ElementSerializationSettings] = None,
+            # Extract the next browser state in the background after actions run, AGENT_PREFETCH_STATE by default
+            prefetch_state: Optional[bool] = None,
+            # Stream the model output and run each action as soon as it is complete, AGENT_STREAM_ACTIONS by default
+            stream_actions: Optional[bool] = None,
+            # Reuse actions that succeeded before on the same task and page, AGENT_PLAN_CACHE* env vars by default
+            plan_cache: Optional[PlanCache] = None,
+            # Timing spans of the step phases, sinks from AGENT_PROFILE_SINKS by default
+            profiler: Optional[StepProfiler] = None,
             # Inject state
             injected_agent_state: Optional[AgentState] = None,
             context: Context | None = None,
@@ -151,6 +176,24 @@ class CustomAgent(Agent):
         )
         self.state = injected_agent_state or CustomAgentState()
         self.add_infos = add_infos
+        screenshot_settings = screenshot_settings or ScreenshotSettings.from_env()
+        if screenshot_settings.viewport is None and self.browser_context is not None:
+            window_size = self.browser_context.config.browser_window_size
+            screenshot_settings = replace(screenshot_settings,
+                                          viewport=(window_size["width"], window_size["height"]))
+        self.screenshot_settings = screenshot_settings
+        if prefetch_state is None:
+            prefetch_state = os.getenv("AGENT_PREFETCH_STATE", "false").lower() == "true"
+        # a prefetched state is only used if the DOM tracker confirms it is still current,
+        # so without the state cache (BROWSER_INCREMENTAL_STATE off) there is nothing to prefetch
+        self.prefetch_state = prefetch_state and getattr(self.browser_context, "state_cache", None) is not None
+        self._state_prefetch: Optional[asyncio.Task] = None
+        if stream_actions is None:
+            stream_actions = os.getenv("AGENT_STREAM_ACTIONS", "false").lower() == "true"
+        # the deepseek reasoner wrappers only implement ainvoke
+        self.stream_actions = stream_actions and not isinstance(llm, (DeepSeekR1ChatOpenAI, DeepSeekR1ChatOllama))
+        self.plan_cache = plan_cache if plan_cache is not None else get_plan_cache()
+        self.profiler = profiler or StepProfiler(labels={"model": self.model_name})
         self._message_manager = CustomMessageManager(
             task=task,
             system_message=self.settings.system_prompt_class(
@@ -163,11 +206,66 @@ class CustomAgent(Agent):
                 message_context=self.settings.message_context,
                 sensitive_data=sensitive_data,
                 available_file_paths=self.settings.available_file_paths,
-                agent_prompt_class=agent_prompt_class
+                agent_prompt_class=agent_prompt_class,
+                screenshot_settings=screenshot_settings,
+                element_settings=element_settings or ElementSerializationSettings.from_env(),
             ),
             state=self.state.message_manager_state,
         )
 
+    def _start_state_prefetch(self):
+        """Start extracting the next state while the step bookkeeping and callbacks run"""
+        if self.prefetch_state:
+            self._cancel_state_prefetch()
+            self._state_prefetch = asyncio.create_task(self.browser_context.get_state())
+
+    def _cancel_state_prefetch(self):
+        prefetch, self._state_prefetch = self._state_prefetch, None
+        if prefetch is not None and not prefetch.done():
+            prefetch.cancel()
+
+    async def _get_browser_state(self) -> BrowserState:
+        """The prefetched state if the page hasn't changed since it was extracted, otherwise a fresh one"""
+        prefetch, self._state_prefetch = self._state_prefetch, None
+        if prefetch is not None:
+            try:
+                state = await prefetch
+                if await self.browser_context.is_state_current(state):
+                    logger.debug("Using prefetched browser state")
+                    return state
+            except Exception as e:
+                logger.debug(f"Prefetched browser state is unusable: {e}")
+        return await self.browser_context.get_state()
+
+    def _screenshot_unchanged(self, state: BrowserState) -> bool:
+        """
+        Whether the screenshot looks like the last one sent to the model (same url and a
+        perceptual hash within the threshold), in which case the step sends a text note instead.
+        Only skipped while that screenshot is still in the history: when `step` removes the
+        state message after the model call, the message manager keeps its image until a new
+        screenshot is sent.
+        """
+        settings = self.screenshot_settings
+        if not (self.settings.use_vision and state.screenshot and settings.skip_unchanged):
+            return False
+        screenshot_hash = perceptual_hash(state.screenshot)
+        last_sent = self.state.last_screenshot_hash
+        if (screenshot_hash is not None and last_sent is not None and last_sent[1] == state.url
+                and self.message_manager.screenshot_in_history()
+                and hash_distance(screenshot_hash, last_sent[0]) <= settings.unchanged_threshold
+                and self.state.consecutive_screenshots_skipped < settings.max_skipped):
+            self.state.consecutive_screenshots_skipped += 1
+            self.state.screenshots_skipped += 1
+            self.state.screenshot_tokens_saved += self.message_manager.settings.image_tokens
+            logger.info(f"🖼️ Screen unchanged, screenshot skipped ({self.state.screenshots_skipped} skipped, "
+                        f"~{self.state.screenshot_tokens_saved} tokens saved)")
+            return True
+        # compare later screenshots with this one
+        self.state.last_screenshot_hash = (screenshot_hash, state.url) if screenshot_hash is not None else None
+        self.state.consecutive_screenshots_skipped = 0
+        self.state.screenshots_sent += 1
+        return False
+
     def _log_response(self, response: CustomAgentOutput) -> None:
         """Log the model's response"""
         if "Success" in response.current_state.evaluation_previous_goal:
@@ -233,7 +331,12 @@ class CustomAgent(Agent):
             elif not message.content.startswith("You are an AI agent designed to automate"):
                 logger.info(f"message: {message.content}")
 
-        ai_message = self.llm.invoke(input_messages)
+        with self.profiler.span("llm"):
+            ai_message = await self.llm.ainvoke(input_messages)
+        return self._parse_model_output(ai_message)
+
+    def _parse_model_output(self, ai_message: BaseMessage) -> AgentOutput:
+        """Add the model's message to the history and parse it into an AgentOutput"""
         self.message_manager._add_message_with_tokens(ai_message)
 
         if hasattr(ai_message, "reasoning_content"):
@@ -247,19 +350,13 @@ class CustomAgent(Agent):
             ai_content = ai_message.content
         logger.info(f"ai_response: {ai_content}")
 
-        ai_content = ai_content.replace("```json", "").replace("```", "")
-        ai_content = repair_json(ai_content)
-        parsed_json = json.loads(ai_content)
-        # 处理json中action为 one_action_name 的情况
-        if isinstance(parsed_json, dict) and 'action' in parsed_json:
-            actions = parsed_json['action']
-            for i, action in enumerate(actions):
-                if "one_action_name" in action:
-                    actions[i] = {"user_login_helper": {}}
-                    parsed_json['action'] = actions
-                    logger.info(f"处理后的action: {parsed_json}")
-                    break
-        parsed: AgentOutput = self.AgentOutput(**parsed_json)
+        with self.profiler.span("parse"):
+            ai_content = ai_content.replace("```json", "").replace("```", "")
+            ai_content = repair_json(ai_content)
+            parsed_json = json.loads(ai_content)
+            if isinstance(parsed_json, dict) and 'action' in parsed_json:
+                parsed_json['action'] = [self._normalize_action(action) for action in parsed_json['action']]
+            parsed: AgentOutput = self.AgentOutput(**parsed_json)
 
         if parsed is None:
             logger.debug(ai_message.content)
@@ -271,6 +368,117 @@ class CustomAgent(Agent):
         self._log_response(parsed)
         return parsed
 
+    @staticmethod
+    def _normalize_action(action):
+        # 处理json中action为 one_action_name 的情况
+        if isinstance(action, dict) and "one_action_name" in action:
+            logger.info(f"处理后的action: {action} -> user_login_helper")
+            return {"user_login_helper": {}}
+        return action
+
+    @time_execution_async("--get_next_action_streaming")
+    async def get_next_action_streaming(self, input_messages: list[BaseMessage]) -> tuple[AgentOutput, list[ActionResult]]:
+        """
+        Stream the model output and execute each action as soon as its JSON is complete, while the
+        rest of the output is still being generated. Returns the full output and the action results.
+        If the stream or the parse fails after actions ran, their results are kept in
+        `self.state.last_result` before the error is raised.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        acting = asyncio.create_task(self._act_from_queue(queue))
+        try:
+            parser = StreamingActionParser()
+            dispatched = 0
+            early_dispatch = True
+            content = ""
+            # the actions dispatched meanwhile have their own spans
+            with self.profiler.span("llm"):
+                async for chunk in self.llm.astream(input_messages):
+                    text = self._chunk_text(chunk)
+                    content += text
+                    for action in parser.feed(text):
+                        if not early_dispatch or dispatched >= self.settings.max_actions_per_step:
+                            break
+                        try:
+                            queue.put_nowait(self.ActionModel(**self._normalize_action(action)))
+                            dispatched += 1
+                        except ValidationError as e:
+                            # later actions must not run before this one, leave them to the full parse
+                            logger.debug(f"Streamed action {action} is invalid, waiting for the full output: {e}")
+                            early_dispatch = False
+
+            model_output = self._parse_model_output(AIMessage(content=content))
+            for action in model_output.action[dispatched:]:
+                queue.put_nowait(action)
+        except Exception:
+            queue.put_nowait(None)
+            # let a running action finish instead of cancelling it halfway
+            results = await acting
+            if results:
+                # the page already changed, the next step has to know what was done
+                self.state.last_result = results
+            raise
+        queue.put_nowait(None)
+        results = await acting
+        return model_output, results
+
+    @staticmethod
+    def _chunk_text(chunk: BaseMessage) -> str:
+        if isinstance(chunk.content, str):
+            return chunk.content
+        return "".join(item.get("text", "") if isinstance(item, dict) else str(item) for item in chunk.content)
+
+    async def multi_act(
+            self,
+            actions: list[ActionModel],
+            check_for_new_elements: bool = True,
+    ) -> list[ActionResult]:
+        """Execute multiple actions, each timed in its own span"""
+        queue: asyncio.Queue = asyncio.Queue()
+        for action in actions:
+            queue.put_nowait(action)
+        queue.put_nowait(None)
+        return await self._act_from_queue(queue, check_for_new_elements)
+
+    async def _act_from_queue(self, queue: asyncio.Queue, check_for_new_elements: bool = True) -> list[ActionResult]:
+        """multi_act for actions that arrive one by one, ends at a None item"""
+        results = []
+        cached_selector_map = await self.browser_context.get_selector_map()
+        cached_path_hashes = set(e.hash.branch_path_hash for e in cached_selector_map.values())
+        await self.browser_context.remove_highlights()
+
+        i = 0
+        while (action := await queue.get()) is not None:
+            if i != 0:
+                await asyncio.sleep(self.browser_context.config.wait_between_actions)
+                if action.get_index() is not None:
+                    new_state = await self.browser_context.get_state()
+                    new_path_hashes = set(e.hash.branch_path_hash for e in new_state.selector_map.values())
+                    if check_for_new_elements and not new_path_hashes.issubset(cached_path_hashes):
+                        # next action requires index but there are new elements on the page
+                        msg = f'Something new appeared after action {i}'
+                        logger.info(msg)
+                        results.append(ActionResult(extracted_content=msg, include_in_memory=True))
+                        break
+
+            await self._raise_if_stopped_or_paused()
+            action_name = next(iter(action.model_dump(exclude_unset=True)), 'unknown')
+            with self.profiler.span(f"action:{action_name}"):
+                result = await self.controller.act(
+                    action,
+                    self.browser_context,
+                    self.settings.page_extraction_llm,
+                    self.sensitive_data,
+                    self.settings.available_file_paths,
+                    context=self.context,
+                )
+            results.append(result)
+            logger.debug(f'Executed action {i + 1}')
+            i += 1
+            if result.is_done or result.error:
+                break
+        return results
+
     async def _run_planner(self) -> Optional[str]:
         """Run the planner to analyze state and suggest next steps"""
         # Skip planning if no planner_llm is set
@@ -298,8 +506,8 @@ class CustomAgent(Agent):
 
             planner_messages[-1] = HumanMessage(content=new_msg)
 
-        # Get planner output
-        response = await self.settings.planner_llm.ainvoke(planner_messages)
+        # Get planner output, from the response cache when the planner runs at temperature 0
+        response = await cached_ainvoke(self.settings.planner_llm, planner_messages)
         plan = str(response.content)
         last_state_message = self.message_manager.get_messages()[-1]
         if isinstance(last_state_message, HumanMessage):
@@ -330,15 +538,12 @@ class CustomAgent(Agent):
     @time_execution_async("--step")
     async def step(self, step_info: Optional[CustomAgentStepInfo] = None) -> None:
         """Execute one step of the agent's reasoning process and actions."""
-        global _global_agent_state
-        
         # 检查是否处于用户接管状态
         if self.state.is_user_control_active():
             logger.info("当前处于用户接管状态,暂停AI操作")
-            # 等待用户完成操作
-            while self.state.is_user_control_active():
-                await asyncio.sleep(0.5)  # 每0.5秒检查一次状态
-            logger.info("用户操作已完成,继续AI操作")
+            # 等待用户完成操作（或停止请求），由状态变化直接唤醒
+            if await self.state.wait_for_user_control_finished():
+                logger.info("用户操作已完成,继续AI操作")
             return
 
         # 检查是否有建议操作
@@ -369,30 +574,58 @@ class CustomAgent(Agent):
 
         # Check if any external stopping condition
         if self.state.is_stop_requested():
-            await self._check_if_should_stop()
+            self.stop()
+            return
 
         logger.info(f"\n📍 Step {self.state.n_steps}")
+        self.profiler.step = self.state.n_steps
         state = None
         model_output = None
         result: list[ActionResult] = []
         step_start_time = time.time()
         tokens = 0
+        last_result = self.state.last_result
 
         try:
-            state = await self.browser_context.get_state()
+            with self.profiler.span("get_state"):
+                state = await self._get_browser_state()
+                self.profiler.labels["site"] = urlsplit(state.url).netloc
             await self._raise_if_stopped_or_paused()
 
-            self.message_manager.add_state_message(state, self.state.last_action, self.state.last_result, step_info,
-                                                   self.settings.use_vision)
+            with self.profiler.span("prompt"):
+                self.message_manager.add_state_message(state, self.state.last_action, self.state.last_result,
+                                                       step_info, self.settings.use_vision,
+                                                       screenshot_unchanged=self._screenshot_unchanged(state))
+
+                # A plan that succeeded before on this task and page replaces the model call
+                plan_key = None
+                cached_output = None
+                if self.plan_cache is not None:
+                    plan_key = self.plan_cache.make_key(f"{self.task}\n{self.add_infos}", state,
+                                                        self.state.last_action)
+                    cached_output = self.plan_cache.lookup(plan_key, self.AgentOutput)
 
             # Run planner at specified intervals if planner is configured
-            if self.settings.planner_llm and self.state.n_steps % self.settings.planner_interval == 0:
-                await self._run_planner()
-            input_messages = self.message_manager.get_messages()
+            if cached_output is None and self.settings.planner_llm \
+                    and self.state.n_steps % self.settings.planner_interval == 0:
+                with self.profiler.span("planner"):
+                    await self._run_planner()
+            with self.profiler.span("trim_history"):
+                self.message_manager.cut_messages()
+                input_messages = self.message_manager.get_messages()
             tokens = self._message_manager.state.history.current_tokens
 
             try:
-                model_output = await self.get_next_action(input_messages)
+                streamed_result = None
+                if cached_output is not None:
+                    model_output = cached_output
+                    self.message_manager._add_message_with_tokens(
+                        AIMessage(content=model_output.model_dump_json(exclude_unset=True)))
+                    logger.info(f"♻️ Reusing cached plan: {action_signature(model_output.action)}")
+                elif self.stream_actions:
+                    model_output, streamed_result = await self.get_next_action_streaming(input_messages)
+                else:
+                    model_output = await self.get_next_action(input_messages)
                 self.update_step_info(model_output, step_info)
                 self.state.n_steps += 1
 
@@ -413,7 +646,15 @@ class CustomAgent(Agent):
                 self.message_manager._remove_state_message_by_index(-1)
                 raise e
 
-            result: list[ActionResult] = await self.multi_act(model_output.action)
+            if streamed_result is not None:
+                result: list[ActionResult] = streamed_result
+            else:
+                result: list[ActionResult] = await self.multi_act(model_output.action)
+            if plan_key is not None:
+                if any(ret_.error for ret_ in result):
+                    self.plan_cache.record_failure(plan_key, model_output)
+                else:
+                    self.plan_cache.record_success(plan_key, model_output)
             for ret_ in result:
                 if ret_.extracted_content and "Extracted page" in ret_.extracted_content:
                     # record every extracted page
@@ -426,6 +667,8 @@ class CustomAgent(Agent):
                     self.state.extracted_content = step_info.memory
                 result[-1].extracted_content = self.state.extracted_content
                 logger.info(f"📄 Result: {result[-1].extracted_content}")
+            else:
+                self._start_state_prefetch()
 
             self.state.consecutive_failures = 0
 
@@ -441,10 +684,15 @@ class CustomAgent(Agent):
 
         except Exception as e:
             result = await self._handle_step_error(e)
+            if self.state.last_result is not last_result:
+                # actions streamed before the failure did run
+                result = self.state.last_result + result
             self.state.last_result = result
 
         finally:
             step_end_time = time.time()
+            self.profiler.record(Span(name="step", duration=step_end_time - step_start_time, step=self.profiler.step,
+                                      start=step_start_time, labels=dict(self.profiler.labels)))
             actions = [a.model_dump(exclude_unset=True) for a in model_output.action] if model_output else []
             self.telemetry.capture(
                 AgentStepTelemetryEvent(
@@ -520,6 +768,7 @@ class CustomAgent(Agent):
             return self.state.history
 
         finally:
+            self._cancel_state_prefetch()
             self.telemetry.capture(
                 AgentEndTelemetryEvent(
                     agent_id=self.state.agent_id,
@@ -532,6 +781,16 @@ class CustomAgent(Agent):
                     total_duration_seconds=self.state.history.total_duration_seconds(),
                 )
             )
+            if self.state.screenshots_skipped:
+                logger.info(f"🖼️ Screenshots sent: {self.state.screenshots_sent}, skipped as unchanged: "
+                            f"{self.state.screenshots_skipped} (~{self.state.screenshot_tokens_saved} tokens saved)")
+
+            latency = self.profiler.format_summary()
+            if latency:
+                logger.info(f"⏱️ Step latency:\n{latency}")
+
+            if self.plan_cache is not None and self.plan_cache.hits:
+                logger.info(f"♻️ Cached plans reused: {self.plan_cache.hits}, model calls: {self.plan_cache.misses}")
 
             if not self.injected_browser_context:
                 await self.browser_context.close()
@@ -545,3 +804,131 @@ class CustomAgent(Agent):
                     output_path = self.settings.generate_gif
 
                 create_history_gif(task=self.task, history=self.state.history, output_path=output_path)
+
+    async def _update_action_indices(
+            self,
+            historical_element: Optional[DOMHistoryElement],
+            action: ActionModel,
+            current_state: BrowserState,
+    ) -> Optional[ActionModel]:
+        """Point a recorded action at the matching element of the current page, None if it is gone"""
+        if not historical_element:
+            return action
+        element = find_replay_element(historical_element, current_state)
+        if element is None:
+            return None
+        old_index = action.get_index()
+        if old_index != element.highlight_index:
+            action.set_index(element.highlight_index)
+            logger.info(f'Element moved in DOM, updated index from {old_index} to {element.highlight_index}')
+        return action
+
+    async def _resolve_replay_actions(self, history_item: AgentHistory) -> list[ActionModel]:
+        """The actions one recorded step ran, with indices re-resolved against the current page"""
+        state = await self.browser_context.get_state()
+        actions = history_item.model_output.action
+        if history_item.result:
+            # the step may have been cut short, e.g. when new elements appeared
+            actions = actions[:len(history_item.result)]
+        updated_actions = []
+        for i, action in enumerate(actions):
+            interacted = history_item.state.interacted_element
+            historical_element = interacted[i] if i < len(interacted) else None
+            updated_action = await self._update_action_indices(historical_element, action, state)
+            if updated_action is None:
+                raise ValueError(f'Could not find matching element {i} in current page')
+            updated_actions.append(updated_action)
+        return updated_actions
+
+    async def replay(
+            self,
+            history_file: str,
+            verify: bool = True,
+            max_retries: int = 3,
+            retry_delay: float = 1.0,
+            skip_failures: bool = False,
+            delay_between_actions: float = 0.0,
+    ) -> tuple[list[ActionResult], ReplayReport]:
+        """
+        Re-execute a history saved by a previous run without calling the LLM.
+
+        Each recorded step's actions are run through multi_act, with element indices
+        re-resolved against the current page. Only the resolution is retried, up to
+        `max_retries` times while the page settles: actions that ran are never repeated,
+        a step failing while acting is reported as is. With `verify`, the page url after a step is
+        compared with the url recorded at the start of the next step. Without
+        `skip_failures`, the replay stops at the first failing step or url mismatch.
+        """
+        history = AgentHistoryList.load_from_file(history_file, self.AgentOutput)
+        report = ReplayReport(total_steps=len(history.history))
+        results: list[ActionResult] = []
+        start_time = time.time()
+        try:
+            if self.initial_actions:
+                results.extend(await self.multi_act(self.initial_actions, check_for_new_elements=False))
+
+            for i, history_item in enumerate(history.history):
+                if self.state.stopped:
+                    logger.info('Replay stopped')
+                    break
+                if not history_item.model_output or not history_item.model_output.action \
+                        or history_item.model_output.action == [None]:
+                    report.skipped_steps += 1
+                    continue
+
+                step_start = time.time()
+                step_results = None
+                actions = None
+                for attempt in range(1, max_retries + 1):
+                    try:
+                        actions = await self._resolve_replay_actions(history_item)
+                        break
+                    except Exception as e:
+                        if attempt == max_retries:
+                            error = f'Step {i + 1} failed after {max_retries} attempts: {e}'
+                            logger.error(error)
+                            report.errors.append(error)
+                            results.append(ActionResult(error=error))
+                        else:
+                            logger.warning(f'Replay step {i + 1} failed (attempt {attempt}/{max_retries}), retrying...')
+                            await asyncio.sleep(retry_delay)
+                if actions is not None:
+                    try:
+                        step_results = await self.multi_act(actions, check_for_new_elements=False)
+                    except Exception as e:
+                        # some actions may have run, repeating them could submit a form twice
+                        error = f'Step {i + 1} failed: {e}'
+                        logger.error(error)
+                        report.errors.append(error)
+                        results.append(ActionResult(error=error))
+                if step_results is None:
+                    if skip_failures:
+                        continue
+                    break
+
+                results.extend(step_results)
+                report.replayed_steps += 1
+                report.actions += len(step_results)
+                report.step_durations.append(time.time() - step_start)
+                errors = [result.error for result in step_results if result.error]
+                if errors:
+                    report.errors.append(f'Step {i + 1}: {errors[-1]}')
+                if any(result.is_done for result in step_results):
+                    report.skipped_steps += len(history.history) - i - 1
+                    break
+
+                if verify and i + 1 < len(history.history):
+                    expected_url = history.history[i + 1].state.url
+                    current_url = (await self.browser_context.get_current_page()).url
+                    if not urls_match(expected_url, current_url):
+                        mismatch = f'Step {i + 1}: expected {expected_url}, got {current_url}'
+                        logger.warning(f'Replay url mismatch, {mismatch}')
+                        report.url_mismatches.append(mismatch)
+                        if not skip_failures:
+                            break
+                if delay_between_actions:
+                    await asyncio.sleep(delay_between_actions)
+        finally:
+            report.elapsed = time.time() - start_time
+            logger.info(f'🔁 {report.summary()}')
+        return results, report
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 import logging
 from typing import Dict, List, Optional, Type
 
@@ -7,7 +8,12 @@ from browser_use.agent.message_manager.service import (
     MessageManager,
     MessageManagerSettings,
 )
-from browser_use.agent.message_manager.views import MessageHistory, MessageManagerState
+from browser_use.agent.message_manager.views import (
+    ManagedMessage,
+    MessageHistory,
+    MessageManagerState,
+    MessageMetadata,
+)
 from browser_use.agent.prompts import AgentMessagePrompt, SystemPrompt
 from browser_use.agent.views import (
     ActionModel,
@@ -28,13 +34,25 @@ from langchain_core.messages import (
 from langchain_openai import ChatOpenAI
 
 from ..utils.llm import DeepSeekR1ChatOpenAI
+from ..utils.element_serializer import ELEMENTS_REFERENCE_HEADER, ElementSerializationSettings, ElementSerializer
+from ..utils.screenshot_processing import ScreenshotSettings
 from .custom_prompts import CustomAgentMessagePrompt
 
 logger = logging.getLogger(__name__)
 
+SCREENSHOT_PLACEHOLDER = "[screenshot omitted]"
+# the image of a removed state message, kept until a new screenshot is sent
+LAST_SCREENSHOT_HEADER = "Last screenshot sent:"
+COMPACTED_HISTORY_HEADER = "Summary of earlier steps removed from the history:"
+# summary lines kept across compactions, the oldest are dropped first
+MAX_SUMMARY_LINES = 20
+_PINNED_PREFIXES = ("Your ultimate task is", "Your new ultimate task is", ELEMENTS_REFERENCE_HEADER)
+
 
 class CustomMessageManagerSettings(MessageManagerSettings):
     agent_prompt_class: Type[AgentMessagePrompt] = AgentMessagePrompt
+    screenshot_settings: Optional[ScreenshotSettings] = None
+    element_settings: Optional[ElementSerializationSettings] = None
 
 
 class CustomMessageManager(MessageManager):
@@ -51,6 +69,12 @@ class CustomMessageManager(MessageManager):
             settings=settings,
             state=state
         )
+        # the last screenshot sent, and whether the latest state message refers back to it
+        self._last_screenshot_message: Optional[ManagedMessage] = None
+        self._screenshot_referenced = False
+        self.element_serializer = None
+        if self.settings.element_settings is not None:
+            self.element_serializer = ElementSerializer(self.settings.include_attributes, self.settings.element_settings)
 
     def _init_messages(self) -> None:
         """Initialize the message history with system message, context, task, and other initial messages"""
@@ -74,13 +98,108 @@ class CustomMessageManager(MessageManager):
             self._add_message_with_tokens(context_message)
 
     def cut_messages(self):
-        """Get current message list, potentially trimmed to max tokens"""
-        diff = self.state.history.current_tokens - self.settings.max_input_tokens
-        min_message_len = 2 if self.context_content is not None else 1
+        """
+        Compact the history to max_input_tokens in one pass over the stored per-message token counts.
+
+        The system prompt, context and task messages and the latest message are never touched.
+        Older messages first lose their screenshots (replaced by a text placeholder), then the
+        oldest are dropped; the goals and action results of dropped steps are kept as a short
+        summary message in their place.
+        """
+        history = self.state.history
+        budget = self.settings.max_input_tokens
+        total = sum(m.metadata.tokens for m in history.messages)
+        if total <= budget:
+            history.current_tokens = total
+            return
+
+        last = len(history.messages) - 1
+        candidates = [i for i, m in enumerate(history.messages[:last]) if not self._is_pinned(i, m)]
+
+        # 1. screenshots of older messages become placeholders, oldest first
+        for i in candidates:
+            if total <= budget:
+                break
+            total -= self._strip_images(history.messages[i])
+
+        # 2. drop the oldest messages, keeping a summary line for each dropped step
+        dropped = set()
+        summary_lines: List[str] = []
+        summary_tokens = 0
+        for i in candidates:
+            message = history.messages[i].message
+            # a tool message can't outlive the AI message it answers
+            if total + summary_tokens <= budget and not isinstance(message, ToolMessage):
+                break
+            dropped.add(i)
+            total -= history.messages[i].metadata.tokens
+            summary_lines.extend(self._summarize_message(message))
+            summary_lines = summary_lines[-MAX_SUMMARY_LINES:]
+            summary_tokens = self._count_text_tokens(self._summary_content(summary_lines)) if summary_lines else 0
+
+        if dropped:
+            messages = []
+            for i, managed in enumerate(history.messages):
+                if i in dropped:
+                    if i == min(dropped) and summary_lines:
+                        summary = HumanMessage(content=self._summary_content(summary_lines))
+                        messages.append(ManagedMessage(message=summary, metadata=MessageMetadata(tokens=summary_tokens)))
+                    continue
+                messages.append(managed)
+            history.messages = messages
+            logger.info(f"Compacted {len(dropped)} old messages from the agent history")
+
+        history.current_tokens = sum(m.metadata.tokens for m in history.messages)
+        if history.current_tokens > budget:
+            logger.warning(f"Agent history still uses {history.current_tokens} tokens after compaction "
+                           f"(max_input_tokens={budget})")
 
-        while diff > 0 and len(self.state.history.messages) > min_message_len:
-            self.state.history.remove_message(min_message_len)  # always remove the oldest message
-            diff = self.state.history.current_tokens - self.settings.max_input_tokens
+    def _is_pinned(self, index: int, managed: ManagedMessage) -> bool:
+        """System prompt, context and task messages stay in the history for the whole run"""
+        message = managed.message
+        if isinstance(message, SystemMessage):
+            return True
+        if self._screenshot_referenced and managed is self._last_screenshot_message:
+            # an "unchanged screen" note points at this image
+            return True
+        if index == 1 and getattr(self, "context_content", "") and isinstance(message, HumanMessage):
+            return True
+        return isinstance(message.content, str) and message.content.startswith(_PINNED_PREFIXES)
+
+    def _strip_images(self, managed: ManagedMessage) -> int:
+        """Replace the images of a message with text placeholders; returns the tokens saved"""
+        content = managed.message.content
+        if not self._has_image(managed.message):
+            return 0
+        managed.message.content = [{"type": "text", "text": SCREENSHOT_PLACEHOLDER}
+                                   if isinstance(item, dict) and "image_url" in item else item
+                                   for item in content]
+        tokens = self._count_tokens(managed.message)
+        saved = managed.metadata.tokens - tokens
+        managed.metadata.tokens = tokens
+        return saved
+
+    @staticmethod
+    def _summarize_message(message: BaseMessage) -> List[str]:
+        """Summary lines worth keeping from a dropped message"""
+        content = message.content if isinstance(message.content, str) else ""
+        if content.startswith(COMPACTED_HISTORY_HEADER):
+            # fold the summary of a previous compaction into the new one
+            return [line for line in content.splitlines()[1:] if line.strip()]
+        if content.startswith(("Action result:", "Action error:")):
+            return [f"- {content[:200]}"]
+        if isinstance(message, AIMessage) and "{" in content:
+            try:
+                brain = json.loads(content[content.index("{"):content.rindex("}") + 1]).get("current_state", {})
+            except (ValueError, AttributeError):
+                return []
+            if brain.get("next_goal"):
+                return [f"- {str(brain.get('evaluation_previous_goal', ''))[:100]} | next goal: {str(brain['next_goal'])[:100]}"]
+        return []
+
+    @staticmethod
+    def _summary_content(summary_lines: List[str]) -> str:
+        return COMPACTED_HISTORY_HEADER + "\n" + "\n".join(summary_lines)
 
     def add_state_message(
             self,
@@ -89,17 +208,78 @@ class CustomMessageManager(MessageManager):
             result: Optional[List[ActionResult]] = None,
             step_info: Optional[AgentStepInfo] = None,
             use_vision=True,
+            screenshot_unchanged: bool = False,
     ) -> None:
         """Add browser state as human message"""
         # otherwise add state message and result to next message (which will not stay in memory)
+        prompt_kwargs = {}
+        if issubclass(self.settings.agent_prompt_class, CustomAgentMessagePrompt):
+            prompt_kwargs["screenshot_settings"] = self.settings.screenshot_settings
+            prompt_kwargs["screenshot_unchanged"] = screenshot_unchanged
+            if self.element_serializer is not None:
+                listing = self.element_serializer.serialize(state.element_tree, state.url)
+                if listing.reference is not None:
+                    self._replace_elements_reference(listing.reference, state.url)
+                prompt_kwargs["elements_text"] = listing.text
         state_message = self.settings.agent_prompt_class(
             state,
             actions,
             result,
             include_attributes=self.settings.include_attributes,
             step_info=step_info,
+            **prompt_kwargs,
         ).get_user_message(use_vision)
+        if self._has_image(state_message):
+            # only one screenshot in the prompt: the one kept from the previous step is superseded
+            self._drop_kept_screenshot()
         self._add_message_with_tokens(state_message)
+        self._screenshot_referenced = screenshot_unchanged
+        if self._has_image(state_message):
+            self._last_screenshot_message = self.state.history.messages[-1]
+
+    def _drop_kept_screenshot(self) -> None:
+        managed = self._last_screenshot_message
+        content = managed.message.content if managed is not None else None
+        if not (isinstance(content, list) and content and content[0].get("text") == LAST_SCREENSHOT_HEADER):
+            return
+        history = self.state.history
+        for i, other in enumerate(history.messages):
+            if other is managed:
+                history.messages.pop(i)
+                history.current_tokens -= managed.metadata.tokens
+                break
+        self._last_screenshot_message = None
+
+    def _keep_screenshot(self, index: int, removed: ManagedMessage) -> None:
+        """Put the image of a removed state message back on its own, so a later "unchanged" note can refer to it"""
+        images = [item for item in removed.message.content if isinstance(item, dict) and "image_url" in item]
+        message = HumanMessage(content=[{"type": "text", "text": LAST_SCREENSHOT_HEADER}, *images])
+        managed = ManagedMessage(message=message, metadata=MessageMetadata(tokens=self._count_tokens(message)))
+        self.state.history.messages.insert(index, managed)
+        self.state.history.current_tokens += managed.metadata.tokens
+        self._last_screenshot_message = managed
+
+    @staticmethod
+    def _has_image(message: BaseMessage) -> bool:
+        return isinstance(message.content, list) and any(
+            isinstance(item, dict) and "image_url" in item for item in message.content)
+
+    def screenshot_in_history(self) -> bool:
+        """Whether the last screenshot sent is still in the history with its image"""
+        managed = self._last_screenshot_message
+        return managed is not None and self._has_image(managed.message) \
+            and any(other is managed for other in self.state.history.messages)
+
+    def _replace_elements_reference(self, reference: str, url: str) -> None:
+        """Keep only the latest full element list in the history, later state messages list changes against it"""
+        history = self.state.history
+        for i, managed in enumerate(history.messages):
+            content = managed.message.content
+            if isinstance(content, str) and content.startswith(ELEMENTS_REFERENCE_HEADER):
+                history.messages.pop(i)
+                history.current_tokens -= managed.metadata.tokens
+                break
+        self._add_message_with_tokens(HumanMessage(content=f"{ELEMENTS_REFERENCE_HEADER} ({url}):\n{reference}"))
 
     def _remove_state_message_by_index(self, remove_ind=-1) -> None:
         """Remove last state message from history"""
@@ -109,6 +289,11 @@ class CustomMessageManager(MessageManager):
             if isinstance(self.state.history.messages[i].message, HumanMessage):
                 remove_cnt += 1
             if remove_cnt == abs(remove_ind):
-                self.state.history.messages.pop(i)
+                removed = self.state.history.messages.pop(i)
+                self.state.history.current_tokens -= removed.metadata.tokens
+                if removed is self._last_screenshot_message and self._has_image(removed.message) \
+                        and self.settings.screenshot_settings is not None \
+                        and self.settings.screenshot_settings.skip_unchanged:
+                    self._keep_screenshot(i, removed)
                 break
             i -= 1
@@ -8,8 +8,11 @@ from langchain_core.messages import HumanMessage, SystemMessage
 from datetime import datetime
 import importlib
 
+from ..utils.screenshot_processing import ScreenshotSettings, process_screenshot
 from .custom_views import CustomAgentStepInfo
 
+UNCHANGED_SCREENSHOT_NOTE = "Screenshot: the screen looks the same as in the last screenshot you were sent, so it is omitted."
+
 
 class CustomSystemPrompt(SystemPrompt):
     def _load_prompt_template(self) -> None:
@@ -30,6 +33,9 @@ class CustomAgentMessagePrompt(AgentMessagePrompt):
             result: Optional[List[ActionResult]] = None,
             include_attributes: list[str] = [],
             step_info: Optional[CustomAgentStepInfo] = None,
+            screenshot_settings: Optional[ScreenshotSettings] = None,
+            screenshot_unchanged: bool = False,
+            elements_text: Optional[str] = None,
     ):
         super(CustomAgentMessagePrompt, self).__init__(state=state,
                                                        result=result,
@@ -37,6 +43,10 @@ class CustomAgentMessagePrompt(AgentMessagePrompt):
                                                        step_info=step_info
                                                        )
         self.actions = actions
+        self.screenshot_settings = screenshot_settings
+        self.screenshot_unchanged = screenshot_unchanged
+        # pre-serialized elements (see src/utils/element_serializer.py)
+        self.elements_text = elements_text
 
     def get_user_message(self, use_vision: bool = True) -> HumanMessage:
         if self.step_info:
@@ -47,7 +57,9 @@ class CustomAgentMessagePrompt(AgentMessagePrompt):
         time_str = datetime.now().strftime("%Y-%m-%d %H:%M")
         step_info_description += f"Current date and time: {time_str}"
 
-        elements_text = self.state.element_tree.clickable_elements_to_string(include_attributes=self.include_attributes)
+        elements_text = self.elements_text
+        if elements_text is None:
+            elements_text = self.state.element_tree.clickable_elements_to_string(include_attributes=self.include_attributes)
 
         has_content_above = (self.state.pixels_above or 0) > 0
         has_content_below = (self.state.pixels_below or 0) > 0
@@ -98,14 +110,18 @@ class CustomAgentMessagePrompt(AgentMessagePrompt):
                     if result.extracted_content:
                         state_description += f"Result of previous action {i + 1}/{len(self.result)}: {result.extracted_content}\n"
 
+        if self.state.screenshot and use_vision == True and self.screenshot_unchanged:
+            return HumanMessage(content=f"{state_description}\n{UNCHANGED_SCREENSHOT_NOTE}")
+
         if self.state.screenshot and use_vision == True:
             # Format message for vision model
+            screenshot, image_format = process_screenshot(self.state.screenshot, self.screenshot_settings)
             return HumanMessage(
                 content=[
                     {'type': 'text', 'text': state_description},
                     {
                         'type': 'image_url',
-                        'image_url': {'url': f'data:image/png;base64,{self.state.screenshot}'},
+                        'image_url': {'url': f'data:image/{image_format};base64,{screenshot}'},
                     },
                 ]
             )
@@ -0,0 +1,108 @@
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from browser_use.browser.views import BrowserState
+from browser_use.dom.history_tree_processor.service import HistoryTreeProcessor
+from browser_use.dom.history_tree_processor.view import DOMHistoryElement
+from browser_use.dom.views import DOMElementNode
+
+from src.utils.record_index import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# Attributes that identify an element across page loads, with their weight when matching
+MATCH_ATTRIBUTES = {
+    "id": 3,
+    "name": 3,
+    "data-testid": 3,
+    "aria-label": 2,
+    "placeholder": 2,
+    "href": 2,
+    "title": 1,
+    "type": 1,
+    "role": 1,
+    "value": 1,
+}
+# Minimal score of an attribute match; a lone `type` or `role` is too weak to identify an element
+MIN_ATTRIBUTE_SCORE = 2
+
+
+def _attribute_score(historical: DOMHistoryElement, element: DOMElementNode) -> Optional[int]:
+    """Weight of the matching identifying attributes, None if a strong identifier differs"""
+    score = 0
+    for name, weight in MATCH_ATTRIBUTES.items():
+        value = historical.attributes.get(name)
+        if not value:
+            continue
+        if element.attributes.get(name) != value:
+            # a missing or different identifier rules the element out
+            if weight >= 3:
+                return None
+            continue
+        score += weight
+    return score
+
+
+def find_replay_element(historical: DOMHistoryElement, state: BrowserState) -> Optional[DOMElementNode]:
+    """
+    Element of the current page that a recorded action interacted with.
+
+    Tried in order: the exact match of browser-use (parent branch, attributes and xpath
+    unchanged), the same tag at the same xpath unless its id / name differs, then the
+    element of the same tag whose identifying attributes match best; ambiguous attribute
+    matches are not resolved.
+    """
+    if state.element_tree is not None:
+        element = HistoryTreeProcessor.find_history_element_in_tree(historical, state.element_tree)
+        if element is not None and element.highlight_index is not None:
+            return element
+
+    scored = []
+    for element in state.selector_map.values():
+        if element.tag_name != historical.tag_name:
+            continue
+        score = _attribute_score(historical, element)
+        if score is None:
+            continue
+        if element.xpath == historical.xpath:
+            return element
+        scored.append((score, element))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    if not scored or scored[0][0] < MIN_ATTRIBUTE_SCORE:
+        return None
+    if len(scored) > 1 and scored[1][0] == scored[0][0]:
+        logger.debug(f"Ambiguous replay match for <{historical.tag_name}> at {historical.xpath}")
+        return None
+    return scored[0][1]
+
+
+def urls_match(expected: str, actual: str) -> bool:
+    """Same page up to host case, www, fragment, tracking parameters and trailing slash"""
+    return normalize_url(expected) == normalize_url(actual)
+
+
+@dataclass
+class ReplayReport:
+    """Outcome and timing of replaying a saved agent history"""
+
+    total_steps: int = 0
+    replayed_steps: int = 0
+    skipped_steps: int = 0
+    actions: int = 0
+    elapsed: float = 0.0
+    step_durations: List[float] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    url_mismatches: List[str] = field(default_factory=list)
+
+    @property
+    def success(self) -> bool:
+        return not self.errors and not self.url_mismatches and \
+            self.replayed_steps + self.skipped_steps == self.total_steps
+
+    def summary(self) -> str:
+        average = self.elapsed / self.replayed_steps if self.replayed_steps else 0.0
+        return (f"Replayed {self.replayed_steps}/{self.total_steps} steps ({self.actions} actions, "
+                f"{self.skipped_steps} skipped) in {self.elapsed:.2f}s, {average:.2f}s per step, "
+                f"{len(self.errors)} errors, {len(self.url_mismatches)} url mismatches")
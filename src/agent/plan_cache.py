@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Type
+from urllib.parse import parse_qsl, urlsplit
+
+from browser_use.agent.views import AgentOutput
+from browser_use.browser.views import BrowserState
+
+from src.utils.record_index import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Attributes describing the structure of an interactive element; texts and values are left out
+FINGERPRINT_ATTRIBUTES = ("id", "name", "type", "role", "aria-label", "placeholder")
+# Actions whose output is specific to one run, a plan containing them is never cached
+UNCACHEABLE_ACTIONS = {"done", "user_login_helper"}
+
+_VARIABLE_SEGMENT = re.compile(r"^(\d+|[0-9a-f]{8,}|[0-9a-f-]{32,36})$", re.IGNORECASE)
+
+
+def url_pattern(url: str) -> str:
+    """Host and path with ids replaced by `*`, followed by the sorted query keys"""
+    parts = urlsplit(str(url or ""))
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    segments = ["*" if _VARIABLE_SEGMENT.match(segment) else segment
+                for segment in parts.path.rstrip("/").split("/")]
+    keys = sorted({key for key, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    return host + "/".join(segments) + (f"?{'&'.join(keys)}" if keys else "")
+
+
+def dom_fingerprint(state: BrowserState) -> str:
+    """Digest of the interactive elements' tags and identifying attributes, in highlight order"""
+    descriptors = []
+    for index in sorted(state.selector_map):
+        element = state.selector_map[index]
+        attributes = ",".join(f"{name}={element.attributes[name]}" for name in FINGERPRINT_ATTRIBUTES
+                              if element.attributes.get(name))
+        descriptors.append(f"{index}:{element.tag_name}[{attributes}]")
+    return hashlib.sha256("\n".join(descriptors).encode("utf-8")).hexdigest()
+
+
+def action_signature(actions: Optional[List[Any]]) -> str:
+    """Compact form of a list of actions, e.g. `input_text#3,click_element#5`"""
+    parts = []
+    for action in actions or []:
+        data = action.model_dump(exclude_unset=True) if hasattr(action, "model_dump") else action
+        for name, params in data.items():
+            index = params.get("index") if isinstance(params, dict) else None
+            parts.append(name if index is None else f"{name}#{index}")
+    return ",".join(parts)
+
+
+class PlanCache:
+    """
+    Actions that previously succeeded, keyed by task, page and position in the flow.
+
+    The key combines the normalized task, the url pattern, the DOM fingerprint of the
+    interactive elements and the signature of the previous step's actions. A plan is
+    only reused after it succeeded `min_successes` times with at least `min_confidence`
+    success rate; the model proposing different actions for the same key replaces it,
+    and a plan is dropped once failures bring its success rate below the threshold. At
+    most `max_entries` plans are kept, least recently used first out.
+
+    Plans live in a local SQLite file, updated one row at a time, so agents in several
+    processes can share it without overwriting each other's plans.
+    """
+
+    def __init__(self, path: str, min_successes: int = 2, min_confidence: float = 0.8, max_entries: int = 1000):
+        self.path = path
+        self.min_successes = min_successes
+        self.min_confidence = min_confidence
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                "key TEXT PRIMARY KEY, model_output TEXT, actions TEXT, "
+                "successes INTEGER, failures INTEGER, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS plans_last_used ON plans (last_used)")
+
+    @staticmethod
+    def make_key(task: str, state: BrowserState, last_action: Optional[List[Any]] = None) -> str:
+        parts = [normalize_text(task), url_pattern(state.url), dom_fingerprint(state), action_signature(last_action)]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _actions(dumped: Dict[str, Any]) -> str:
+        return json.dumps(dumped.get("action"), ensure_ascii=False, sort_keys=True)
+
+    def lookup(self, key: str, output_type: Type[AgentOutput]) -> Optional[AgentOutput]:
+        """The cached plan for key if it is trusted enough to skip the model"""
+        with self._lock:
+            row = self._conn.execute("SELECT model_output, successes, failures FROM plans WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None or row[1] < self.min_successes or row[1] < self.min_confidence * (row[1] + row[2]):
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE plans SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        try:
+            return output_type.model_validate(json.loads(row[0]))
+        except Exception as e:
+            # the available actions changed since the plan was stored
+            logger.debug(f"Dropping a cached plan that no longer validates: {e}")
+            self.invalidate(key)
+            return None
+
+    def record_success(self, key: str, model_output: AgentOutput):
+        """Count a plan that ran without errors, storing it if it is new for this key"""
+        dumped = model_output.model_dump(exclude_unset=True)
+        if any(name in UNCACHEABLE_ACTIONS for action in dumped.get("action", []) for name in action):
+            return
+        actions = self._actions(dumped)
+        now = time.time()
+        with self._lock, self._conn:
+            updated = self._conn.execute(
+                "UPDATE plans SET successes = successes + 1, last_used = ? WHERE key = ? AND actions = ?",
+                (now, key, actions)).rowcount
+            if not updated:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO plans (key, model_output, actions, successes, failures, last_used) "
+                    "VALUES (?, ?, ?, 1, 0, ?)",
+                    (key, json.dumps(dumped, ensure_ascii=False), actions, now))
+                self._evict()
+
+    def record_failure(self, key: str, model_output: AgentOutput):
+        """Count a failure of the cached plan; it is dropped once its confidence is too low"""
+        actions = self._actions(model_output.model_dump(exclude_unset=True))
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE plans SET failures = failures + 1 WHERE key = ? AND actions = ?",
+                               (key, actions))
+            self._conn.execute("DELETE FROM plans WHERE key = ? AND successes < ? * (successes + failures)",
+                               (key, self.min_confidence))
+
+    def invalidate(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM plans WHERE key = ?", (key,))
+
+    def _evict(self):
+        self._conn.execute(
+            "DELETE FROM plans WHERE key IN (SELECT key FROM plans ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+
+_plan_cache: Optional[PlanCache] = None
+
+
+def get_plan_cache() -> Optional[PlanCache]:
+    """
+    Process-wide cache configured by the AGENT_PLAN_CACHE_* env vars;
+    None unless AGENT_PLAN_CACHE is true.
+    """
+    global _plan_cache
+    if os.getenv("AGENT_PLAN_CACHE", "false").lower() != "true":
+        return None
+    if _plan_cache is None:
+        _plan_cache = PlanCache(
+            path=os.getenv("AGENT_PLAN_CACHE_PATH", "") or "./tmp/plan_cache.sqlite",
+            min_successes=int(os.getenv("AGENT_PLAN_CACHE_MIN_SUCCESSES", "") or 2),
+            min_confidence=float(os.getenv("AGENT_PLAN_CACHE_MIN_CONFIDENCE", "") or 0.8),
+            max_entries=int(os.getenv("AGENT_PLAN_CACHE_MAX_ENTRIES", "") or 1000),
+        )
+    return _plan_cache
@@ -12,16 +12,84 @@ from browser_use.browser.context import BrowserContextConfig, BrowserContextWind
 
 from src.agent.custom_agent import CustomAgent
 from src.agent.custom_prompts import CustomAgentMessagePrompt, CustomSystemPrompt
+from src.browser.context_pool import get_context_pool
 from src.browser.custom_browser import CustomBrowser
 from src.browser.custom_context import BrowserContextConfig, CustomBrowserContext
 from src.controller.custom_controller import CustomController
 
-# Global variables are already imported from src.globals
-from src.globals import _global_agent, _global_browser, _global_browser_context
+from src.agent.custom_views import CustomAgentState
+from src.globals import _session_manager
+from src.session_manager import DEFAULT_SESSION_ID
 from src.utils.utils import get_latest_files
 
 logger = logging.getLogger(__name__)
 
+
+async def _lease_pooled_context(session, headless, disable_security, window_w, window_h,
+                                save_recording_path, save_trace_path):
+    """从预热池中租用浏览器上下文，池被禁用时保持会话不变"""
+    context_pool = get_context_pool(
+        headless=headless,
+        disable_security=disable_security,
+        window_w=window_w,
+        window_h=window_h,
+        save_recording_path=save_recording_path,
+    )
+    if context_pool is None:
+        return
+    session.context_pool = context_pool
+    session.browser = await context_pool.get_browser()
+    session.browser_context = await context_pool.acquire(trace_path=save_trace_path or None)
+
+
+async def _setup_custom_browser(session, use_own_browser, keep_browser_open, headless, disable_security,
+                               window_w, window_h, save_recording_path, save_trace_path, chrome_cdp):
+    """为会话准备 CustomBrowser 和浏览器上下文，已有的浏览器保持不变"""
+    extra_chromium_args = [f"--window-size={window_w},{window_h}"]
+    cdp_url = chrome_cdp
+    if use_own_browser:
+        cdp_url = os.getenv("CHROME_CDP", chrome_cdp)
+
+        chrome_path = os.getenv("CHROME_PATH", None)
+        if chrome_path == "":
+            chrome_path = None
+        chrome_user_data = os.getenv("CHROME_USER_DATA", None)
+        if chrome_user_data:
+            extra_chromium_args += [f"--user-data-dir={chrome_user_data}"]
+    else:
+        chrome_path = None
+
+    # Lease a pre-warmed context when the browser is not kept open between tasks
+    if not (keep_browser_open or use_own_browser or cdp_url) and session.browser is None:
+        await _lease_pooled_context(session, headless, disable_security, window_w, window_h,
+                                    save_recording_path, save_trace_path)
+
+    # Initialize session browser if needed
+    # if chrome_cdp not empty string nor None
+    if (session.browser is None) or (cdp_url and cdp_url != "" and cdp_url != None):
+        session.browser = CustomBrowser(
+            config=BrowserConfig(
+                headless=headless,
+                disable_security=disable_security,
+                cdp_url=cdp_url,
+                chrome_instance_path=chrome_path,
+                extra_chromium_args=extra_chromium_args,
+            )
+        )
+
+    if session.browser_context is None or (chrome_cdp and cdp_url != "" and cdp_url != None):
+        session.browser_context = await session.browser.new_context(
+            config=BrowserContextConfig(
+                trace_path=save_trace_path if save_trace_path else None,
+                save_recording_path=save_recording_path if save_recording_path else None,
+                no_viewport=False,
+                browser_window_size=BrowserContextWindowSize(
+                    width=window_w, height=window_h
+                ),
+            )
+        )
+
+
 async def run_org_agent(
         llm,
         use_own_browser,
@@ -39,89 +107,90 @@ async def run_org_agent(
         max_actions_per_step,
         tool_calling_method,
         chrome_cdp,
-        max_input_tokens
+        max_input_tokens,
+        session_id: str = DEFAULT_SESSION_ID
 ) -> Tuple[str, str, str, str, Optional[str], Optional[str]]:
     """运行原始Agent"""
-    try:
-        global _global_browser, _global_browser_context, _global_agent
+    async with _session_manager.admit(session_id) as session:
+        try:
+            extra_chromium_args = [f"--window-size={window_w},{window_h}"]
+            cdp_url = chrome_cdp
 
-        extra_chromium_args = [f"--window-size={window_w},{window_h}"]
-        cdp_url = chrome_cdp
-
-        if use_own_browser:
-            cdp_url = os.getenv("CHROME_CDP", chrome_cdp)
-            chrome_path = os.getenv("CHROME_PATH", None)
-            if chrome_path == "":
+            if use_own_browser:
+                cdp_url = os.getenv("CHROME_CDP", chrome_cdp)
+                chrome_path = os.getenv("CHROME_PATH", None)
+                if chrome_path == "":
+                    chrome_path = None
+                chrome_user_data = os.getenv("CHROME_USER_DATA", None)
+                if chrome_user_data:
+                    extra_chromium_args += [f"--user-data-dir={chrome_user_data}"]
+            else:
                 chrome_path = None
-            chrome_user_data = os.getenv("CHROME_USER_DATA", None)
-            if chrome_user_data:
-                extra_chromium_args += [f"--user-data-dir={chrome_user_data}"]
-        else:
-            chrome_path = None
 
-        if _global_browser is None:
-            _global_browser = Browser(
-                config=BrowserConfig(
-                    headless=headless,
-                    cdp_url=cdp_url,
-                    disable_security=disable_security,
-                    chrome_instance_path=chrome_path,
-                    extra_chromium_args=extra_chromium_args,
-                )
-            )
+            os.makedirs(os.path.dirname(session.gif_path) or ".", exist_ok=True)
+
+            # Lease a pre-warmed context when the browser is not kept open between tasks
+            if not (keep_browser_open or use_own_browser or cdp_url) and session.browser is None:
+                await _lease_pooled_context(session, headless, disable_security, window_w, window_h,
+                                            save_recording_path, save_trace_path)
 
-        if _global_browser_context is None:
-            _global_browser_context = await _global_browser.new_context(
-                config=BrowserContextConfig(
-                    trace_path=save_trace_path if save_trace_path else None,
-                    save_recording_path=save_recording_path if save_recording_path else None,
-                    no_viewport=False,
-                    browser_window_size=BrowserContextWindowSize(
-                        width=window_w, height=window_h
-                    ),
+            if session.browser is None:
+                session.browser = Browser(
+                    config=BrowserConfig(
+                        headless=headless,
+                        cdp_url=cdp_url,
+                        disable_security=disable_security,
+                        chrome_instance_path=chrome_path,
+                        extra_chromium_args=extra_chromium_args,
+                    )
                 )
-            )
 
-        if _global_agent is None:
-            _global_agent = Agent(
-                task=task,
-                llm=llm,
-                use_vision=use_vision,
-                browser=_global_browser,
-                browser_context=_global_browser_context,
-                max_actions_per_step=max_actions_per_step,
-                tool_calling_method=tool_calling_method,
-                max_input_tokens=max_input_tokens,
-                generate_gif=True
-            )
-        history = await _global_agent.run(max_steps=max_steps)
+            if session.browser_context is None:
+                session.browser_context = await session.browser.new_context(
+                    config=BrowserContextConfig(
+                        trace_path=save_trace_path if save_trace_path else None,
+                        save_recording_path=save_recording_path if save_recording_path else None,
+                        no_viewport=False,
+                        browser_window_size=BrowserContextWindowSize(
+                            width=window_w, height=window_h
+                        ),
+                    )
+                )
 
-        history_file = os.path.join(save_agent_history_path, f"{_global_agent.state.agent_id}.json")
-        _global_agent.save_history(history_file)
+            if session.agent is None:
+                session.agent = Agent(
+                    task=task,
+                    llm=llm,
+                    use_vision=use_vision,
+                    browser=session.browser,
+                    browser_context=session.browser_context,
+                    max_actions_per_step=max_actions_per_step,
+                    tool_calling_method=tool_calling_method,
+                    max_input_tokens=max_input_tokens,
+                    generate_gif=session.gif_path
+                )
+            history = await session.agent.run(max_steps=max_steps)
 
-        final_result = history.final_result()
-        errors = history.errors()
-        model_actions = history.model_actions()
-        model_thoughts = history.model_thoughts()
+            history_file = os.path.join(save_agent_history_path, f"{session.agent.state.agent_id}.json")
+            session.agent.save_history(history_file)
 
-        trace_file = get_latest_files(save_trace_path)
+            final_result = history.final_result()
+            errors = history.errors()
+            model_actions = history.model_actions()
+            model_thoughts = history.model_thoughts()
 
-        return final_result, errors, model_actions, model_thoughts, trace_file.get('.zip'), history_file
-    except Exception as e:
-        traceback.print_exc()
-        errors = str(e) + "\n" + traceback.format_exc()
-        return '', errors, '', '', None, None
-    finally:
-        _global_agent = None
-        # Handle cleanup based on persistence configuration
-        if not keep_browser_open:
-            if _global_browser_context:
-                await _global_browser_context.close()
-                _global_browser_context = None
+            trace_file = get_latest_files(save_trace_path)
 
-            if _global_browser:
-                await _global_browser.close()
-                _global_browser = None
+            return final_result, errors, model_actions, model_thoughts, trace_file.get('.zip'), history_file
+        except Exception as e:
+            traceback.print_exc()
+            errors = str(e) + "\n" + traceback.format_exc()
+            return '', errors, '', '', None, None
+        finally:
+            session.agent = None
+            # Handle cleanup based on persistence configuration
+            if not keep_browser_open:
+                await session.close_browser()
 
 
 async def run_custom_agent(
@@ -142,95 +211,118 @@ async def run_custom_agent(
         max_actions_per_step,
         tool_calling_method,
         chrome_cdp,
-        max_input_tokens
+        max_input_tokens,
+        session_id: str = DEFAULT_SESSION_ID
 ) -> Tuple[str, str, str, str, Optional[str], Optional[str]]:
     """运行自定义Agent"""
-    try:
-        global _global_browser, _global_browser_context, _global_agent
+    async with _session_manager.admit(session_id) as session:
+        try:
+            os.makedirs(os.path.dirname(session.gif_path) or ".", exist_ok=True)
 
-        extra_chromium_args = [f"--window-size={window_w},{window_h}"]
-        cdp_url = chrome_cdp
-        if use_own_browser:
-            cdp_url = os.getenv("CHROME_CDP", chrome_cdp)
+            # 清除上一次任务遗留的停止请求，控制器与agent共享本会话的控制状态
+            session.agent_state.clear_stop()
+            controller = CustomController(agent_state=session.agent_state)
 
-            chrome_path = os.getenv("CHROME_PATH", None)
-            if chrome_path == "":
-                chrome_path = None
-            chrome_user_data = os.getenv("CHROME_USER_DATA", None)
-            if chrome_user_data:
-                extra_chromium_args += [f"--user-data-dir={chrome_user_data}"]
-        else:
-            chrome_path = None
+            await _setup_custom_browser(session, use_own_browser, keep_browser_open, headless, disable_security,
+                                        window_w, window_h, save_recording_path, save_trace_path, chrome_cdp)
 
-        controller = CustomController()
-
-        # Initialize global browser if needed
-        # if chrome_cdp not empty string nor None
-        if (_global_browser is None) or (cdp_url and cdp_url != "" and cdp_url != None):
-            _global_browser = CustomBrowser(
-                config=BrowserConfig(
-                    headless=headless,
-                    disable_security=disable_security,
-                    cdp_url=cdp_url,
-                    chrome_instance_path=chrome_path,
-                    extra_chromium_args=extra_chromium_args,
+            # Create and run agent
+            session.step_latency = ""
+            if session.agent is None:
+                session.agent = CustomAgent(
+                    task=task,
+                    add_infos=add_infos,
+                    use_vision=use_vision,
+                    llm=llm,
+                    browser=session.browser,
+                    browser_context=session.browser_context,
+                    controller=controller,
+                    system_prompt_class=CustomSystemPrompt,
+                    agent_prompt_class=CustomAgentMessagePrompt,
+                    max_actions_per_step=max_actions_per_step,
+                    tool_calling_method=tool_calling_method,
+                    max_input_tokens=max_input_tokens,
+                    generate_gif=session.gif_path,
+                    injected_agent_state=CustomAgentState(parent=session.agent_state)
                 )
-            )
+            history = await session.agent.run(max_steps=max_steps)
 
-        if _global_browser_context is None or (chrome_cdp and cdp_url != "" and cdp_url != None):
-            _global_browser_context = await _global_browser.new_context(
-                config=BrowserContextConfig(
-                    trace_path=save_trace_path if save_trace_path else None,
-                    save_recording_path=save_recording_path if save_recording_path else None,
-                    no_viewport=False,
-                    browser_window_size=BrowserContextWindowSize(
-                        width=window_w, height=window_h
-                    ),
-                )
-            )
+            history_file = os.path.join(save_agent_history_path, f"{session.agent.state.agent_id}.json")
+            session.agent.save_history(history_file)
+
+            final_result = history.final_result()
+            errors = history.errors()
+            model_actions = history.model_actions()
+            model_thoughts = history.model_thoughts()
+
+            trace_file = get_latest_files(save_trace_path)
 
-        # Create and run agent
-        if _global_agent is None:
-            _global_agent = CustomAgent(
-                task=task,
-                add_infos=add_infos,
-                use_vision=use_vision,
+            return final_result, errors, model_actions, model_thoughts, trace_file.get('.zip'), history_file
+        except Exception as e:
+            traceback.print_exc()
+            errors = str(e) + "\n" + traceback.format_exc()
+            return '', errors, '', '', None, None
+        finally:
+            if session.agent is not None:
+                # 保留各阶段耗时汇总供界面展示
+                session.step_latency = session.agent.profiler.format_summary()
+            session.agent = None
+            # Handle cleanup based on persistence configuration
+            if not keep_browser_open:
+                await session.close_browser() 
+
+async def run_replay_agent(
+        llm,
+        use_own_browser,
+        keep_browser_open,
+        headless,
+        disable_security,
+        window_w,
+        window_h,
+        save_recording_path,
+        save_trace_path,
+        history_file,
+        chrome_cdp,
+        session_id: str = DEFAULT_SESSION_ID
+) -> Tuple[str, str, Optional[str]]:
+    """重放已保存的Agent历史，不调用LLM；返回重放摘要、错误和trace文件"""
+    async with _session_manager.admit(session_id) as session:
+        try:
+            if not history_file:
+                raise ValueError("No agent history file to replay")
+
+            session.agent_state.clear_stop()
+            controller = CustomController(agent_state=session.agent_state)
+
+            await _setup_custom_browser(session, use_own_browser, keep_browser_open, headless, disable_security,
+                                        window_w, window_h, save_recording_path, save_trace_path, chrome_cdp)
+
+            # llm 仅用于构造agent（提取页面内容的动作仍会用到），重放本身不调用
+            session.agent = CustomAgent(
+                task=f"Replay {os.path.basename(history_file)}",
                 llm=llm,
-                browser=_global_browser,
-                browser_context=_global_browser_context,
+                browser=session.browser,
+                browser_context=session.browser_context,
                 controller=controller,
                 system_prompt_class=CustomSystemPrompt,
                 agent_prompt_class=CustomAgentMessagePrompt,
-                max_actions_per_step=max_actions_per_step,
-                tool_calling_method=tool_calling_method,
-                max_input_tokens=max_input_tokens,
-                generate_gif=True
+                injected_agent_state=CustomAgentState(parent=session.agent_state)
             )
-        history = await _global_agent.run(max_steps=max_steps)
-
-        history_file = os.path.join(save_agent_history_path, f"{_global_agent.state.agent_id}.json")
-        _global_agent.save_history(history_file)
-
-        final_result = history.final_result()
-        errors = history.errors()
-        model_actions = history.model_actions()
-        model_thoughts = history.model_thoughts()
-
-        trace_file = get_latest_files(save_trace_path)
-
-        return final_result, errors, model_actions, model_thoughts, trace_file.get('.zip'), history_file
-    except Exception as e:
-        traceback.print_exc()
-        errors = str(e) + "\n" + traceback.format_exc()
-        return '', errors, '', '', None, None
-    finally:
-        _global_agent = None
-        # Handle cleanup based on persistence configuration
-        if not keep_browser_open:
-            if _global_browser_context:
-                await _global_browser_context.close()
-                _global_browser_context = None
-
-            if _global_browser:
-                await _global_browser.close()
-                _global_browser = None 
\ No newline at end of file
+            results, report = await session.agent.replay(history_file)
+
+            errors = "\n".join(report.errors + report.url_mismatches)
+            final_result = next((result.extracted_content for result in reversed(results)
+                                 if result.is_done and result.extracted_content), "")
+            summary = f"{final_result}\n\n🔁 {report.summary()}" if final_result else f"🔁 {report.summary()}"
+
+            trace_file = get_latest_files(save_trace_path)
+
+            return summary, errors, trace_file.get('.zip')
+        except Exception as e:
+            traceback.print_exc()
+            errors = str(e) + "\n" + traceback.format_exc()
+            return '', errors, None
+        finally:
+            session.agent = None
+            if not keep_browser_open:
+                await session.close_browser()
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from browser_use.browser.browser import BrowserConfig
+from browser_use.browser.context import BrowserContextConfig, BrowserContextWindowSize
+
+from .custom_browser import CustomBrowser
+from .custom_context import CustomBrowserContext
+
+logger = logging.getLogger(__name__)
+
+# Origins' storage wiped between leases (cookies are cleared separately)
+_RESET_STORAGE_TYPES = "local_storage,indexeddb,websql,service_workers,cache_storage,file_systems"
+
+
+@dataclass
+class _PooledContext:
+    context: CustomBrowserContext
+    released_at: float
+
+
+class BrowserContextPool:
+    """
+    Pool of pre-warmed browser contexts on one shared Chromium instance.
+
+    Contexts are handed out by `acquire()` / `lease()` with an initialized Playwright
+    context and page, and are wiped (cookies, storage, permissions, tabs) when they
+    come back, so the next task starts from a clean state without a browser launch.
+
+    - min_size: contexts kept warm at all times
+    - max_size: contexts leased at once, `acquire()` waits for a release beyond that
+    - idle_timeout: seconds an idle context above min_size is kept before eviction
+    """
+
+    def __init__(
+            self,
+            browser_config: BrowserConfig,
+            context_config: BrowserContextConfig,
+            min_size: int = 1,
+            max_size: int = 4,
+            idle_timeout: float = 300,
+            health_check_timeout: float = 5,
+    ):
+        self.browser_config = browser_config
+        self.context_config = context_config
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_timeout = health_check_timeout
+
+        self.browser: Optional[CustomBrowser] = None
+        self._idle: List[_PooledContext] = []
+        self._leased: Dict[str, Tuple[CustomBrowserContext, Optional[str]]] = {}
+        self._lock = asyncio.Lock()
+        # one slot per leased context
+        self._slots = asyncio.Semaphore(max_size)
+        self._warm_task: Optional[asyncio.Task] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._idle) + len(self._leased)
+
+    async def get_browser(self) -> CustomBrowser:
+        """Return the shared browser, relaunching it if it was closed or crashed"""
+        playwright_browser = self.browser.playwright_browser if self.browser else None
+        if self.browser is None or (playwright_browser is not None and not playwright_browser.is_connected()):
+            if self.browser is not None:
+                logger.warning("Pooled browser disconnected, relaunching")
+                await self._discard_all()
+            self.browser = CustomBrowser(config=self.browser_config)
+        await self.browser.get_playwright_browser()
+        return self.browser
+
+    async def _create_context(self) -> CustomBrowserContext:
+        browser = await self.get_browser()
+        context = await browser.new_context(config=self.context_config)
+        await context.get_session()
+        return context
+
+    async def _is_healthy(self, context: CustomBrowserContext) -> bool:
+        try:
+            if context.session is None or not context.session.context.pages:
+                return False
+            page = context.session.context.pages[-1]
+            await asyncio.wait_for(page.evaluate("1"), timeout=self.health_check_timeout)
+            return True
+        except Exception as e:
+            logger.debug(f"Pooled context {context.context_id} failed health check: {e}")
+            return False
+
+    async def acquire(self, trace_path: Optional[str] = None) -> CustomBrowserContext:
+        """
+        Lease a clean context, creating one if no healthy idle context is available;
+        waits while max_size contexts are leased
+        """
+        if self._slots.locked():
+            logger.debug(f"All {self.max_size} pooled contexts are leased, waiting for a release")
+        await self._slots.acquire()
+        try:
+            context = None
+            async with self._lock:
+                await self._evict_idle()
+                while self._idle:
+                    candidate = self._idle.pop().context
+                    if await self._is_healthy(candidate):
+                        context = candidate
+                        break
+                    await self._close_context(candidate)
+
+            if context is None:
+                context = await self._create_context()
+                logger.debug(f"Created pooled context {context.context_id} (pool size {self.size + 1})")
+
+            # new id per lease so traces and logs of different tasks don't collide
+            context.context_id = str(uuid.uuid4())
+            if trace_path:
+                os.makedirs(trace_path, exist_ok=True)
+                await context.session.context.tracing.start(screenshots=True, snapshots=True, sources=True)
+        except BaseException:
+            self._slots.release()
+            raise
+        self._leased[context.context_id] = (context, trace_path)
+        self._schedule_warm_up()
+        return context
+
+    async def release(self, context: CustomBrowserContext):
+        """Return a leased context to the pool after wiping its state"""
+        leased = self._leased.pop(context.context_id, None)
+        if leased is not None:
+            self._slots.release()
+        trace_path = leased[1] if leased else None
+        if trace_path and context.session is not None:
+            try:
+                await context.session.context.tracing.stop(
+                    path=os.path.join(trace_path, f"{context.context_id}.zip"))
+            except Exception as e:
+                logger.debug(f"Failed to stop tracing: {e}")
+
+        async with self._lock:
+            if len(self._idle) >= self.max_size or not await self._reset(context):
+                await self._close_context(context)
+                return
+            self._idle.append(_PooledContext(context=context, released_at=time.time()))
+
+    @asynccontextmanager
+    async def lease(self, trace_path: Optional[str] = None) -> AsyncIterator[CustomBrowserContext]:
+        context = await self.acquire(trace_path=trace_path)
+        try:
+            yield context
+        finally:
+            await self.release(context)
+
+    async def _reset(self, context: CustomBrowserContext) -> bool:
+        """Wipe cookies, storage, permissions and tabs; returns False if the context is unusable"""
+        if context.session is None:
+            return False
+        try:
+            playwright_context = context.session.context
+            storage_state = await playwright_context.storage_state()
+            origins = {origin["origin"] for origin in storage_state.get("origins", [])}
+            old_pages = list(playwright_context.pages)
+            for page in old_pages:
+                if page.url.startswith("http"):
+                    origins.add("/".join(page.url.split("/")[:3]))
+
+            fresh_page = await playwright_context.new_page()
+            if origins:
+                cdp_session = await playwright_context.new_cdp_session(fresh_page)
+                for origin in origins:
+                    await cdp_session.send("Storage.clearDataForOrigin",
+                                           {"origin": origin, "storageTypes": _RESET_STORAGE_TYPES})
+                await cdp_session.detach()
+            await playwright_context.clear_cookies()
+            await playwright_context.clear_permissions()
+            for page in old_pages:
+                await page.close()
+
+            context.session.cached_state = None
+            context.state.target_id = None
+            if hasattr(context, "current_state"):
+                del context.current_state
+            if context.state_cache is not None:
+                context.state_cache.clear()
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to reset pooled context {context.context_id}: {e}")
+            return False
+
+    async def _close_context(self, context: CustomBrowserContext):
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug(f"Failed to close pooled context: {e}")
+
+    async def _evict_idle(self):
+        """Close contexts above min_size that have been idle longer than idle_timeout"""
+        now = time.time()
+        keep = []
+        # oldest first, so the most recently used contexts survive
+        for index, pooled in enumerate(sorted(self._idle, key=lambda p: p.released_at)):
+            remaining = len(self._idle) - index
+            if remaining > self.min_size and now - pooled.released_at > self.idle_timeout:
+                await self._close_context(pooled.context)
+            else:
+                keep.append(pooled)
+        self._idle = keep
+
+    def _schedule_warm_up(self):
+        if self.min_size <= len(self._idle) or (self._warm_task and not self._warm_task.done()):
+            return
+        self._warm_task = asyncio.create_task(self.warm_up())
+
+    async def warm_up(self):
+        """Fill the pool up to min_size idle contexts"""
+        try:
+            while len(self._idle) < self.min_size and self.size < self.max_size:
+                context = await self._create_context()
+                async with self._lock:
+                    self._idle.append(_PooledContext(context=context, released_at=time.time()))
+                logger.debug(f"Warmed pooled context {context.context_id} ({len(self._idle)} idle)")
+        except Exception as e:
+            logger.warning(f"Failed to warm browser context pool: {e}")
+
+    async def _discard_all(self):
+        for pooled in self._idle:
+            await self._close_context(pooled.context)
+        self._idle = []
+        for _ in self._leased:
+            self._slots.release()
+        self._leased.clear()
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+
+    async def close(self):
+        if self._warm_task and not self._warm_task.done():
+            self._warm_task.cancel()
+        async with self._lock:
+            for context, _ in list(self._leased.values()):
+                await self._close_context(context)
+            await self._discard_all()
+
+
+_context_pools: Dict[tuple, BrowserContextPool] = {}
+
+
+def get_context_pool(
+        headless: bool = False,
+        disable_security: bool = True,
+        window_w: int = 1280,
+        window_h: int = 1100,
+        save_recording_path: Optional[str] = None,
+) -> Optional[BrowserContextPool]:
+    """
+    Shared pool for the given launch settings, or None when pooling is disabled
+    (BROWSER_POOL_MAX_SIZE=0). Pool size and idle eviction are configured by
+    BROWSER_POOL_MIN_SIZE, BROWSER_POOL_MAX_SIZE and BROWSER_POOL_IDLE_TIMEOUT.
+    """
+    max_size = int(os.getenv("BROWSER_POOL_MAX_SIZE", "") or 4)
+    if max_size <= 0:
+        return None
+
+    window_w, window_h = int(window_w), int(window_h)
+    key = (bool(headless), bool(disable_security), window_w, window_h, save_recording_path or None)
+    pool = _context_pools.get(key)
+    if pool is None:
+        pool = BrowserContextPool(
+            browser_config=BrowserConfig(
+                headless=headless,
+                disable_security=disable_security,
+                extra_chromium_args=[f"--window-size={window_w},{window_h}"],
+            ),
+            context_config=BrowserContextConfig(
+                save_recording_path=save_recording_path or None,
+                no_viewport=False,
+                browser_window_size=BrowserContextWindowSize(width=window_w, height=window_h),
+            ),
+            min_size=int(os.getenv("BROWSER_POOL_MIN_SIZE", "") or 1),
+            max_size=max_size,
+            idle_timeout=float(os.getenv("BROWSER_POOL_IDLE_TIMEOUT", "") or 300),
+        )
+        _context_pools[key] = pool
+    return pool
+
+
+async def close_context_pools():
+    for pool in list(_context_pools.values()):
+        await pool.close()
+    _context_pools.clear()
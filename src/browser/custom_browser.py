@@ -23,6 +23,7 @@ class CustomBrowser(Browser):
 
     async def new_context(
             self,
-            config: BrowserContextConfig = BrowserContextConfig()
+            config: BrowserContextConfig = BrowserContextConfig(),
+            isolated: bool = False,
     ) -> CustomBrowserContext:
-        return CustomBrowserContext(config=config, browser=self)
+        return CustomBrowserContext(config=config, browser=self, isolated=isolated)
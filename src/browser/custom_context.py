@@ -1,12 +1,19 @@
+import asyncio
 import json
 import logging
 import os
+from typing import Optional
 
 from browser_use.browser.browser import Browser
 from browser_use.browser.context import BrowserContext, BrowserContextConfig
+from browser_use.browser.views import BrowserState
 from playwright.async_api import Browser as PlaywrightBrowser
+from browser_use.utils import time_execution_sync
 from playwright.async_api import BrowserContext as PlaywrightBrowserContext
 
+from .dom_tracker import DomStateCache
+from .frame_cache import FrameCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,6 +21,80 @@ class CustomBrowserContext(BrowserContext):
     def __init__(
             self,
             browser: "Browser",
-            config: BrowserContextConfig = BrowserContextConfig()
+            config: BrowserContextConfig = BrowserContextConfig(),
+            isolated: bool = False,
+            incremental_state: Optional[bool] = None,
     ):
         super(CustomBrowserContext, self).__init__(browser=browser, config=config)
+        # when attached to an existing Chrome (CDP / chrome_instance_path), open a separate
+        # context instead of sharing the default one, so parallel agents don't fight over tabs
+        self.isolated = isolated
+        # latest screenshot of this context, shared by the agent and the live view
+        self.frame_cache = FrameCache()
+        # reuse the last state while the DOM is unchanged (BROWSER_INCREMENTAL_STATE)
+        if incremental_state is None:
+            incremental_state = os.getenv("BROWSER_INCREMENTAL_STATE", "false").lower() == "true"
+        self.state_cache = None
+        if incremental_state:
+            self.state_cache = DomStateCache(max_age=float(os.getenv("BROWSER_STATE_CACHE_MAX_AGE", "") or 30))
+
+    @time_execution_sync('--get_state')
+    async def get_state(self) -> BrowserState:
+        if self.state_cache is None:
+            return await super().get_state()
+
+        await self._wait_for_page_and_frames_load()
+        session = await self.get_session()
+        page = await self.get_current_page()
+        tab_count = len(session.context.pages)
+        cached_state = await self.state_cache.lookup(page, tab_count)
+        if cached_state is not None:
+            logger.debug("DOM unchanged since the last state, reusing it")
+            session.cached_state = cached_state
+            return cached_state
+
+        version_before = await self.state_cache.dom_version(page)
+        session.cached_state = await self._update_state()
+        version_after = await self.state_cache.dom_version(page)
+        self.state_cache.store(session.cached_state, page, version_before, version_after, tab_count)
+
+        # Save cookies if a file is specified
+        if self.config.cookies_file:
+            asyncio.create_task(self.save_cookies())
+        return session.cached_state
+
+    async def is_state_current(self, state: BrowserState) -> bool:
+        """Whether `state` still matches the page: same page, url, tab count and DOM version"""
+        if self.state_cache is None:
+            return False
+        session = await self.get_session()
+        page = await self.get_current_page()
+        return await self.state_cache.lookup(page, len(session.context.pages)) is state
+
+    async def take_screenshot(self, full_page: bool = False) -> str:
+        screenshot_b64 = await super().take_screenshot(full_page=full_page)
+        if not full_page:
+            page = await self.get_current_page()
+            self.frame_cache.publish(screenshot_b64, url=page.url, format="png",
+                                     highlighted=self.config.highlight_elements)
+        return screenshot_b64
+
+    async def _create_context(self, browser: PlaywrightBrowser):
+        if not self.isolated or not browser.contexts:
+            return await super()._create_context(browser)
+        # seed the new context with the cookies / local storage of the user's default context
+        storage_state = await browser.contexts[0].storage_state()
+        return await super()._create_context(_IsolatedPlaywrightBrowser(browser, storage_state))
+
+
+class _IsolatedPlaywrightBrowser:
+    """Playwright browser view that hides existing contexts so a new one is always created"""
+
+    contexts = []
+
+    def __init__(self, browser: PlaywrightBrowser, storage_state: dict):
+        self._browser = browser
+        self._storage_state = storage_state
+
+    async def new_context(self, **kwargs) -> PlaywrightBrowserContext:
+        return await self._browser.new_context(storage_state=self._storage_state, **kwargs)
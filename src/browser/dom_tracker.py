@@ -0,0 +1,99 @@
+import logging
+import time
+from typing import Optional, Tuple
+
+from browser_use.browser.views import BrowserState
+
+logger = logging.getLogger(__name__)
+
+# Installs a MutationObserver once per document and returns "<document token>:<change count>".
+# Highlight overlays drawn by browser-use don't count as changes; typing, scrolling and
+# resizing do, since they change input values or element positions without a DOM mutation.
+DOM_TRACKER_JS = """
+() => {
+    if (window.__webuiDomToken === undefined) {
+        window.__webuiDomToken = Math.random().toString(36).slice(2);
+        window.__webuiDomVersion = 0;
+        const HIGHLIGHT_CONTAINER_ID = 'playwright-highlight-container';
+        const bump = () => { window.__webuiDomVersion++; };
+        const isHighlight = (node) => {
+            const element = node && node.nodeType === 1 ? node : node && node.parentElement;
+            return !!(element && element.closest && element.closest('#' + HIGHLIGHT_CONTAINER_ID));
+        };
+        new MutationObserver((mutations) => {
+            for (const mutation of mutations) {
+                if (mutation.type === 'attributes' && mutation.attributeName === 'browser-user-highlight-id') continue;
+                if (isHighlight(mutation.target)) continue;
+                if (mutation.type === 'childList' &&
+                    [...mutation.addedNodes, ...mutation.removedNodes].every(n => n.id === HIGHLIGHT_CONTAINER_ID)) continue;
+                bump();
+                return;
+            }
+        }).observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+        for (const type of ['input', 'change', 'scroll', 'resize']) {
+            window.addEventListener(type, bump, {capture: true, passive: true});
+        }
+    }
+    return window.__webuiDomToken + ':' + window.__webuiDomVersion;
+}
+"""
+
+
+class DomStateCache:
+    """
+    Last browser state of one context together with the DOM version it was built from.
+
+    `get_state` rebuilds the DOM tree, selector map and screenshot from scratch; when the
+    tracker reports no change in the same page, url and tab count since the last build, the
+    cached state is returned instead. Entries older than `max_age` seconds are not reused,
+    as a safety net for changes a MutationObserver can't see (canvas, CSS animations,
+    cross-origin iframes).
+    """
+
+    def __init__(self, max_age: float = 30):
+        self.max_age = max_age
+        self._state: Optional[BrowserState] = None
+        self._key: Optional[Tuple] = None
+        self._timestamp = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    async def dom_version(page) -> Optional[str]:
+        try:
+            return await page.evaluate(DOM_TRACKER_JS)
+        except Exception as e:
+            logger.debug(f"Could not read DOM version: {e}")
+            return None
+
+    @staticmethod
+    def _make_key(page, version: Optional[str], tab_count: int) -> Optional[Tuple]:
+        if version is None:
+            return None
+        return id(page), page.url, version, tab_count
+
+    async def lookup(self, page, tab_count: int) -> Optional[BrowserState]:
+        """Cached state if nothing relevant changed since it was built"""
+        if self._state is None or time.time() - self._timestamp > self.max_age:
+            self.misses += 1
+            return None
+        key = self._make_key(page, await self.dom_version(page), tab_count)
+        if key is None or key != self._key:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._state
+
+    def store(self, state: BrowserState, page, version_before: Optional[str], version_after: Optional[str],
+              tab_count: int):
+        """Remember a freshly built state; not cached if the DOM changed while it was being built"""
+        if version_before is None or version_before != version_after or state.url != page.url:
+            self.clear()
+            return
+        self._state = state
+        self._key = self._make_key(page, version_after, tab_count)
+        self._timestamp = time.time()
+
+    def clear(self):
+        self._state = None
+        self._key = None
@@ -0,0 +1,67 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Frame:
+    data: str  # base64 encoded image
+    url: str
+    timestamp: float
+    format: str = "png"
+    # the agent's screenshots show the element highlights drawn for the model
+    highlighted: bool = False
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.timestamp
+
+    @property
+    def data_url(self) -> str:
+        return f"data:image/{self.format};base64,{self.data}"
+
+
+class FrameCache:
+    """
+    Latest frame captured for one browser context.
+
+    The agent's vision screenshot, screencast frames and live view screenshots are all
+    published here, so a consumer that only needs a recent picture of the page (the live
+    view) reuses the last capture instead of asking Playwright for another screenshot.
+    The latest frame without highlights is kept apart for consumers that show the page as is.
+    """
+
+    def __init__(self):
+        self._frame: Optional[Frame] = None
+        self._clean_frame: Optional[Frame] = None
+        self._lock = threading.Lock()
+
+    def publish(self, data: str, url: str, format: str = "png", highlighted: bool = False) -> Frame:
+        frame = Frame(data=data, url=url, timestamp=time.time(), format=format, highlighted=highlighted)
+        with self._lock:
+            self._frame = frame
+            if not highlighted:
+                self._clean_frame = frame
+        return frame
+
+    def latest(self, max_age: Optional[float] = None, url: Optional[str] = None,
+               highlighted: bool = True) -> Optional[Frame]:
+        """
+        Latest frame, or None if it is older than max_age seconds or shows a different url;
+        with `highlighted=False`, the latest frame without element highlights
+        """
+        with self._lock:
+            frame = self._frame if highlighted else self._clean_frame
+        if frame is None:
+            return None
+        if max_age is not None and frame.age > max_age:
+            return None
+        if url is not None and frame.url != url:
+            return None
+        return frame
+
+    def clear(self):
+        with self._lock:
+            self._frame = None
+            self._clean_frame = None
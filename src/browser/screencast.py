@@ -0,0 +1,162 @@
+import asyncio
+import logging
+from typing import Optional
+
+from browser_use.browser.context import BrowserContext
+
+logger = logging.getLogger(__name__)
+
+
+class ScreencastStream:
+    """
+    Live view frames pushed by Chromium via CDP `Page.startScreencast`.
+
+    Chromium only emits a frame when the page repaints, and frames identical to the
+    previous one are dropped here, so an idle page costs nothing. Only the latest frame
+    is kept: if the consumer falls behind, intermediate frames are dropped and the
+    screencast is restarted with lower JPEG quality / fewer frames (`everyNthFrame`);
+    once the consumer keeps up again quality and rate are raised step by step.
+
+    Frames are returned as the base64 JPEG payload CDP already delivers, no re-encoding.
+    """
+
+    # number of received frames between two quality/rate adjustments
+    ADAPT_INTERVAL = 10
+
+    def __init__(
+            self,
+            browser_context: BrowserContext,
+            quality: int = 70,
+            min_quality: int = 30,
+            max_quality: int = 80,
+            max_every_nth_frame: int = 4,
+            max_width: Optional[int] = None,
+            max_height: Optional[int] = None,
+    ):
+        self.browser_context = browser_context
+        self.quality = quality
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.every_nth_frame = 1
+        self.max_every_nth_frame = max_every_nth_frame
+        self.max_width = max_width
+        self.max_height = max_height
+
+        self._page = None
+        self._cdp_session = None
+        self._latest_frame: Optional[str] = None
+        self._latest_digest: Optional[int] = None
+        self._frame_ready = asyncio.Event()
+        self._received = 0
+        self._dropped = 0
+
+    @staticmethod
+    def _pick_page(pages):
+        # same choice as capture_frame: the last page that is not blank
+        active_page = pages[0]
+        for page in pages:
+            if page.url != "about:blank":
+                active_page = page
+        return active_page
+
+    async def _attach(self):
+        """(Re)start the screencast on the active tab; agents may open or switch tabs between steps"""
+        session = self.browser_context.session
+        if session is None or not session.context.pages:
+            return
+        page = self._pick_page(session.context.pages)
+        if page is self._page and self._cdp_session is not None:
+            return
+
+        await self._detach()
+        self._page = page
+        self._cdp_session = await session.context.new_cdp_session(page)
+        self._cdp_session.on("Page.screencastFrame", self._on_frame)
+        await self._start()
+
+    async def _start(self):
+        params = {"format": "jpeg", "quality": self.quality, "everyNthFrame": self.every_nth_frame}
+        if self.max_width:
+            params["maxWidth"] = self.max_width
+        if self.max_height:
+            params["maxHeight"] = self.max_height
+        await self._cdp_session.send("Page.startScreencast", params)
+
+    async def _detach(self):
+        if self._cdp_session is not None:
+            try:
+                await self._cdp_session.send("Page.stopScreencast")
+                await self._cdp_session.detach()
+            except Exception as e:
+                logger.debug(f"Failed to stop screencast: {e}")
+        self._cdp_session = None
+        self._page = None
+
+    def _on_frame(self, params: dict):
+        cdp_session = self._cdp_session
+        if cdp_session is not None:
+            # Chromium stops sending frames until the previous one is acked
+            asyncio.create_task(self._ack(cdp_session, params["sessionId"]))
+
+        data = params["data"]
+        digest = hash(data)
+        if digest == self._latest_digest:
+            return
+        self._received += 1
+        if self._frame_ready.is_set():
+            # previous frame never reached the client
+            self._dropped += 1
+        self._latest_digest = digest
+        self._latest_frame = data
+        frame_cache = getattr(self.browser_context, "frame_cache", None)
+        if frame_cache is not None and self._page is not None:
+            frame_cache.publish(data, url=self._page.url, format="jpeg")
+        self._frame_ready.set()
+
+    @staticmethod
+    async def _ack(cdp_session, frame_session_id: int):
+        try:
+            await cdp_session.send("Page.screencastFrameAck", {"sessionId": frame_session_id})
+        except Exception:
+            pass
+
+    async def _adapt(self):
+        """Trade quality and frame rate against how many frames the consumer dropped"""
+        if self._received < self.ADAPT_INTERVAL:
+            return
+        drop_ratio = self._dropped / self._received
+        self._received = self._dropped = 0
+
+        quality, every_nth_frame = self.quality, self.every_nth_frame
+        if drop_ratio > 0.3:
+            quality = max(self.min_quality, quality - 10)
+            every_nth_frame = min(self.max_every_nth_frame, every_nth_frame + 1)
+        elif drop_ratio == 0:
+            quality = min(self.max_quality, quality + 5)
+            every_nth_frame = max(1, every_nth_frame - 1)
+        if (quality, every_nth_frame) == (self.quality, self.every_nth_frame):
+            return
+
+        logger.debug(f"Screencast backlog {drop_ratio:.0%}: quality {self.quality}->{quality}, "
+                     f"everyNthFrame {self.every_nth_frame}->{every_nth_frame}")
+        self.quality, self.every_nth_frame = quality, every_nth_frame
+        if self._cdp_session is not None:
+            await self._cdp_session.send("Page.stopScreencast")
+            await self._start()
+
+    async def next_frame(self, timeout: float = 1.0) -> Optional[str]:
+        """
+        Wait up to `timeout` seconds for a new frame.
+        Returns the base64 JPEG, or None when the page did not change.
+        """
+        await self._attach()
+        try:
+            await asyncio.wait_for(self._frame_ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._frame_ready.clear()
+        await self._adapt()
+        return self._latest_frame
+
+    async def close(self):
+        await self._detach()
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import pdb
 from typing import Optional, Type
@@ -23,17 +22,20 @@ from browser_use.controller.views import (
 from main_content_extractor import MainContentExtractor
 from pydantic import BaseModel
 
+from src.globals import _global_agent_state
 from src.utils.agent_state import AgentState
 
 logger = logging.getLogger(__name__)
 
 class CustomController(Controller):
     def __init__(self, exclude_actions: list[str] = [],
-                 output_model: Optional[Type[BaseModel]] = None
+                 output_model: Optional[Type[BaseModel]] = None,
+                 agent_state: Optional[AgentState] = None
                  ):
         super().__init__(exclude_actions=exclude_actions, output_model=output_model)
         self._register_custom_actions()
-        self.agent_state = AgentState()
+        # 未指定时使用默认会话的控制状态
+        self.agent_state = agent_state or _global_agent_state
 
     def _register_custom_actions(self):
         """Register all custom browser actions"""
@@ -68,16 +70,17 @@ class CustomController(Controller):
                 self.agent_state.set_user_control_active(True)  # 再次尝试设置
                 logger.info(f"重新尝试设置接管状态，时间戳: {self.agent_state.get_last_takeover_time()}")
                         
-            # 等待用户完成操作
-            while self.agent_state.is_user_control_active():
-                # logger.info(f"用户接管状态: {self.agent_state.is_user_control_active()}")
-                await asyncio.sleep(0.5)  # 每0.5秒检查一次状态
-            
-            logger.info("用户操作完成，恢复LLM控制")
+            # 等待用户完成操作，用户点击"完成操作"或停止任务时立即唤醒
+            finished = await self.agent_state.wait_for_user_control_finished()
             
             # 重置状态
             self.agent_state.set_user_control_active(False)
-            
+
+            if not finished:
+                logger.info("等待用户操作时收到停止请求")
+                return ActionResult(extracted_content="任务已停止，用户接管未完成。")
+
+            logger.info("用户操作完成，恢复LLM控制")
             return ActionResult(
                 extracted_content="用户操作已完成，LLM Agent继续执行。"
             )
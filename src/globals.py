@@ -1,13 +1,10 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from src.utils.agent_state import AgentState
+from src.session_manager import DEFAULT_SESSION_ID, SessionManager
 
-# Global variables for persistence
-_global_browser = None
-_global_browser_context = None
-_global_agent = None
-_last_known_takeover_time = 0  # 记录前端已知的最后接管时间
+# Session manager owning every (agent, browser, browser context, AgentState) set
+_session_manager = SessionManager()
 
-# Create the global agent state instance
-_global_agent_state = AgentState() 
\ No newline at end of file
+# 默认会话的控制状态，供未指定会话的调用使用（脚本、测试等）
+_global_agent_state = _session_manager.get_session(DEFAULT_SESSION_ID).agent_state
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional
+
+from src.utils.agent_state import AgentState
+
+logger = logging.getLogger(__name__)
+
+# 未指定会话时使用的会话ID（脚本调用、测试等）
+DEFAULT_SESSION_ID = "default"
+
+
+class SessionLimitError(Exception):
+    """Raised when no agent slot frees up within the admission timeout."""
+
+    def __init__(self, max_concurrent_sessions: int, timeout: float):
+        super().__init__(f"⏳ All {max_concurrent_sessions} agent slots are busy (waited {timeout:.0f}s). "
+                         f"Please retry later or raise `MAX_CONCURRENT_SESSIONS`.")
+
+
+class SessionBusyError(Exception):
+    """Raised when a session tries to start a second task while one is still running."""
+
+    def __init__(self, session_id: str):
+        super().__init__(f"⚠️ Session {session_id} is already running a task. "
+                         f"Stop it or wait for it to finish first.")
+
+
+@dataclass
+class AgentSession:
+    """一个会话独占的 agent、浏览器、浏览器上下文和控制状态"""
+
+    session_id: str
+    agent_state: AgentState = field(default_factory=AgentState)
+    browser: Optional[Any] = None
+    browser_context: Optional[Any] = None
+    agent: Optional[Any] = None
+    context_pool: Optional[Any] = None  # 浏览器上下文来自预热池时，关闭即归还
+    last_known_takeover_time: float = 0  # 记录前端已知的最后接管时间
+    last_active: float = field(default_factory=time.time)
+    running: bool = False
+    step_latency: str = ""  # 最近一次任务各阶段耗时汇总（markdown表格）
+
+    @property
+    def gif_path(self) -> str:
+        """本会话agent历史GIF的保存路径，避免并发会话互相覆盖"""
+        if self.session_id == DEFAULT_SESSION_ID:
+            return "agent_history.gif"
+        return os.path.join("./tmp/sessions", self.session_id, "agent_history.gif")
+
+    def touch(self):
+        self.last_active = time.time()
+
+    async def close_browser(self):
+        """关闭本会话的浏览器上下文和浏览器"""
+        if self.browser_context:
+            if self.context_pool is not None:
+                await self.context_pool.release(self.browser_context)
+            else:
+                await self.browser_context.close()
+            self.browser_context = None
+
+        if self.browser:
+            # 池中的浏览器由池管理，不在这里关闭
+            if self.context_pool is None:
+                await self.browser.close()
+            self.browser = None
+        self.context_pool = None
+
+
+class SessionManager:
+    """
+    管理多个相互隔离的 AgentSession，并对同时运行的任务数做准入控制。
+
+    - max_concurrent_sessions: 同时运行的任务上限（MAX_CONCURRENT_SESSIONS，默认CPU核数）
+    - admission_timeout: 排队等待空闲槽位的秒数，超时抛出 SessionLimitError（SESSION_ADMISSION_TIMEOUT）
+    - idle_timeout: 空闲会话被回收（关闭浏览器）的秒数（SESSION_IDLE_TIMEOUT）
+    """
+
+    def __init__(
+            self,
+            max_concurrent_sessions: Optional[int] = None,
+            admission_timeout: Optional[float] = None,
+            idle_timeout: Optional[float] = None,
+    ):
+        if max_concurrent_sessions is None:
+            max_concurrent_sessions = int(os.getenv("MAX_CONCURRENT_SESSIONS", "") or os.cpu_count() or 1)
+        if admission_timeout is None:
+            admission_timeout = float(os.getenv("SESSION_ADMISSION_TIMEOUT", "") or 60)
+        if idle_timeout is None:
+            idle_timeout = float(os.getenv("SESSION_IDLE_TIMEOUT", "") or 1800)
+
+        self.max_concurrent_sessions = max(1, max_concurrent_sessions)
+        self.admission_timeout = admission_timeout
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, AgentSession] = {}
+        self._slots = asyncio.Semaphore(self.max_concurrent_sessions)
+
+    def get_session(self, session_id: Optional[str] = None) -> AgentSession:
+        """获取会话，不存在则创建"""
+        session_id = session_id or DEFAULT_SESSION_ID
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = AgentSession(session_id=session_id)
+            self._sessions[session_id] = session
+            logger.info(f"Created session {session_id} ({len(self._sessions)} sessions)")
+        return session
+
+    def find_session(self, session_id: Optional[str] = None) -> Optional[AgentSession]:
+        """获取已存在的会话，不创建"""
+        return self._sessions.get(session_id or DEFAULT_SESSION_ID)
+
+    @property
+    def running_count(self) -> int:
+        return sum(1 for session in self._sessions.values() if session.running)
+
+    @asynccontextmanager
+    async def admit(self, session_id: Optional[str] = None) -> AsyncIterator[AgentSession]:
+        """
+        为会话申请一个运行槽位，退出时释放。
+        同一会话不能并发运行两个任务；所有槽位被占满时最多等待 admission_timeout 秒。
+        """
+        session = self.get_session(session_id)
+        if session.running:
+            raise SessionBusyError(session.session_id)
+        session.running = True
+
+        try:
+            await self.evict_idle_sessions()
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.admission_timeout)
+        except asyncio.TimeoutError:
+            session.running = False
+            raise SessionLimitError(self.max_concurrent_sessions, self.admission_timeout)
+        except BaseException:
+            session.running = False
+            raise
+
+        session.touch()
+        logger.info(f"Session {session.session_id} admitted "
+                    f"({self.running_count}/{self.max_concurrent_sessions} running)")
+        try:
+            yield session
+        finally:
+            session.running = False
+            session.agent = None
+            session.touch()
+            self._slots.release()
+
+    async def close_session(self, session_id: Optional[str] = None):
+        """关闭会话的浏览器并移除会话"""
+        session = self._sessions.pop(session_id or DEFAULT_SESSION_ID, None)
+        if session is None:
+            return
+        if session.agent is not None:
+            session.agent.stop()
+        await session.close_browser()
+        logger.info(f"Closed session {session.session_id}")
+
+    async def evict_idle_sessions(self):
+        """回收长时间空闲的会话，释放其保持打开的浏览器"""
+        now = time.time()
+        idle_ids = [
+            session_id for session_id, session in self._sessions.items()
+            if not session.running and now - session.last_active > self.idle_timeout
+        ]
+        for session_id in idle_ids:
+            logger.info(f"Evicting idle session {session_id}")
+            try:
+                if session_id == DEFAULT_SESSION_ID:
+                    # 默认会话的状态被 _global_agent_state 引用，只关闭浏览器
+                    await self._sessions[session_id].close_browser()
+                else:
+                    await self.close_session(session_id)
+            except Exception as e:
+                logger.warning(f"Failed to close idle session {session_id}: {e}")
+
+    async def close_all(self):
+        for session_id in list(self._sessions):
+            await self.close_session(session_id)
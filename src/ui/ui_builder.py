@@ -9,14 +9,16 @@ import gradio as gr
 
 from src.ui.themes import theme_map
 from src.ui.ui_handlers import (
-    check_takeover_requests,
-    close_global_browser,
+    close_session_browser,
     finish_browser_control,
+    get_step_latency,
     run_deep_search,
+    run_history_replay,
     run_with_stream,
     stop_agent,
     stop_research_agent,
     take_browser_control,
+    watch_takeover_requests,
 )
 from src.utils.utils import update_model_dropdown
 
@@ -90,27 +92,6 @@ def create_ui(config, theme_name="Ocean"):
             theme=theme_map[theme_name], 
             css=css
     ) as demo:
-        # 添加JavaScript轮询代码
-        polling_js = gr.HTML("""
-        <script>
-            function checkTakeoverStatus() {
-                // 通过调用隐藏元素的点击事件来触发后端函数
-                if(document.getElementById('polling_trigger')) {
-                    document.getElementById('polling_trigger').click();
-                }
-                setTimeout(checkTakeoverStatus, 1000); // 每秒检查一次
-            }
-            console.log("polling_js loaded")
-            
-            // 页面加载后开始轮询
-            setTimeout(checkTakeoverStatus, 1000);
-        </script>
-        <button id="polling_trigger" style="display: none;">Trigger Polling</button>
-        """, visible=True)
-
-        # 添加轮询触发器
-        polling_trigger = gr.Button(elem_id="polling_trigger", visible=True)
-
         with gr.Row():
             gr.Markdown(
                 """
@@ -358,6 +339,9 @@ def create_ui(config, theme_name="Ocean"):
                 recording_gif = gr.Image(label="Result GIF", format="gif")
                 trace_file = gr.File(label="Trace File")
                 agent_history_file = gr.File(label="Agent History")
+                # 不调用LLM重放上面的历史文件，也可以上传之前保存的历史文件
+                replay_button = gr.Button("🔁 Replay History", variant="secondary")
+                step_latency_output = gr.Markdown(visible=False)
 
             with gr.TabItem("🧐 Deep Research", id=5):
                 research_task_input = gr.Textbox(label="Research Task", lines=5,
@@ -403,6 +387,24 @@ def create_ui(config, theme_name="Ocean"):
                     stop_button,  # Stop button
                     run_button  # Run button
                 ],
+                concurrency_limit=None,  # 并发上限由 SessionManager 的准入控制负责
+            ).then(
+                # 任务结束后展示各阶段耗时
+                fn=get_step_latency,
+                inputs=[],
+                outputs=[step_latency_output],
+            )
+
+            # Replay the agent history file shown above
+            replay_button.click(
+                fn=run_history_replay,
+                inputs=[
+                    llm_provider, llm_model_name, llm_num_ctx, llm_temperature, llm_base_url, llm_api_key,
+                    use_own_browser, keep_browser_open, headless, disable_security, window_w, window_h,
+                    save_recording_path, save_trace_path, enable_recording, chrome_cdp, agent_history_file
+                ],
+                outputs=[final_result_output, errors_output, trace_file],
+                concurrency_limit=None,  # 并发上限由 SessionManager 的准入控制负责
             )
 
             # Run Deep Research
@@ -411,7 +413,8 @@ def create_ui(config, theme_name="Ocean"):
                 inputs=[research_task_input, max_search_iteration_input, max_query_per_iter_input, llm_provider,
                         llm_model_name, llm_num_ctx, llm_temperature, llm_base_url, llm_api_key, use_vision,
                         use_own_browser, headless, chrome_cdp],
-                outputs=[markdown_output_display, markdown_download, stop_research_button, research_button]
+                outputs=[markdown_output_display, markdown_download, stop_research_button, research_button],
+                concurrency_limit=None,  # 并发上限由 SessionManager 的准入控制负责
             )
             # Bind the stop button click event after errors_output is defined
             stop_research_button.click(
@@ -433,11 +436,13 @@ def create_ui(config, theme_name="Ocean"):
                 outputs=[take_control_button, finish_control_button, user_control_status, vnc_modal]
             )
             
-            # 绑定轮询触发器
-            polling_trigger.click(
-                fn=check_takeover_requests,
+            # 订阅接管状态推送：LLM请求接管或接管结束时立即更新界面
+            demo.load(
+                fn=watch_takeover_requests,
                 inputs=[],
-                outputs=[take_control_button, finish_control_button, user_control_status, vnc_modal]
+                outputs=[take_control_button, finish_control_button, user_control_status, vnc_modal],
+                concurrency_limit=None,
+                show_progress="hidden",
             )
             
             # 初始状态设置 - 不可点击完成操作按钮
@@ -541,7 +546,7 @@ def create_ui(config, theme_name="Ocean"):
             outputs=save_recording_path
         )
 
-        use_own_browser.change(fn=close_global_browser)
-        keep_browser_open.change(fn=close_global_browser)
+        use_own_browser.change(fn=close_session_browser)
+        keep_browser_open.change(fn=close_session_browser)
 
     return demo 
\ No newline at end of file
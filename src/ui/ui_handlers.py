@@ -9,26 +9,47 @@ import traceback
 
 import gradio as gr
 
-from src.globals import (
-    _global_agent,
-    _global_agent_state,
-    _global_browser,
-    _global_browser_context,
-    _last_known_takeover_time,
+from src.browser.screencast import ScreencastStream
+from src.globals import _session_manager
+from src.session_manager import (
+    DEFAULT_SESSION_ID,
+    AgentSession,
+    SessionBusyError,
+    SessionLimitError,
 )
 from src.utils.env_utils import resolve_sensitive_env_variables
-from src.utils.utils import MissingAPIKeyError, capture_screenshot, get_latest_files
+from src.utils.utils import MissingAPIKeyError, capture_frame, get_latest_files
 
 logger = logging.getLogger(__name__)
 
-async def stop_agent():
+# 实时画面无新帧时的最长等待秒数，期间仍会检查停止状态
+STREAM_FRAME_TIMEOUT = 0.5
+
+# 接管状态推送的最长等待秒数，超时后重新检查会话是否被回收
+TAKEOVER_WATCH_TIMEOUT = 30
+
+
+def get_session_id(request: gr.Request = None) -> str:
+    """每个浏览器标签页对应一个Gradio会话，以其session_hash作为会话ID"""
+    if request is not None and getattr(request, "session_hash", None):
+        return request.session_hash
+    return DEFAULT_SESSION_ID
+
+
+def get_session(request: gr.Request = None) -> AgentSession:
+    return _session_manager.get_session(get_session_id(request))
+
+
+async def stop_agent(request: gr.Request):
     """Request the agent to stop and update UI with enhanced feedback"""
-    global _global_agent
+    session = get_session(request)
 
     try:
-        if _global_agent is not None:
+        if session.agent is not None:
             # Request stop
-            _global_agent.stop()
+            session.agent.stop()
+        # 唤醒等待用户接管结束的 agent
+        session.agent_state.request_stop()
         # Update UI immediately
         message = "Stop requested - the agent will halt at the next safe point"
         logger.info(f"🛑 {message}")
@@ -47,13 +68,13 @@ async def stop_agent():
         )
 
 
-async def stop_research_agent():
+async def stop_research_agent(request: gr.Request):
     """Request the agent to stop and update UI with enhanced feedback"""
-    global _global_agent_state
+    session = get_session(request)
 
     try:
         # Request stop
-        _global_agent_state.request_stop()
+        session.agent_state.request_stop()
 
         # Update UI immediately
         message = "Stop requested - the agent will halt at the next safe point"
@@ -73,23 +94,17 @@ async def stop_research_agent():
         )
 
 
-async def close_global_browser():
-    global _global_browser, _global_browser_context
-
-    if _global_browser_context:
-        await _global_browser_context.close()
-        _global_browser_context = None
-
-    if _global_browser:
-        await _global_browser.close()
-        _global_browser = None
+async def close_session_browser(request: gr.Request):
+    session = _session_manager.find_session(get_session_id(request))
+    if session is not None and not session.running:
+        await session.close_browser()
 
 
 # 检查用户接管状态的函数
-def check_takeover_requests():
-    global _global_agent_state, _last_known_takeover_time
+def check_takeover_requests(request: gr.Request):
+    session = _session_manager.find_session(get_session_id(request))
     
-    if not _global_agent_state:
+    if session is None:
         return (
             gr.update(),  # take_control_button
             gr.update(),  # finish_control_button
@@ -98,15 +113,15 @@ def check_takeover_requests():
         )
     
     # 检查当前状态
-    is_active = _global_agent_state.is_user_control_active()
-    last_time = _global_agent_state.get_last_takeover_time()
+    is_active = session.agent_state.is_user_control_active()
+    last_time = session.agent_state.get_last_takeover_time()
     
     # 检测新的接管请求（状态为活跃且时间戳更新了）
-    new_request = is_active and last_time > _last_known_takeover_time
+    new_request = is_active and last_time > session.last_known_takeover_time
     logger.info(f"check_takeover_requests values {is_active} {last_time} {new_request}")
     if new_request:
         # 更新已知的最后接管时间
-        _last_known_takeover_time = last_time
+        session.last_known_takeover_time = last_time
         
         # 创建VNC链接
         vnc_url = "http://127.0.0.1:8080/index.html"
@@ -151,14 +166,29 @@ def check_takeover_requests():
         )
 
 
+# 推送接管状态：状态变化时才向前端发送更新，取代前端每秒轮询
+async def watch_takeover_requests(request: gr.Request):
+    version = None
+    session = None
+    while True:
+        # 会话可能因空闲被回收后重建，每轮重新获取
+        current = get_session(request)
+        if current is not session:
+            session, version = current, None
+        if version is None or version != session.agent_state.control_version:
+            version = session.agent_state.control_version
+            yield check_takeover_requests(request)
+        await session.agent_state.wait_for_control_change(version, timeout=TAKEOVER_WATCH_TIMEOUT)
+
+
 # 用户接管浏览器
-def take_browser_control():
-    global _global_agent_state, _last_known_takeover_time
+def take_browser_control(request: gr.Request):
+    session = get_session(request)
     
     # 设置状态
-    _global_agent_state.set_user_control_active(True)
+    session.agent_state.set_user_control_active(True)
     # 更新已知的最后接管时间
-    _last_known_takeover_time = _global_agent_state.get_last_takeover_time()
+    session.last_known_takeover_time = session.agent_state.get_last_takeover_time()
     
     # 创建新窗口链接
     # vnc_url = "http://127.0.0.1:8080/index.html"
@@ -198,12 +228,12 @@ def take_browser_control():
 
 
 # 用户完成操作
-def finish_browser_control():
+def finish_browser_control(request: gr.Request):
     logger.info("用户完成操作")
-    global _global_agent_state
+    session = get_session(request)
 
     # 重置用户接管状态
-    _global_agent_state.set_user_control_active(False)
+    session.agent_state.set_user_control_active(False)
     
     # 隐藏VNC窗口
     vnc_html = """
@@ -231,6 +261,14 @@ def finish_browser_control():
     )
 
 
+# 最近一次任务各阶段的耗时汇总
+def get_step_latency(request: gr.Request):
+    session = _session_manager.find_session(get_session_id(request))
+    if session is None or not session.step_latency:
+        return gr.update(value="", visible=False)
+    return gr.update(value=f"### ⏱️ Step Latency\n{session.step_latency}", visible=True)
+
+
 async def run_browser_agent(
         agent_type,
         llm_provider,
@@ -256,9 +294,12 @@ async def run_browser_agent(
         max_actions_per_step,
         tool_calling_method,
         chrome_cdp,
-        max_input_tokens
+        max_input_tokens,
+        request: gr.Request = None
 ):
     try:
+        session_id = get_session_id(request)
+
         # Disable recording if the checkbox is unchecked
         if not enable_recording:
             save_recording_path = None
@@ -308,7 +349,8 @@ async def run_browser_agent(
                 max_actions_per_step=max_actions_per_step,
                 tool_calling_method=tool_calling_method,
                 chrome_cdp=chrome_cdp,
-                max_input_tokens=max_input_tokens
+                max_input_tokens=max_input_tokens,
+                session_id=session_id
             )
         elif agent_type == "custom":
             final_result, errors, model_actions, model_thoughts, trace_file, history_file = await run_custom_agent(
@@ -329,12 +371,15 @@ async def run_browser_agent(
                 max_actions_per_step=max_actions_per_step,
                 tool_calling_method=tool_calling_method,
                 chrome_cdp=chrome_cdp,
-                max_input_tokens=max_input_tokens
+                max_input_tokens=max_input_tokens,
+                session_id=session_id
             )
         else:
             raise ValueError(f"Invalid agent type: {agent_type}")
 
-        gif_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "agent_history.gif")
+        gif_path = _session_manager.get_session(session_id).gif_path
+        if not os.path.isabs(gif_path):
+            gif_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), gif_path)
 
         return (
             final_result,
@@ -348,7 +393,7 @@ async def run_browser_agent(
             gr.update(interactive=True)  # Re-enable run button
         )
 
-    except MissingAPIKeyError as e:
+    except (MissingAPIKeyError, SessionLimitError, SessionBusyError) as e:
         logger.error(str(e))
         raise gr.Error(str(e), print_exception=False)
 
@@ -368,6 +413,66 @@ async def run_browser_agent(
         )
 
 
+async def run_history_replay(
+        llm_provider,
+        llm_model_name,
+        llm_num_ctx,
+        llm_temperature,
+        llm_base_url,
+        llm_api_key,
+        use_own_browser,
+        keep_browser_open,
+        headless,
+        disable_security,
+        window_w,
+        window_h,
+        save_recording_path,
+        save_trace_path,
+        enable_recording,
+        chrome_cdp,
+        history_file,
+        request: gr.Request = None
+):
+    """重放 Agent History 中的历史文件（上一次运行的输出或上传的文件）"""
+    try:
+        if not enable_recording:
+            save_recording_path = None
+        if save_recording_path:
+            os.makedirs(save_recording_path, exist_ok=True)
+
+        from src.utils import utils
+        llm = utils.get_llm_model(
+            provider=llm_provider,
+            model_name=llm_model_name,
+            num_ctx=llm_num_ctx,
+            temperature=llm_temperature,
+            base_url=llm_base_url,
+            api_key=llm_api_key,
+        )
+
+        from src.agent_runners import run_replay_agent
+
+        final_result, errors, trace_file = await run_replay_agent(
+            llm=llm,
+            use_own_browser=use_own_browser,
+            keep_browser_open=keep_browser_open,
+            headless=headless,
+            disable_security=disable_security,
+            window_w=window_w,
+            window_h=window_h,
+            save_recording_path=save_recording_path,
+            save_trace_path=save_trace_path,
+            history_file=history_file,
+            chrome_cdp=chrome_cdp,
+            session_id=get_session_id(request)
+        )
+        return final_result, errors, trace_file
+
+    except (MissingAPIKeyError, SessionLimitError, SessionBusyError) as e:
+        logger.error(str(e))
+        raise gr.Error(str(e), print_exception=False)
+
+
 async def run_with_stream(
         agent_type,
         llm_provider,
@@ -393,9 +498,10 @@ async def run_with_stream(
         max_actions_per_step,
         tool_calling_method,
         chrome_cdp,
-        max_input_tokens
+        max_input_tokens,
+        request: gr.Request
 ):
-    global _global_agent
+    session = get_session(request)
 
     stream_vw = 80
     stream_vh = int(80 * window_h // window_w)
@@ -425,7 +531,8 @@ async def run_with_stream(
             max_actions_per_step=max_actions_per_step,
             tool_calling_method=tool_calling_method,
             chrome_cdp=chrome_cdp,
-            max_input_tokens=max_input_tokens
+            max_input_tokens=max_input_tokens,
+            request=request
         )
         # Add HTML content at the start of the result array
         yield [gr.update(visible=False)] + list(result)
@@ -458,7 +565,8 @@ async def run_with_stream(
                     max_actions_per_step=max_actions_per_step,
                     tool_calling_method=tool_calling_method,
                     chrome_cdp=chrome_cdp,
-                    max_input_tokens=max_input_tokens
+                    max_input_tokens=max_input_tokens,
+                    request=request
                 )
             )
 
@@ -467,55 +575,92 @@ async def run_with_stream(
             final_result = errors = model_actions = model_thoughts = ""
             recording_gif = trace = history_file = None
 
-            # Periodically update the stream while the agent task is running
-            while not agent_task.done():
-                try:
-                    encoded_screenshot = await capture_screenshot(_global_browser_context)
-                    if encoded_screenshot is not None:
-                        html_content = f'<img src="data:image/jpeg;base64,{encoded_screenshot}" style="width:{stream_vw}vw; height:{stream_vh}vh ; border:1px solid #ccc;">'
-                    else:
-                        html_content = f"<h1 style='width:{stream_vw}vw; height:{stream_vh}vh'>Waiting for browser session...</h1>"
-                except Exception as e:
-                    html_content = f"<h1 style='width:{stream_vw}vw; height:{stream_vh}vh'>Waiting for browser session...</h1>"
-
-                if _global_agent and _global_agent.state.stopped:
-                    yield [
-                        gr.HTML(value=html_content, visible=True),
-                        final_result,
-                        errors,
-                        model_actions,
-                        model_thoughts,
-                        recording_gif,
-                        trace,
-                        history_file,
-                        gr.update(value="Stopping...", interactive=False),  # stop_button
-                        gr.update(interactive=False),  # run_button
-                    ]
-                    break
-                else:
-                    yield [
-                        gr.HTML(value=html_content, visible=True),
-                        final_result,
-                        errors,
-                        model_actions,
-                        model_thoughts,
-                        recording_gif,
-                        trace,
-                        history_file,
-                        gr.update(),  # Re-enable stop button
-                        gr.update()  # Re-enable run button
-                    ]
-                await asyncio.sleep(0.1)
+            yield [
+                gr.HTML(value=html_content, visible=True),
+                final_result,
+                errors,
+                model_actions,
+                model_thoughts,
+                recording_gif,
+                trace,
+                history_file,
+                gr.update(),
+                gr.update()
+            ]
+
+            # Push frames while the agent task is running; only repaints reach the client
+            screencast = None
+            try:
+                while not agent_task.done():
+                    browser_context = session.browser_context
+                    if screencast is None and browser_context is not None and browser_context.session is not None:
+                        screencast = ScreencastStream(browser_context)
+
+                    frame_url = None
+                    try:
+                        if screencast is not None:
+                            frame = await screencast.next_frame(timeout=STREAM_FRAME_TIMEOUT)
+                            if frame is not None:
+                                frame_url = f"data:image/jpeg;base64,{frame}"
+                        else:
+                            await asyncio.sleep(0.1)
+                    except Exception as e:
+                        # 页面关闭或CDP不可用时退回截图（优先复用agent刚截取的画面）
+                        logger.debug(f"Screencast unavailable, falling back to screenshots: {e}")
+                        frame = await capture_frame(browser_context) if browser_context else None
+                        if frame is not None:
+                            frame_url = frame.data_url
+                        await asyncio.sleep(0.1)
+
+                    new_frame = False
+                    if frame_url is not None:
+                        frame_html = f'<img src="{frame_url}" style="width:{stream_vw}vw; height:{stream_vh}vh ; border:1px solid #ccc;">'
+                        new_frame = frame_html != html_content
+                        html_content = frame_html
+
+                    if session.agent and session.agent.state.stopped:
+                        yield [
+                            gr.HTML(value=html_content, visible=True),
+                            final_result,
+                            errors,
+                            model_actions,
+                            model_thoughts,
+                            recording_gif,
+                            trace,
+                            history_file,
+                            gr.update(value="Stopping...", interactive=False),  # stop_button
+                            gr.update(interactive=False),  # run_button
+                        ]
+                        break
+                    elif new_frame:
+                        yield [
+                            gr.HTML(value=html_content, visible=True),
+                            final_result,
+                            errors,
+                            model_actions,
+                            model_thoughts,
+                            recording_gif,
+                            trace,
+                            history_file,
+                            gr.update(),  # Re-enable stop button
+                            gr.update()  # Re-enable run button
+                        ]
+            finally:
+                if screencast is not None:
+                    await screencast.close()
 
             # Once the agent task completes, get the results
             try:
                 result = await agent_task
                 final_result, errors, model_actions, model_thoughts, recording_gif, trace, history_file, stop_button, run_button = result
-            except gr.Error:
+            except gr.Error as e:
                 final_result = ""
+                errors = str(e)
                 model_actions = ""
                 model_thoughts = ""
                 recording_gif = trace = history_file = None
+                stop_button = gr.update(value="Stop", interactive=True)
+                run_button = gr.update(interactive=True)
 
             except Exception as e:
                 errors = f"Agent error: {str(e)}"
@@ -553,29 +698,33 @@ async def run_with_stream(
 
 async def run_deep_search(research_task, max_search_iteration_input, max_query_per_iter_input, llm_provider,
                           llm_model_name, llm_num_ctx, llm_temperature, llm_base_url, llm_api_key, use_vision,
-                          use_own_browser, headless, chrome_cdp):
+                          use_own_browser, headless, chrome_cdp, request: gr.Request):
     from src.utils import utils
     from src.utils.deep_research import deep_research
-    global _global_agent_state
-
-    # Clear any previous stop request
-    _global_agent_state.clear_stop()
-
-    llm = utils.get_llm_model(
-        provider=llm_provider,
-        model_name=llm_model_name,
-        num_ctx=llm_num_ctx,
-        temperature=llm_temperature,
-        base_url=llm_base_url,
-        api_key=llm_api_key,
-    )
-    markdown_content, file_path = await deep_research(research_task, llm, _global_agent_state,
-                                                      max_search_iterations=max_search_iteration_input,
-                                                      max_query_num=max_query_per_iter_input,
-                                                      use_vision=use_vision,
-                                                      headless=headless,
-                                                      use_own_browser=use_own_browser,
-                                                      chrome_cdp=chrome_cdp
-                                                      )
+
+    try:
+        async with _session_manager.admit(get_session_id(request)) as session:
+            # Clear any previous stop request
+            session.agent_state.clear_stop()
+
+            llm = utils.get_llm_model(
+                provider=llm_provider,
+                model_name=llm_model_name,
+                num_ctx=llm_num_ctx,
+                temperature=llm_temperature,
+                base_url=llm_base_url,
+                api_key=llm_api_key,
+            )
+            markdown_content, file_path = await deep_research(research_task, llm, session.agent_state,
+                                                              max_search_iterations=max_search_iteration_input,
+                                                              max_query_num=max_query_per_iter_input,
+                                                              use_vision=use_vision,
+                                                              headless=headless,
+                                                              use_own_browser=use_own_browser,
+                                                              chrome_cdp=chrome_cdp
+                                                              )
+    except (MissingAPIKeyError, SessionLimitError, SessionBusyError) as e:
+        logger.error(str(e))
+        raise gr.Error(str(e), print_exception=False)
 
     return markdown_content, file_path, gr.update(value="Stop", interactive=True), gr.update(interactive=True) 
\ No newline at end of file
@@ -3,6 +3,7 @@ import logging
 import threading
 import time
 import uuid
+from typing import List, Optional, Tuple
 
 from browser_use.agent.message_manager.views import MessageManagerState
 from browser_use.agent.views import ActionResult, AgentHistoryList
@@ -10,46 +11,114 @@ from browser_use.agent.views import ActionResult, AgentHistoryList
 logger = logging.getLogger(__name__)
 
 class AgentState:
-    _instance = None
-
-    def __init__(self):
-        if not hasattr(self, '_stop_requested'):
-            self._stop_requested = asyncio.Event()
-            self.last_valid_state = None  # store the last valid browser state
-            self.agent_id = str(uuid.uuid4())  # 生成唯一的agent_id
-            self.stopped = False  # 标记agent是否已停止
-            self.next_suggested_action = None  # 下一个建议的操作
-            self.message_manager_state = MessageManagerState()  # 添加message_manager_state属性
-            self.history = AgentHistoryList(history=[])  # 添加history属性
-            self.n_steps = 0  # 添加n_steps属性，用于跟踪执行步骤数
-            self.consecutive_failures = 0  # 添加consecutive_failures属性，用于跟踪连续失败次数
-            self.paused = False  # 添加paused属性，用于标记agent是否暂停
-            self.last_action = None  # 添加last_action属性，用于记录上一个执行的操作
-            self.extracted_content = None  # 添加extracted_content属性，用于存储提取的内容
-            self.last_result = []  # 添加last_result属性，用于记录上一个操作的结果
-            self.user_control_active = False  # 添加user_control_active属性，用于标记是否处于用户接管状态
-            self.last_takeover_time = 0  # 添加时间戳字段，记录最后一次请求接管的时间
-            self._polling_thread = None  # 用于存储轮询线程
-            self._stop_polling = False  # 用于停止轮询线程
-
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(AgentState, cls).__new__(cls)
-        return cls._instance
+    """
+    Agent运行状态。
+
+    每个会话持有一个独立实例（见 src/session_manager.py）。传入 parent 时，停止请求、
+    建议操作和用户接管等控制标志委托给 parent，便于多个 agent 共享同一个会话的控制面，
+    而步数、历史、消息等运行数据仍各自独立。
+
+    控制标志每次变化都会递增 control_version 并唤醒等待者，agent 和 UI 通过
+    wait_for_user_control_finished / wait_for_control_change 等待，无需轮询。
+    Gradio 的同步回调运行在线程池中，所以唤醒通过 call_soon_threadsafe 投递到等待者所在的事件循环。
+    """
+
+    def __init__(self, parent: Optional["AgentState"] = None):
+        self._parent = parent
+        self._stop_requested = asyncio.Event()
+        self.last_valid_state = None  # store the last valid browser state
+        self.agent_id = str(uuid.uuid4())  # 生成唯一的agent_id
+        self.stopped = False  # 标记agent是否已停止
+        self.next_suggested_action = None  # 下一个建议的操作
+        self.message_manager_state = MessageManagerState()  # 添加message_manager_state属性
+        self.history = AgentHistoryList(history=[])  # 添加history属性
+        self.n_steps = 0  # 添加n_steps属性，用于跟踪执行步骤数
+        self.consecutive_failures = 0  # 添加consecutive_failures属性，用于跟踪连续失败次数
+        self.paused = False  # 添加paused属性，用于标记agent是否暂停
+        self.last_action = None  # 添加last_action属性，用于记录上一个执行的操作
+        self.extracted_content = None  # 添加extracted_content属性，用于存储提取的内容
+        self.last_result = []  # 添加last_result属性，用于记录上一个操作的结果
+        self.user_control_active = False  # 添加user_control_active属性，用于标记是否处于用户接管状态
+        self.last_takeover_time = 0  # 添加时间戳字段，记录最后一次请求接管的时间
+        self.last_screenshot_hash = None  # 最后一次发送给模型的截图的 (感知哈希, url)
+        self.consecutive_screenshots_skipped = 0  # 连续跳过的截图数
+        self.screenshots_sent = 0  # 发送给模型的截图数
+        self.screenshots_skipped = 0  # 因画面未变化而跳过的截图数
+        self.screenshot_tokens_saved = 0  # 跳过截图节省的估算token数
+        self.control_version = 0  # 控制标志（接管/停止）每变化一次加一
+        self._control_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._control_lock = threading.Lock()
+
+    def _control(self) -> "AgentState":
+        """返回持有控制标志的状态对象（最顶层的 parent）"""
+        return self._parent._control() if self._parent is not None else self
+
+    def _notify_control_change(self):
+        """递增控制版本号并唤醒所有等待者（可在任意线程调用）"""
+        control = self._control()
+        with control._control_lock:
+            control.control_version += 1
+            waiters, control._control_waiters = control._control_waiters, []
+        for loop, future in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_resolve_waiter, future)
+
+    async def wait_for_control_change(self, version: Optional[int] = None,
+                                      timeout: Optional[float] = None) -> int:
+        """
+        等待控制标志变化，返回最新的 control_version。
+        version 为调用方已知的版本号，若已过期则立即返回；timeout 秒内无变化也返回。
+        """
+        control = self._control()
+        loop = asyncio.get_running_loop()
+        with control._control_lock:
+            if version is not None and version != control.control_version:
+                return control.control_version
+            future = loop.create_future()
+            control._control_waiters.append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with control._control_lock:
+                if (loop, future) in control._control_waiters:
+                    control._control_waiters.remove((loop, future))
+        return control.control_version
+
+    async def wait_for_user_control_finished(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待用户接管结束或收到停止请求。
+        返回 True 表示用户已交还控制权，False 表示停止或超时。
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            version = self._control().control_version
+            if self.is_stop_requested():
+                return False
+            if not self.is_user_control_active():
+                return True
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            await self.wait_for_control_change(version, timeout=remaining)
 
     def request_stop(self):
-        self._stop_requested.set()
+        self._control()._stop_requested.set()
         self.stopped = True
+        self._notify_control_change()
 
     def clear_stop(self):
-        self._stop_requested.clear()
+        control = self._control()
+        control._stop_requested.clear()
         self.last_valid_state = None
         self.stopped = False
-        self.next_suggested_action = None  # 重置建议操作
-        self.user_control_active = False  # 重置用户接管状态
+        control.next_suggested_action = None  # 重置建议操作
+        control.user_control_active = False  # 重置用户接管状态
+        self._notify_control_change()
 
     def is_stop_requested(self):
-        return self._stop_requested.is_set()
+        return self._control()._stop_requested.is_set()
 
     def set_last_valid_state(self, state):
         self.last_valid_state = state
@@ -59,57 +128,35 @@ class AgentState:
 
     def suggest_next_action(self, action_name):
         """设置下一个建议操作"""
-        self.next_suggested_action = action_name
+        self._control().next_suggested_action = action_name
         
     def get_next_suggested_action(self):
         """获取并清除下一个建议操作"""
-        action = self.next_suggested_action
-        self.next_suggested_action = None
+        control = self._control()
+        action = control.next_suggested_action
+        control.next_suggested_action = None
         return action
 
     def set_user_control_active(self, active: bool):
-        """设置用户接管状态"""
-        self.user_control_active = active
+        """设置用户接管状态，并通知等待接管开始/结束的 agent 和 UI"""
+        control = self._control()
         if active:
             # 如果是激活用户接管，记录时间戳
-            self.last_takeover_time = time.time()
+            control.last_takeover_time = time.time()
+        elif not control.user_control_active:
+            return
+        control.user_control_active = active
+        self._notify_control_change()
 
     def is_user_control_active(self) -> bool:
         """检查是否处于用户接管状态"""
-        return self.user_control_active
+        return self._control().user_control_active
 
     def get_last_takeover_time(self) -> float:
         """获取最后一次请求接管的时间戳"""
-        return self.last_takeover_time
-        
-    def start_status_polling(self):
-        """启动状态轮询，周期性触发状态更新，确保前端能检测到变化"""
-        if self._polling_thread is not None and self._polling_thread.is_alive():
-            logger.info("状态轮询线程已在运行")
-            return
-            
-        self._stop_polling = False
-        
-        def _polling_func():
-            logger.info("启动状态轮询线程")
-            count = 0
-            while not self._stop_polling:
-                # 每隔3秒微调时间戳，确保前端能检测到变化
-                if count % 3 == 0 and self.user_control_active:
-                    old_time = self.last_takeover_time
-                    self.last_takeover_time = time.time()
-                    logger.info(f"状态轮询: 更新接管时间戳 {old_time} -> {self.last_takeover_time}")
-                
-                time.sleep(1)
-                count += 1
-                
-        self._polling_thread = threading.Thread(target=_polling_func, daemon=True)
-        self._polling_thread.start()
-        
-    def stop_status_polling(self):
-        """停止状态轮询线程"""
-        if self._polling_thread is not None and self._polling_thread.is_alive():
-            logger.info("停止状态轮询线程")
-            self._stop_polling = True
-            self._polling_thread.join(timeout=2.0)
-            self._polling_thread = None
\ No newline at end of file
+        return self._control().last_takeover_time
+
+
+def _resolve_waiter(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,287 @@
+import asyncio
+import html as html_lib
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+from main_content_extractor import MainContentExtractor
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+# tasks awaited per pool, and pools that take no new work
+_running_tasks: Dict[ProcessPoolExecutor, int] = {}
+_retired_executors: Set[ProcessPoolExecutor] = set()
+
+
+def _extract(html: str, output_format: str) -> str:
+    return MainContentExtractor.extract(html=html, output_format=output_format)  # type: ignore
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    """
+    Shared extraction pool with EXTRACT_PROCESS_WORKERS workers (default: cpu count, at most 4);
+    None when set to 0, in which case extraction runs in a thread instead.
+    """
+    global _executor
+    workers = int(os.getenv("EXTRACT_PROCESS_WORKERS", "") or min(4, os.cpu_count() or 1))
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a process that runs Playwright and asyncio is not safe
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _retire_executor(executor: ProcessPoolExecutor):
+    """Send new work to a fresh pool; this one is shut down once nobody waits for it any more"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+        _retired_executors.add(executor)
+    _recycle_if_drained(executor)
+
+
+def _recycle_if_drained(executor: ProcessPoolExecutor):
+    with _executor_lock:
+        if executor not in _retired_executors or _running_tasks.get(executor):
+            return
+        _retired_executors.discard(executor)
+        _running_tasks.pop(executor, None)
+    # an abandoned parse keeps its worker busy, the pool can't cancel running tasks
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_in_pool(executor: ProcessPoolExecutor, fn, *args, timeout: float):
+    """
+    fn(*args) in the pool. A timeout abandons only this task: the pool is retired and
+    recycled once the other tasks running in it are done.
+    """
+    with _executor_lock:
+        _running_tasks[executor] = _running_tasks.get(executor, 0) + 1
+    try:
+        return await asyncio.wait_for(asyncio.get_running_loop().run_in_executor(executor, fn, *args),
+                                      timeout=timeout)
+    except asyncio.TimeoutError:
+        _retire_executor(executor)
+        raise
+    finally:
+        with _executor_lock:
+            _running_tasks[executor] -= 1
+        _recycle_if_drained(executor)
+
+
+async def extract_main_content(html: str, output_format: str = "markdown", timeout: Optional[float] = None) -> str:
+    """
+    Run MainContentExtractor.extract in the process pool so large pages don't hold the event loop.
+    HTML longer than EXTRACT_MAX_HTML_CHARS is truncated; raises asyncio.TimeoutError after
+    `timeout` seconds (EXTRACT_TIMEOUT, default 30).
+    """
+    max_chars = int(os.getenv("EXTRACT_MAX_HTML_CHARS", "") or 5_000_000)
+    if len(html) > max_chars:
+        logger.warning(f"HTML of {len(html)} chars truncated to {max_chars} before extraction")
+        html = html[:max_chars]
+    if timeout is None:
+        timeout = float(os.getenv("EXTRACT_TIMEOUT", "") or 30)
+
+    executor = _get_executor()
+    if executor is None:
+        return await asyncio.wait_for(asyncio.to_thread(_extract, html, output_format), timeout=timeout)
+
+    try:
+        return await _run_in_pool(executor, _extract, html, output_format, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Content extraction timed out after {timeout}s, moving new extractions to fresh workers")
+        raise
+    except BrokenProcessPool:
+        # every caller whose task was lost in the dead pool retries once
+        logger.warning("Extraction worker died, retrying in a new pool")
+        _retire_executor(executor)
+        return await _run_in_pool(_get_executor(), _extract, html, output_format, timeout=timeout)
+
+
+def shutdown_extraction_pool():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    html: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+class HttpFetcher:
+    """
+    Async HTTP client for reading pages without a browser.
+
+    One keep-alive connection pool (gzip / deflate, and br when brotli is installed) is
+    shared by all fetches, and at most `per_host_limit` requests hit the same host at once.
+    """
+
+    USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36")
+
+    def __init__(self, max_connections: int = 20, per_host_limit: int = 4, timeout: float = 15,
+                 max_bytes: int = 10 * 1024 * 1024):
+        self.per_host_limit = per_host_limit
+        self.max_bytes = max_bytes
+        self._client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            headers={"User-Agent": self.USER_AGENT,
+                     "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.5"},
+        )
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def fetch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> FetchResult:
+        """GET url; with etag / last_modified the request is conditional and may return 304"""
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+        async with semaphore:
+            async with self._client.stream("GET", url, headers=headers) as response:
+                result = FetchResult(url=str(response.url), status=response.status_code,
+                                     etag=response.headers.get("etag"),
+                                     last_modified=response.headers.get("last-modified"))
+                content_type = response.headers.get("content-type", "")
+                if response.status_code != 200 or "html" not in content_type:
+                    return result
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body.extend(chunk)
+                    if len(body) > self.max_bytes:
+                        # too large to be worth parsing here, leave it to the browser
+                        return FetchResult(url=result.url, status=413)
+                result.html = body.decode(response.encoding or "utf-8", errors="replace")
+                return result
+
+    async def close(self):
+        await self._client.aclose()
+
+
+# httpx connection pools belong to the event loop that created them
+_http_fetchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, HttpFetcher]" = weakref.WeakKeyDictionary()
+
+
+def get_http_fetcher() -> HttpFetcher:
+    """Fetcher of the running event loop, sized by HTTP_FETCH_MAX_CONNECTIONS / HTTP_FETCH_PER_HOST"""
+    loop = asyncio.get_running_loop()
+    fetcher = _http_fetchers.get(loop)
+    if fetcher is None:
+        fetcher = HttpFetcher(
+            max_connections=int(os.getenv("HTTP_FETCH_MAX_CONNECTIONS", "") or 20),
+            per_host_limit=int(os.getenv("HTTP_FETCH_PER_HOST", "") or 4),
+            timeout=float(os.getenv("HTTP_FETCH_TIMEOUT", "") or 15),
+        )
+        _http_fetchers[loop] = fetcher
+    return fetcher
+
+
+_TITLE_PATTERN = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+# Redirects to these paths mean the page is behind a login
+_LOGIN_PATH_PATTERN = re.compile(r"/(log-?in|sign-?in|signon|auth|sso|session)(/|$|\?)", re.IGNORECASE)
+_PASSWORD_INPUT_PATTERN = re.compile(r"<input[^>]+type\s*=\s*[\"']?password", re.IGNORECASE)
+# schema.org marker of paywalled articles
+_PAYWALL_PATTERN = re.compile(r"[\"']isAccessibleForFree[\"']\s*:\s*(false|[\"']false[\"'])", re.IGNORECASE)
+
+
+def page_title(html: str) -> str:
+    match = _TITLE_PATTERN.search(html)
+    return " ".join(html_lib.unescape(match.group(1)).split()) if match else ""
+
+
+def format_page_content(title: str, url: str, markdown: str) -> str:
+    """Same header as the jina reader output of the browser path"""
+    return f"Title: {title}\n\nURL Source: {url}\n\nMarkdown Content:\n{markdown}"
+
+
+def is_restricted_page(requested_url: str, final_url: str, html: str) -> bool:
+    """Login form or paywall: the browser, with the user's session, may see more than plain HTTP"""
+    if final_url != requested_url and _LOGIN_PATH_PATTERN.search(urlsplit(final_url).path):
+        return True
+    return bool(_PASSWORD_INPUT_PATTERN.search(html) or _PAYWALL_PATTERN.search(html))
+
+
+async def fetch_page_content(url: str, extract_cache=None, min_chars: Optional[int] = None) -> Optional[str]:
+    """
+    Markdown of url read over plain HTTP, under the same `Title: / URL Source: / Markdown Content:`
+    header as the browser path, or None when the page needs the browser (not HTML, an error
+    status, a login or paywall page, or too little text without JavaScript).
+
+    A fresh cache entry is returned directly; a stale one is revalidated with a
+    conditional request and reused on 304.
+    """
+    if min_chars is None:
+        min_chars = int(os.getenv("HTTP_FETCH_MIN_CHARS", "") or 500)
+    if not url.startswith(("http://", "https://")):
+        return None
+
+    entry = extract_cache.lookup(url) if extract_cache else None
+    if entry is not None and extract_cache.is_fresh(entry):
+        content = extract_cache.read(entry)
+        if content is not None:
+            return content
+
+    try:
+        result = await get_http_fetcher().fetch(url, etag=entry.etag if entry else None,
+                                                last_modified=entry.last_modified if entry else None)
+    except httpx.HTTPError as e:
+        logger.debug(f"HTTP fetch of {url} failed: {e}")
+        return None
+
+    if result.not_modified and entry is not None:
+        content = extract_cache.read(entry)
+        if content is not None:
+            extract_cache.touch(url)
+            return content
+        return None
+    if not result.html:
+        return None
+    if is_restricted_page(url, result.url, result.html):
+        logger.debug(f"{url} is behind a login or paywall, using the browser")
+        return None
+
+    try:
+        content = await extract_main_content(result.html)
+    except asyncio.TimeoutError:
+        return None
+    content = (content or "").strip()
+    if len(content) < min_chars:
+        # most likely rendered by JavaScript
+        logger.debug(f"Only {len(content)} chars extracted from {url} over HTTP, using the browser")
+        return None
+    content = format_page_content(page_title(result.html), result.url, content)
+    if extract_cache:
+        extract_cache.put(url, content, etag=result.etag, last_modified=result.last_modified)
+    return content
@@ -13,7 +13,7 @@ from pprint import pprint
 from uuid import uuid4
 
 from browser_use.agent.service import Agent
-from browser_use.agent.views import ActionResult
+from browser_use.agent.views import ActionResult, AgentHistoryList
 from browser_use.browser.browser import Browser, BrowserConfig
 from browser_use.browser.context import (
     BrowserContext,
@@ -23,14 +23,20 @@ from browser_use.browser.context import (
 from browser_use.controller.service import Controller, DoneAction
 from json_repair import repair_json
 from langchain.schema import HumanMessage, SystemMessage
-from main_content_extractor import MainContentExtractor
 
 from src.agent.custom_agent import CustomAgent
 from src.agent.custom_prompts import CustomAgentMessagePrompt, CustomSystemPrompt
+from src.agent.custom_views import CustomAgentState
+from src.browser.context_pool import get_context_pool
 from src.browser.custom_browser import CustomBrowser
 from src.browser.custom_context import BrowserContext, BrowserContextConfig
 from src.controller.custom_controller import CustomController
 from src.utils import utils
+from src.utils.content_extraction import extract_main_content, fetch_page_content
+from src.utils.extract_cache import get_extract_cache
+from src.utils.llm_cache import cached_ainvoke
+from src.utils.record_index import RecordIndex, dedupe_record_infos
+from src.utils.report_builder import generate_sectioned_report
 
 logger = logging.getLogger(__name__)
 
@@ -44,13 +50,22 @@ async def deep_research(task, llm, agent_state=None, **kwargs):
     # max qyery num per iteration
     max_query_num = kwargs.get("max_query_num", 3)
 
+    # max browser agents running at the same time
+    max_concurrent_queries = max(1, int(kwargs.get("max_concurrent_queries", 0)
+                                        or os.getenv("DEEP_RESEARCH_MAX_CONCURRENCY", "")
+                                        or 3))
+
+    # max recorder LLM calls in flight at the same time
+    llm_semaphore = asyncio.Semaphore(max(1, int(kwargs.get("max_concurrent_llm_calls", 0)
+                                                 or os.getenv("DEEP_RESEARCH_LLM_CONCURRENCY", "")
+                                                 or 4)))
+
     use_own_browser = kwargs.get("use_own_browser", False)
     extra_chromium_args = []
+    context_pool = None
 
     if use_own_browser:
         cdp_url = os.getenv("CHROME_CDP", kwargs.get("chrome_cdp", None))
-        # TODO: if use own browser, max query num must be 1 per iter, how to solve it?
-        max_query_num = 1
         chrome_path = os.getenv("CHROME_PATH", None)
         if chrome_path == "":
             chrome_path = None
@@ -67,12 +82,17 @@ async def deep_research(task, llm, agent_state=None, **kwargs):
                 extra_chromium_args=extra_chromium_args,
             )
         )
-        browser_context = await browser.new_context()
     else:
         browser = None
-        browser_context = None
+        # lease pre-warmed contexts instead of launching a browser per agent
+        context_pool = get_context_pool(headless=kwargs.get("headless", False),
+                                        disable_security=kwargs.get("disable_security", True))
 
-    controller = CustomController()
+    controller = CustomController(agent_state=agent_state)
+    # extracted markdown shared across queries and research runs
+    extract_cache = get_extract_cache()
+    # "http": try a plain HTTP fetch before the browser, "browser": always use the browser
+    extract_mode = kwargs.get("extract_mode") or os.getenv("DEEP_RESEARCH_EXTRACT_MODE", "") or "http"
 
     @controller.registry.action(
         'Extract page content to get the pure markdown.',
@@ -82,15 +102,28 @@ async def deep_research(task, llm, agent_state=None, **kwargs):
         # use jina reader
         url = page.url
 
-        jina_url = f"https://r.jina.ai/{url}"
-        await page.goto(jina_url)
-        output_format = 'markdown'
-        content = MainContentExtractor.extract(  # type: ignore
-            html=await page.content(),
-            output_format=output_format,
-        )
-        # go back to org url
-        await page.go_back()
+        if extract_mode == "http" and not use_own_browser:
+            # static pages are read over plain HTTP (or from the cache) without touching the browser;
+            # the user's own browser carries their sessions, which plain HTTP would not see
+            content = await fetch_page_content(url, extract_cache)
+        else:
+            content = extract_cache.get(url) if extract_cache else None
+        if content is not None:
+            logger.info(f"Extracted page content of {url} without the browser")
+        else:
+            jina_url = f"https://r.jina.ai/{url}"
+            await page.goto(jina_url)
+            output_format = 'markdown'
+            html = await page.content()
+            # go back to org url
+            await page.go_back()
+            try:
+                # parse in the extraction process pool, large pages would block the event loop
+                content = await extract_main_content(html=html, output_format=output_format)
+            except asyncio.TimeoutError:
+                return ActionResult(error=f"Timed out extracting page content of {url}")
+            if extract_cache and content:
+                extract_cache.put(url, content)
         msg = f'Extracted page content:\n{content}\n'
         logger.info(msg)
         return ActionResult(extracted_content=msg)
@@ -136,13 +169,13 @@ async def deep_research(task, llm, agent_state=None, **kwargs):
     search_messages = [SystemMessage(content=search_system_prompt)]
 
     record_system_prompt = """
-    You are an expert information recorder. Your role is to process user instructions, current search results, and previously recorded information to extract, summarize, and record new, useful information that helps fulfill the user's request. Your output will be a JSON formatted list, where each element represents a piece of extracted information and follows the structure: `{"url": "source_url", "title": "source_title", "summary_content": "concise_summary", "thinking": "reasoning"}`.
+    You are an expert information recorder. Your role is to process user instructions and current search results to extract, summarize, and record useful information that helps fulfill the user's request. Your output will be a JSON formatted list, where each element represents a piece of extracted information and follows the structure: `{"url": "source_url", "title": "source_title", "summary_content": "concise_summary", "thinking": "reasoning"}`.
 
 **Important Considerations:**
 
 1. **Minimize Information Loss:** While concise, prioritize retaining important details and nuances from the sources. Aim for a summary that captures the essence of the information without over-simplification. **Crucially, ensure to preserve key data and figures within the `summary_content`. This is essential for later stages, such as generating tables and reports.**
 
-2. **Avoid Redundancy:** Do not record information that is already present in the Previous Recorded Information. Check for semantic similarity, not just exact matches. However, if the same information is expressed differently in a new source and this variation adds valuable context or clarity, it should be included.
+2. **Avoid Redundancy:** Do not record the same piece of information twice within your output. Records from other searches are deduplicated afterwards, so focus only on the Current Search Results.
 
 3. **Source Information:** Extract and include the source title and URL for each piece of information summarized. This is crucial for verification and context. **The Current Search Results are provided in a specific format, where each item starts with "Title:", followed by the title, then "URL Source:", followed by the URL, and finally "Markdown Content:", followed by the content. Please extract the title and URL from this structure.** If a piece of information cannot be attributed to a specific source from the provided search results, use `"url": "unknown"` and `"title": "unknown"`.
 
@@ -173,10 +206,9 @@ Provide your output as a JSON formatted list. Each item in the list must adhere
 **Inputs:**
 
 1. **User Instruction:** The original instruction given by the user. This helps you determine what kind of information will be useful and how to structure your thinking.
-2. **Previous Recorded Information:** Textual data gathered and recorded from previous searches and processing, represented as a single text string.
-3. **Current Search Plan:** Research plan for current search.
-4. **Current Search Query:** The current search query.
-5. **Current Search Results:** Textual data gathered from the most recent search query.
+2. **Current Search Plan:** Research plan for current search.
+3. **Current Search Query:** The current search query.
+4. **Current Search Results:** Textual data gathered from the most recent search query.
     """
     record_messages = [SystemMessage(content=record_system_prompt)]
 
@@ -185,7 +217,9 @@ Provide your output as a JSON formatted list. Each item in the list must adhere
     use_vision = kwargs.get("use_vision", False)
 
     history_query = []
-    history_infos = []
+    # deduplicated records; near-duplicate summaries are dropped as they come in
+    record_index = RecordIndex()
+    history_infos = record_index.records
     try:
         while search_iteration < max_search_iterations:
             search_iteration += 1
@@ -194,7 +228,7 @@ Provide your output as a JSON formatted list. Each item in the list must adhere
             history_infos_ = json.dumps(history_infos, indent=4)
             query_prompt = f"This is search {search_iteration} of {max_search_iterations} maximum searches allowed.\n User Instruction:{task} \n Previous Queries:\n {history_query_} \n Previous Search Results:\n {history_infos_}\n"
             search_messages.append(HumanMessage(content=query_prompt))
-            ai_query_msg = llm.invoke(search_messages[:1] + search_messages[1:][-1:])
+            ai_query_msg = await cached_ainvoke(llm, search_messages[:1] + search_messages[1:][-1:])
             search_messages.append(ai_query_msg)
             if hasattr(ai_query_msg, "reasoning_content"):
                 logger.info("🤯 Start Search Deep Thinking: ")
@@ -219,43 +253,11 @@ Provide your output as a JSON formatted list. Each item in the list must adhere
             # Parallel BU agents
             add_infos = "1. Please click on the most relevant link to get information and go deeper, instead of just staying on the search page. \n" \
                         "2. When opening a PDF file, please remember to extract the content using extract_content instead of simply opening it for the user to view.\n"
-            if use_own_browser:
-                agent = CustomAgent(
-                    task=query_tasks[0],
-                    llm=llm,
-                    add_infos=add_infos,
-                    browser=browser,
-                    browser_context=browser_context,
-                    use_vision=use_vision,
-                    system_prompt_class=CustomSystemPrompt,
-                    agent_prompt_class=CustomAgentMessagePrompt,
-                    max_actions_per_step=5,
-                    controller=controller
-                )
-                agent_result = await agent.run(max_steps=kwargs.get("max_steps", 10))
-                query_results = [agent_result]
-                # Manually close all tab
-                session = await browser_context.get_session()
-                pages = session.context.pages
-                await browser_context.create_new_tab()
-                for page_id, page in enumerate(pages):
-                    await page.close()
-
-            else:
-                agents = [CustomAgent(
-                    task=task,
-                    llm=llm,
-                    add_infos=add_infos,
-                    browser=browser,
-                    browser_context=browser_context,
-                    use_vision=use_vision,
-                    system_prompt_class=CustomSystemPrompt,
-                    agent_prompt_class=CustomAgentMessagePrompt,
-                    max_actions_per_step=5,
-                    controller=controller,
-                ) for task in query_tasks]
-                query_results = await asyncio.gather(
-                    *[agent.run(max_steps=kwargs.get("max_steps", 10)) for agent in agents])
+            query_results = await run_query_agents(query_tasks, llm, add_infos, controller, agent_state,
+                                                   browser=browser, context_pool=context_pool,
+                                                   max_concurrent_queries=max_concurrent_queries,
+                                                   use_vision=use_vision,
+                                                   max_steps=kwargs.get("max_steps", 10))
 
             if agent_state and agent_state.is_stop_requested():
                 # Stop
@@ -263,6 +265,7 @@ Provide your output as a JSON formatted list. Each item in the list must adhere
             # 3. Summarize Search Result
             query_result_dir = os.path.join(save_dir, "query_results")
             os.makedirs(query_result_dir, exist_ok=True)
+            record_chunks = []
             for i in range(len(query_tasks)):
                 query_result = query_results[i].final_result()
                 if not query_result:
@@ -280,19 +283,25 @@ Provide your output as a JSON formatted list. Each item in the list must adhere
                     else:
                         # TODO: limit content lenght: 128k tokens, ~3 chars per token
                         query_result_ = query_result_[:128000 * 3]
-                    history_infos_ = json.dumps(history_infos, indent=4)
-                    record_prompt = f"User Instruction:{task}. \nPrevious Recorded Information:\n {history_infos_}\n Current Search Iteration: {search_iteration}\n Current Search Plan:\n{query_plan}\n Current Search Query:\n {query_tasks[i]}\n Current Search Results: {query_result_}\n "
-                    record_messages.append(HumanMessage(content=record_prompt))
-                    ai_record_msg = llm.invoke(record_messages[:1] + record_messages[-1:])
-                    record_messages.append(ai_record_msg)
-                    if hasattr(ai_record_msg, "reasoning_content"):
-                        logger.info("🤯 Start Record Deep Thinking: ")
-                        logger.info(ai_record_msg.reasoning_content)
-                        logger.info("🤯 End Record Deep Thinking")
-                    record_content = ai_record_msg.content
-                    record_content = repair_json(record_content)
-                    new_record_infos = json.loads(record_content)
-                    history_infos.extend(new_record_infos)
+                    record_chunks.append((query_tasks[i], query_result_))
+
+            # map: record every chunk concurrently on its own, without the recorded history,
+            # so the prompt size doesn't grow with the research depth
+            async def record_chunk(query_task, query_result_):
+                record_prompt = f"User Instruction:{task}. \n Current Search Iteration: {search_iteration}\n Current Search Plan:\n{query_plan}\n Current Search Query:\n {query_task}\n Current Search Results: {query_result_}\n "
+                async with llm_semaphore:
+                    ai_record_msg = await cached_ainvoke(llm, record_messages[:1] + [HumanMessage(content=record_prompt)])
+                if hasattr(ai_record_msg, "reasoning_content"):
+                    logger.info("🤯 Start Record Deep Thinking: ")
+                    logger.info(ai_record_msg.reasoning_content)
+                    logger.info("🤯 End Record Deep Thinking")
+                record_content = ai_record_msg.content
+                record_content = repair_json(record_content)
+                return json.loads(record_content)
+
+            # reduce: merge into the recorded history, dropping duplicates
+            for new_record_infos in await asyncio.gather(*[record_chunk(*chunk) for chunk in record_chunks]):
+                merge_record_infos(record_index, new_record_infos)
             if agent_state and agent_state.is_stop_requested():
                 # Stop
                 break
@@ -308,13 +317,76 @@ Provide your output as a JSON formatted list. Each item in the list must adhere
     finally:
         if browser:
             await browser.close()
-        if browser_context:
-            await browser_context.close()
         logger.info("Browser closed.")
 
 
-async def generate_final_report(task, history_infos, save_dir, llm, error_msg=None):
-    """Generate report from collected information with error handling"""
+def merge_record_infos(record_index: RecordIndex, new_record_infos) -> list:
+    """
+    Reduce step of the recorder: merge the records of one chunk into the recorded history,
+    dropping near-duplicates (see RecordIndex). Returns the recorded history.
+    """
+    if new_record_infos:
+        record_index.add_all(new_record_infos)
+    return record_index.records
+
+
+async def run_query_agents(query_tasks, llm, add_infos, controller, agent_state=None, browser=None,
+                           context_pool=None, max_concurrent_queries=3, use_vision=False, max_steps=10):
+    """
+    Run one browser agent per query, at most `max_concurrent_queries` at a time.
+
+    Each agent gets its own browser context: an isolated context on the user's browser
+    (`browser`, e.g. attached over CDP) or a context leased from `context_pool`.
+    Without either, every agent launches its own browser.
+    """
+    semaphore = asyncio.Semaphore(max_concurrent_queries)
+
+    async def run_query(query_task):
+        async with semaphore:
+            if agent_state and agent_state.is_stop_requested():
+                return AgentHistoryList(history=[])
+            query_browser, browser_context = browser, None
+            try:
+                if browser is not None:
+                    browser_context = await browser.new_context(isolated=True)
+                elif context_pool is not None:
+                    browser_context = await context_pool.acquire()
+                    query_browser = context_pool.browser
+                agent = CustomAgent(
+                    task=query_task,
+                    llm=llm,
+                    add_infos=add_infos,
+                    browser=query_browser,
+                    browser_context=browser_context,
+                    use_vision=use_vision,
+                    system_prompt_class=CustomSystemPrompt,
+                    agent_prompt_class=CustomAgentMessagePrompt,
+                    max_actions_per_step=5,
+                    controller=controller,
+                    injected_agent_state=CustomAgentState(parent=agent_state)
+                )
+                return await agent.run(max_steps=max_steps)
+            finally:
+                if browser_context is not None:
+                    if browser is not None:
+                        await browser_context.close()
+                    else:
+                        await context_pool.release(browser_context)
+
+    return await asyncio.gather(*[run_query(query_task) for query_task in query_tasks])
+
+
+async def generate_final_report(task, history_infos, save_dir, llm, error_msg=None, max_single_pass_chars=None,
+                                max_concurrent_calls=None):
+    """
+    Generate report from collected information with error handling.
+    Records that serialize to more than max_single_pass_chars (DEEP_RESEARCH_REPORT_SINGLE_PASS_CHARS)
+    are written section by section, see src/utils/report_builder.py.
+    """
+    if max_single_pass_chars is None:
+        max_single_pass_chars = int(os.getenv("DEEP_RESEARCH_REPORT_SINGLE_PASS_CHARS", "") or 60000)
+    if max_concurrent_calls is None:
+        max_concurrent_calls = int(os.getenv("DEEP_RESEARCH_LLM_CONCURRENCY", "") or 4)
     try:
         logger.info("\nAttempting to generate final report from collected data...")
 
@@ -349,22 +421,28 @@ async def generate_final_report(task, history_infos, save_dir, llm, error_msg=No
 2. **Search Information:** Information gathered from the search queries.
         """
 
+        history_infos = dedupe_record_infos(history_infos)
         history_infos_ = json.dumps(history_infos, indent=4)
         record_json_path = os.path.join(save_dir, "record_infos.json")
         logger.info(f"save All recorded information at {record_json_path}")
         with open(record_json_path, "w") as fw:
             json.dump(history_infos, fw, indent=4)
-        report_prompt = f"User Instruction:{task} \n Search Information:\n {history_infos_}"
-        report_messages = [SystemMessage(content=writer_system_prompt),
-                           HumanMessage(content=report_prompt)]  # New context for report generation
-        ai_report_msg = llm.invoke(report_messages)
-        if hasattr(ai_report_msg, "reasoning_content"):
-            logger.info("🤯 Start Report Deep Thinking: ")
-            logger.info(ai_report_msg.reasoning_content)
-            logger.info("🤯 End Report Deep Thinking")
-        report_content = ai_report_msg.content
-        report_content = re.sub(r"^```\s*markdown\s*|^\s*```|```\s*$", "", report_content, flags=re.MULTILINE)
-        report_content = report_content.strip()
+        if len(history_infos_) > max_single_pass_chars:
+            # too large for one prompt: draft sections concurrently and assemble them
+            report_content = await generate_sectioned_report(task, history_infos, llm,
+                                                             max_concurrent_calls=max_concurrent_calls)
+        else:
+            report_prompt = f"User Instruction:{task} \n Search Information:\n {history_infos_}"
+            report_messages = [SystemMessage(content=writer_system_prompt),
+                               HumanMessage(content=report_prompt)]  # New context for report generation
+            ai_report_msg = await llm.ainvoke(report_messages)
+            if hasattr(ai_report_msg, "reasoning_content"):
+                logger.info("🤯 Start Report Deep Thinking: ")
+                logger.info(ai_report_msg.reasoning_content)
+                logger.info("🤯 End Report Deep Thinking")
+            report_content = ai_report_msg.content
+            report_content = re.sub(r"^```\s*markdown\s*|^\s*```|```\s*$", "", report_content, flags=re.MULTILINE)
+            report_content = report_content.strip()
 
         # Add error notification to the report
         if error_msg:
@@ -0,0 +1,165 @@
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from browser_use.dom.views import DOMBaseNode, DOMElementNode, DOMTextNode
+
+ELEMENTS_REFERENCE_HEADER = "Interactive elements reference list"
+
+
+@dataclass
+class ElementSerializationSettings:
+    """How the interactive elements of the page are written into the state message"""
+
+    # truncate long texts and attribute values, and list long repeated attribute values once
+    compact: bool = True
+    max_text_length: int = 100
+    min_shared_value_length: int = 20
+    # keep one full reference list in the history and only send changes against it each step
+    diff_mode: bool = False
+    # send a new reference list when the changes exceed this share of the elements
+    refresh_ratio: float = 0.5
+
+    @classmethod
+    def from_env(cls) -> "ElementSerializationSettings":
+        """Settings from ELEMENTS_COMPACT, ELEMENTS_MAX_TEXT_LENGTH, ELEMENTS_DIFF_MODE and ELEMENTS_REFRESH_RATIO"""
+        return cls(
+            compact=os.getenv("ELEMENTS_COMPACT", "true").lower() == "true",
+            max_text_length=int(os.getenv("ELEMENTS_MAX_TEXT_LENGTH", "") or cls.max_text_length),
+            diff_mode=os.getenv("ELEMENTS_DIFF_MODE", "false").lower() == "true",
+            refresh_ratio=float(os.getenv("ELEMENTS_REFRESH_RATIO", "") or cls.refresh_ratio),
+        )
+
+
+@dataclass
+class ElementListing:
+    text: str  # elements section of the state message
+    reference: Optional[str] = None  # new full reference list to keep in the history (diff mode)
+
+
+@dataclass
+class _Entry:
+    key: str  # stable identity across steps
+    index: Optional[int]  # highlight index, None for plain text
+    tag: str = ""
+    text: str = ""
+    attributes: List[str] = field(default_factory=list)
+
+
+class ElementSerializer:
+    """
+    Serializer for the clickable element tree, stateful across the steps of one agent.
+
+    Compact mode writes elements in the `[index]<tag attrs>text/>` format of
+    `clickable_elements_to_string`, with long texts truncated and long attribute values that
+    repeat on the page replaced by `@n` references listed once. In diff mode the first listing
+    becomes a reference list kept in the history, and later steps only list the elements
+    added, changed or removed since it, until the changes grow past `refresh_ratio` of the page.
+    """
+
+    def __init__(self, include_attributes: List[str], settings: Optional[ElementSerializationSettings] = None):
+        self.include_attributes = include_attributes
+        self.settings = settings or ElementSerializationSettings()
+        # key -> (highlight index, rendered line) of the reference list
+        self._reference: Optional[Dict[str, Tuple[Optional[int], str]]] = None
+        self._reference_url: Optional[str] = None
+
+    def _truncate(self, text: str) -> str:
+        limit = self.settings.max_text_length
+        if not self.settings.compact or len(text) <= limit:
+            return text
+        return text[:limit].rstrip() + "…"
+
+    def _collect(self, element_tree: DOMElementNode) -> List[_Entry]:
+        entries: List[_Entry] = []
+        seen: Counter = Counter()
+
+        def unique(key: str) -> str:
+            seen[key] += 1
+            return key if seen[key] == 1 else f"{key}#{seen[key]}"
+
+        def process_node(node: DOMBaseNode) -> None:
+            if isinstance(node, DOMElementNode):
+                if node.highlight_index is not None:
+                    text = node.get_all_text_till_next_clickable_element()
+                    # dict.fromkeys keeps a stable order, so unchanged elements render identically
+                    attributes = [str(value) for key, value in node.attributes.items()
+                                  if key in self.include_attributes and value != node.tag_name]
+                    attributes = [value for value in dict.fromkeys(attributes) if value != text]
+                    entries.append(_Entry(key=unique(f"{node.xpath}|{node.tag_name}"), index=node.highlight_index,
+                                          tag=node.tag_name, text=self._truncate(text),
+                                          attributes=[self._truncate(value) for value in attributes]))
+                for child in node.children:
+                    process_node(child)
+            elif isinstance(node, DOMTextNode):
+                if not node.has_parent_with_highlight_index() and node.is_visible:
+                    text = self._truncate(node.text)
+                    entries.append(_Entry(key=unique(f"text|{text}"), index=None, text=text))
+
+        process_node(element_tree)
+        return entries
+
+    @staticmethod
+    def _render(entry: _Entry, shared: Dict[str, str]) -> str:
+        if entry.index is None:
+            return entry.text
+        attributes_str = ";".join(shared.get(value, value) for value in entry.attributes)
+        line = f"[{entry.index}]<{entry.tag} "
+        if attributes_str:
+            line += attributes_str
+        if entry.text:
+            line += f">{entry.text}" if attributes_str else entry.text
+        return line + "/>"
+
+    def _shared_values(self, entries: List[_Entry]) -> Dict[str, str]:
+        if not self.settings.compact:
+            return {}
+        counts = Counter(value for entry in entries for value in entry.attributes
+                         if len(value) >= self.settings.min_shared_value_length)
+        repeated = [value for value, count in counts.items() if count > 1]
+        return {value: f"@{i + 1}" for i, value in enumerate(repeated)}
+
+    def _full_listing(self, entries: List[_Entry]) -> str:
+        shared = self._shared_values(entries)
+        lines = [self._render(entry, shared) for entry in entries]
+        if shared:
+            legend = "\n".join(f"{ref}={value}" for value, ref in shared.items())
+            lines.insert(0, f"(repeated attribute values: \n{legend}\n)")
+        return "\n".join(lines)
+
+    def serialize(self, element_tree: DOMElementNode, url: str = "") -> ElementListing:
+        """Elements section for the current page; in diff mode possibly with a new reference list"""
+        entries = self._collect(element_tree)
+        if not entries:
+            return ElementListing(text="")
+        if not self.settings.diff_mode:
+            return ElementListing(text=self._full_listing(entries))
+
+        current = {entry.key: (entry.index, self._render(entry, {})) for entry in entries}
+        changed, removed = self._diff(current)
+        if (self._reference is None or url != self._reference_url
+                or len(changed) + len(removed) > self.settings.refresh_ratio * len(entries)):
+            self._reference, self._reference_url = current, url
+            return ElementListing(text=f"(unchanged since the {ELEMENTS_REFERENCE_HEADER.lower()} above)",
+                                  reference=self._full_listing(entries))
+
+        if not changed and not removed:
+            return ElementListing(text=f"(unchanged since the {ELEMENTS_REFERENCE_HEADER.lower()} above)")
+        text = (f"(only changes since the {ELEMENTS_REFERENCE_HEADER.lower()} above are listed, "
+                f"every other element there is unchanged)")
+        if changed:
+            text += "\nNew or changed:\n" + "\n".join(changed)
+        if removed:
+            text += "\nNo longer on the page: " + " ".join(removed)
+        return ElementListing(text=text)
+
+    def _diff(self, current: Dict[str, Tuple[Optional[int], str]]) -> Tuple[List[str], List[str]]:
+        if self._reference is None:
+            return [line for _, line in current.values()], []
+        changed = [line for key, (_, line) in current.items() if self._reference.get(key, (None, None))[1] != line]
+        current_indices = {index for index, _ in current.values() if index is not None}
+        # a reused index is already listed as changed
+        removed = [f"[{index}]" for key, (index, _) in self._reference.items()
+                   if key not in current and index is not None and index not in current_indices]
+        return changed, removed
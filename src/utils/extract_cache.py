@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+from src.utils.record_index import normalize_url
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    content_hash: str
+    size: int
+    stored_at: float
+    accessed_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class ExtractCache:
+    """
+    On-disk cache of extracted page markdown, shared by every deep research run.
+
+    Entries are keyed by the normalized url and point to content-addressed files
+    (`<sha256>.md`), so pages with identical content are stored once. An entry is fresh
+    for `ttl` seconds; stale entries keep their ETag / Last-Modified so a fetcher can
+    revalidate them instead of downloading and extracting again. When the stored
+    content exceeds `max_bytes`, the least recently used entries are evicted.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir: str, ttl: float = 86400, max_bytes: int = 200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: Dict[str, CacheEntry] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+    def _content_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}.md")
+
+    def _load_index(self):
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                self._entries = {key: CacheEntry(**entry) for key, entry in json.load(f).items()}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable extract cache index {index_path}: {e}")
+            self._entries = {}
+
+    def _save_index(self):
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({key: asdict(entry) for key, entry in self._entries.items()}, f)
+        os.replace(tmp_path, index_path)
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Entry for url, fresh or stale, without reading the content"""
+        with self._lock:
+            return self._entries.get(self._key(url))
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.stored_at < self.ttl
+
+    def read(self, entry: CacheEntry) -> Optional[str]:
+        """Content of an entry, and mark it as recently used"""
+        try:
+            with open(self._content_path(entry.content_hash), "r", encoding="utf-8") as f:
+                content = f.read()
+        except OSError:
+            with self._lock:
+                self._entries.pop(self._key(entry.url), None)
+            return None
+        with self._lock:
+            entry.accessed_at = time.time()
+        return content
+
+    def get(self, url: str) -> Optional[str]:
+        """Cached content for url if it is still within the TTL"""
+        entry = self.lookup(url)
+        if entry is None or not self.is_fresh(entry):
+            return None
+        return self.read(entry)
+
+    def touch(self, url: str):
+        """Mark a stale entry fresh again after the server confirmed it is unchanged (HTTP 304)"""
+        with self._lock:
+            entry = self._entries.get(self._key(url))
+            if entry is not None:
+                entry.stored_at = entry.accessed_at = time.time()
+                self._save_index()
+
+    def put(self, url: str, content: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        data = content.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        content_path = self._content_path(content_hash)
+        if not os.path.exists(content_path):
+            tmp_path = f"{content_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, content_path)
+
+        now = time.time()
+        with self._lock:
+            self._entries[self._key(url)] = CacheEntry(url=url, content_hash=content_hash, size=len(data),
+                                                       stored_at=now, accessed_at=now,
+                                                       etag=etag, last_modified=last_modified)
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        """Drop least recently used entries until the stored content fits in max_bytes"""
+        sizes = {entry.content_hash: entry.size for entry in self._entries.values()}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1].accessed_at):
+            if total <= self.max_bytes:
+                break
+            del self._entries[key]
+            if all(other.content_hash != entry.content_hash for other in self._entries.values()):
+                total -= entry.size
+                try:
+                    os.remove(self._content_path(entry.content_hash))
+                except OSError:
+                    pass
+
+
+_extract_cache: Optional[ExtractCache] = None
+
+
+def get_extract_cache() -> Optional[ExtractCache]:
+    """
+    Process-wide cache configured by EXTRACT_CACHE_DIR, EXTRACT_CACHE_TTL and
+    EXTRACT_CACHE_MAX_MB; None when EXTRACT_CACHE_MAX_MB is 0.
+    """
+    global _extract_cache
+    max_mb = float(os.getenv("EXTRACT_CACHE_MAX_MB", "") or 200)
+    if max_mb <= 0:
+        return None
+    if _extract_cache is None:
+        _extract_cache = ExtractCache(
+            cache_dir=os.getenv("EXTRACT_CACHE_DIR", "") or "./tmp/extract_cache",
+            ttl=float(os.getenv("EXTRACT_CACHE_TTL", "") or 86400),
+            max_bytes=int(max_mb * 1024 * 1024),
+        )
+    return _extract_cache
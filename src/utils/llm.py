@@ -67,7 +67,8 @@ class DeepSeekR1ChatOpenAI(ChatOpenAI):
             else:
                 message_history.append({"role": "user", "content": input_.content})
 
-        response = self.client.chat.completions.create(
+        # async client of ChatOpenAI, on the pooled http_async_client: the event loop stays free
+        response = await self.async_client.create(
             model=self.model_name,
             messages=message_history
         )
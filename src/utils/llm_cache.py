@@ -0,0 +1,182 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+logger = logging.getLogger(__name__)
+
+# The state message carries the wall clock time, which would make every key unique
+_VOLATILE_PATTERNS = [
+    (re.compile(r"Current date and time: \d{4}-\d{2}-\d{2} \d{2}:\d{2}"), "Current date and time: <now>"),
+]
+
+
+def _normalize_text(text: str) -> str:
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def _normalize_content(content: Any) -> Any:
+    if isinstance(content, str):
+        return _normalize_text(content)
+    parts = []
+    for part in content:
+        if isinstance(part, str):
+            parts.append(_normalize_text(part))
+        elif part.get("type") == "text":
+            parts.append(_normalize_text(part.get("text", "")))
+        elif part.get("type") == "image_url":
+            image_url = part["image_url"]
+            url = image_url.get("url", "") if isinstance(image_url, dict) else image_url
+            parts.append({"image": hashlib.sha256(url.encode("utf-8")).hexdigest()})
+        else:
+            parts.append(part)
+    return parts
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of model responses in a local SQLite file.
+
+    Only calls of models running at temperature 0 are cached: the key is a digest of the
+    model class, model name, temperature and the normalized messages (trailing whitespace,
+    timestamps and inline images reduced to stable forms). Responses older than `ttl`
+    seconds are ignored; when the stored responses exceed `max_bytes`, the least recently
+    used are evicted.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 86400, max_bytes: int = 100 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, size INTEGER, "
+                "stored_at REAL, accessed_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+
+    @staticmethod
+    def model_name(llm) -> str:
+        return str(getattr(llm, "model_name", None) or getattr(llm, "model", None) or "")
+
+    @classmethod
+    def make_key(cls, llm, messages: List[BaseMessage]) -> Optional[str]:
+        """Cache key for a call, or None when the model is not deterministic"""
+        temperature = getattr(llm, "temperature", None)
+        if temperature is None or float(temperature) != 0:
+            return None
+        payload = {
+            "llm": type(llm).__name__,
+            "model": cls.model_name(llm),
+            "temperature": 0,
+            "messages": [[message.type, _normalize_content(message.content)] for message in messages],
+        }
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        response = json.loads(row[0])
+        message = AIMessage(content=response["content"])
+        if response.get("reasoning_content") is not None:
+            # the deepseek reasoner wrappers attach the reasoning to the message
+            message.reasoning_content = response["reasoning_content"]
+        return message
+
+    def put(self, key: str, model: str, message: BaseMessage):
+        response = json.dumps({
+            "content": message.content,
+            "reasoning_content": getattr(message, "reasoning_content", None),
+        }, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        """Drop expired responses, then the least recently used until the rest fits in max_bytes"""
+        self._conn.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+_llm_response_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_response_cache() -> Optional[LLMResponseCache]:
+    """
+    Process-wide cache configured by LLM_CACHE_PATH, LLM_CACHE_TTL and LLM_CACHE_MAX_MB;
+    None unless LLM_CACHE_MAX_MB is set above 0.
+    """
+    global _llm_response_cache
+    max_mb = float(os.getenv("LLM_CACHE_MAX_MB", "") or 0)
+    if max_mb <= 0:
+        return None
+    if _llm_response_cache is None:
+        _llm_response_cache = LLMResponseCache(
+            path=os.getenv("LLM_CACHE_PATH", "") or "./tmp/llm_cache.sqlite",
+            ttl=float(os.getenv("LLM_CACHE_TTL", "") or 7 * 86400),
+            max_bytes=int(max_mb * 1024 * 1024),
+        )
+    return _llm_response_cache
+
+
+async def cached_ainvoke(llm, messages: List[BaseMessage], cache: Optional[LLMResponseCache] = None) -> BaseMessage:
+    """`llm.ainvoke(messages)`, answered from the response cache when the call is deterministic"""
+    if cache is None:
+        cache = get_llm_response_cache()
+    key = cache.make_key(llm, messages) if cache is not None else None
+    if key is None:
+        return await llm.ainvoke(messages)
+    cached = cache.get(key)
+    if cached is not None:
+        logger.debug(f"LLM response cache hit for {cache.model_name(llm)}")
+        return cached
+    response = await llm.ainvoke(messages)
+    if isinstance(response.content, str) and response.content:
+        cache.put(key, cache.model_name(llm), response)
+    return response
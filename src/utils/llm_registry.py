@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    client: Any
+    loop: asyncio.AbstractEventLoop
+    last_used: float
+
+
+def key_hash(api_key: Optional[str]) -> str:
+    """Short digest of an api key, so keys never sit in the registry in clear"""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class LLMClientRegistry:
+    """
+    Long-lived LLM clients shared by every task, keyed by their configuration.
+
+    A client keeps its HTTP connection pool, so a new task reuses warm TLS connections
+    instead of building a client and handshaking again. Async connection pools belong to the
+    event loop that opened them, so clients are registered per loop and only while a loop
+    runs. Clients idle longer than `idle_timeout` seconds, or beyond `max_size` (least
+    recently used first), are dropped from the registry only: a task may still hold one,
+    so its connection pool is left open and closes once the client is garbage collected.
+    A client counts as used when it is looked up or sends a request.
+    """
+
+    def __init__(self, idle_timeout: float = 600, max_size: int = 16):
+        self.idle_timeout = idle_timeout
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # no loop to tie the connection pool to
+            return factory()
+        if self.max_size <= 0:
+            return factory()
+
+        full_key = (id(loop), key)
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(full_key)
+            if entry is not None and entry.loop is loop:
+                entry.last_used = now
+                self._entries.move_to_end(full_key)
+                return entry.client
+
+        client = factory()
+        with self._lock:
+            self._entries[full_key] = _Entry(client=client, loop=loop, last_used=now)
+            self._evict(now)
+        return client
+
+    @staticmethod
+    def _last_used(entry: _Entry) -> float:
+        http_client = getattr(entry.client, "http_async_client", None)
+        return max(entry.last_used, getattr(http_client, "last_request_at", 0.0))
+
+    def _evict(self, now: float):
+        for full_key, entry in list(self._entries.items()):
+            if entry.loop.is_closed() or now - self._last_used(entry) > self.idle_timeout:
+                del self._entries[full_key]
+                logger.debug("Dropped an idle LLM client")
+        if len(self._entries) > self.max_size:
+            by_use = sorted(self._entries, key=lambda full_key: self._last_used(self._entries[full_key]))
+            for full_key in by_use[:len(self._entries) - self.max_size]:
+                del self._entries[full_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_registry: Optional[LLMClientRegistry] = None
+
+
+def get_llm_registry() -> LLMClientRegistry:
+    """Process-wide registry sized by LLM_CLIENT_CACHE_SIZE (0 disables it) and LLM_CLIENT_IDLE_TIMEOUT"""
+    global _registry
+    if _registry is None:
+        _registry = LLMClientRegistry(
+            idle_timeout=float(os.getenv("LLM_CLIENT_IDLE_TIMEOUT", "") or 600),
+            max_size=int(os.getenv("LLM_CLIENT_CACHE_SIZE", "") or 16),
+        )
+    return _registry
+
+
+def create_http_async_client():
+    """Keep-alive connection pool for OpenAI compatible clients (LLM_HTTP_MAX_CONNECTIONS, LLM_HTTP_KEEPALIVE_EXPIRY)"""
+    max_connections = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "") or 20)
+
+    async def mark_used(request):
+        # read by the registry, so a client busy in a long task is not taken for idle
+        http_client.last_request_at = time.time()
+
+    http_client = openai.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                            keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "") or 90)),
+        event_hooks={"request": [mark_used]},
+    )
+    http_client.last_request_at = time.time()
+    return http_client
@@ -0,0 +1,187 @@
+import hashlib
+import random
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# query parameters that only track where a click came from
+_TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "ref", "ref_src", "spm", "from"}
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_url(url) -> str:
+    """Canonical form of a source url: lowercase host without www, no fragment, tracking params or trailing slash"""
+    url = str(url or "").strip()
+    if not url or url == "unknown":
+        return "unknown"
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS]
+    path = parts.path.rstrip("/")
+    return urlunsplit(("", host, path, urlencode(sorted(query)), ""))[2:]
+
+
+def normalize_text(text) -> str:
+    """Lowercase words separated by single spaces"""
+    return " ".join(re.findall(r"\w+", str(text or "").lower()))
+
+
+def _shingles(text: str, size: int) -> Set[str]:
+    words = normalize_text(text).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _merge_source_urls(kept: dict, dropped: dict):
+    """Sources of both duplicates in kept["urls"], kept["url"] first; set only when there are several"""
+    urls = []
+    for url in (kept.get("urls") or [kept.get("url")]) + (dropped.get("urls") or [dropped.get("url")]):
+        if url and url != "unknown" and normalize_url(url) not in {normalize_url(u) for u in urls}:
+            urls.append(url)
+    if len(urls) > 1:
+        kept["urls"] = urls
+
+
+class RecordIndex:
+    """
+    Near-duplicate index for the deep research records (`history_infos`).
+
+    Each summary_content is turned into word shingles and a MinHash signature, which
+    is bucketed with LSH bands so a new record is only compared with likely matches.
+    A record whose estimated Jaccard similarity with a recorded one reaches `threshold`,
+    or whose summary is contained in one recorded from the same (normalized) url, is a
+    duplicate: the longer of the two summaries is kept, with the source urls of both in
+    its `urls`. Records are copied; `records` is the deduplicated list, in insertion order.
+    """
+
+    def __init__(self, records: Optional[Iterable[dict]] = None, threshold: float = 0.8,
+                 num_perm: int = 128, bands: int = 32, shingle_size: int = 3):
+        assert num_perm % bands == 0, "num_perm must be a multiple of bands"
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rand = random.Random(1)
+        self._perms = [(rand.randrange(1, _MERSENNE_PRIME), rand.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+        self.records: List[dict] = []
+        self._signatures: List[Tuple[int, ...]] = []
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._by_url: Dict[str, List[int]] = {}
+        self.add_all(records or [])
+
+    def _signature(self, text: str) -> Optional[Tuple[int, ...]]:
+        shingles = _shingles(text, self.shingle_size)
+        if not shingles:
+            return None
+        hashes = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+                  for shingle in shingles]
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms)
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    def _similarity(self, a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+        return sum(1 for x, y in zip(a, b) if x == y) / self.num_perm
+
+    def find_duplicate(self, summary: str) -> Optional[int]:
+        """Index of a recorded near-duplicate of `summary`, or None"""
+        signature = self._signature(summary)
+        if signature is None:
+            return None
+        return self._find(signature)
+
+    def _find(self, signature: Tuple[int, ...]) -> Optional[int]:
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best, best_score = None, self.threshold
+        for index in candidates:
+            score = self._similarity(signature, self._signatures[index])
+            if score >= best_score:
+                best, best_score = index, score
+        return best
+
+    def add(self, record: dict) -> bool:
+        """Add a copy of record; returns False if it was dropped (empty or near-duplicate)"""
+        if not isinstance(record, dict):
+            return False
+        summary = str(record.get("summary_content") or "")
+        signature = self._signature(summary)
+        if signature is None:
+            return False
+        record = dict(record, url=record.get("url") or "unknown")
+        url = normalize_url(record["url"])
+
+        duplicate = self._find_contained(url, summary)
+        if duplicate is None:
+            duplicate = self._find(signature)
+        if duplicate is not None:
+            recorded = self.records[duplicate]
+            if len(summary) > len(str(recorded.get("summary_content") or "")):
+                # keep the more detailed summary
+                self._unindex(duplicate)
+                self.records[duplicate] = record
+                self._index(duplicate, signature)
+                _merge_source_urls(record, recorded)
+            else:
+                _merge_source_urls(recorded, record)
+            self._link_url(url, duplicate)
+            return False
+
+        self.records.append(record)
+        self._signatures.append(signature)
+        self._index(len(self.records) - 1, signature)
+        self._link_url(url, len(self.records) - 1)
+        return True
+
+    def _find_contained(self, url: str, summary: str) -> Optional[int]:
+        """Record from the same url whose summary contains `summary` or is contained in it"""
+        if url == "unknown":
+            return None
+        # pad with spaces so only whole words match
+        words = f" {normalize_text(summary)} "
+        for index in self._by_url.get(url, ()):
+            recorded = f" {normalize_text(self.records[index].get('summary_content'))} "
+            if words in recorded or recorded in words:
+                return index
+        return None
+
+    def _index(self, index: int, signature: Tuple[int, ...]):
+        self._signatures[index] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(index)
+
+    def _unindex(self, index: int):
+        for key in self._band_keys(self._signatures[index]):
+            bucket = self._buckets.get(key)
+            if bucket and index in bucket:
+                bucket.remove(index)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _link_url(self, url: str, index: int):
+        indices = self._by_url.setdefault(url, [])
+        if index not in indices:
+            indices.append(index)
+
+    def add_all(self, records) -> int:
+        """Add records (a list or a single record dict); returns the number kept"""
+        if isinstance(records, dict):
+            records = [records]
+        return sum(1 for record in records if self.add(record))
+
+    def __len__(self):
+        return len(self.records)
+
+
+def dedupe_record_infos(record_infos: Iterable[dict], threshold: float = 0.8) -> List[dict]:
+    """Drop near-duplicate records, keeping the first position of each and its most detailed summary"""
+    return RecordIndex(record_infos, threshold=threshold).records
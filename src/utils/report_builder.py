@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import re
+from typing import Dict, List, Tuple
+
+from langchain.schema import HumanMessage, SystemMessage
+
+logger = logging.getLogger(__name__)
+
+# Report sections in output order, with the words that route a record to them.
+# The recorder's "thinking" field names the section a record belongs to ("could be used in the introduction").
+REPORT_SECTIONS = [
+    ("Introduction", ("introduction", "intro", "overview")),
+    ("Background", ("background", "history", "historical", "context", "origin")),
+    ("Methodology", ("methodology", "method", "approach", "architecture", "training", "design")),
+    ("Key Findings", ("finding", "result", "analysis", "performance", "benchmark", "data", "evaluation")),
+    ("Comparison", ("comparison", "compare", "comparing", "versus", "vs", "competitor")),
+    ("Applications and Impact", ("application", "impact", "use case", "industry", "adoption")),
+    ("Challenges and Limitations", ("challenge", "limitation", "risk", "concern", "criticism")),
+    ("Future Outlook", ("future", "outlook", "trend", "roadmap", "prediction")),
+    ("Conclusion", ("conclusion", "summary", "takeaway")),
+]
+DEFAULT_SECTION = "Key Findings"
+
+SECTION_WRITER_PROMPT = """
+You are a professional report writer drafting ONE section of a larger Markdown research report. Other writers draft the other sections in parallel, and the sections are assembled afterwards.
+
+**Specific Instructions:**
+
+*   Write only the body of the section named in the input. Do not add the section heading, a report title, an introduction to the whole report or a reference list. Use `###` sub-headings if the section needs structure.
+*   Base every statement on the provided records. Preserve key data and figures, and use Markdown tables for numerical comparisons when they help.
+*   Each record has `refs`, the numbers of its sources. Cite sources exclusively with those numbers, one number per bracket (e.g. [3] or [3][5]), right after the statement it supports. Never invent reference numbers.
+*   Be concise and information-dense; do not repeat the same fact twice.
+*   Output ONLY the section body in Markdown, without code fences or meta-commentary.
+"""
+
+TITLE_WRITER_PROMPT = "Write a concise, descriptive title for a research report answering the user instruction. Output only the title text, without quotes or Markdown."
+
+
+def assign_section(record: dict) -> str:
+    """Section named first in the record's thinking, DEFAULT_SECTION if none is named"""
+    thinking = str(record.get("thinking") or "").lower()
+    best_section, best_position = DEFAULT_SECTION, None
+    for section, keywords in REPORT_SECTIONS:
+        for keyword in keywords:
+            match = re.search(rf"\b{re.escape(keyword)}", thinking)
+            if match and (best_position is None or match.start() < best_position):
+                best_section, best_position = section, match.start()
+    return best_section
+
+
+def cluster_records(history_infos: List[dict], max_records_per_draft: int = 30) -> List[Tuple[str, List[dict]]]:
+    """
+    Group records by report section, in section order. Sections with more than
+    max_records_per_draft records are split into several drafts under the same section.
+    """
+    clusters: Dict[str, List[dict]] = {}
+    for record in history_infos:
+        clusters.setdefault(assign_section(record), []).append(record)
+
+    drafts = []
+    for section, _ in REPORT_SECTIONS:
+        records = clusters.get(section, [])
+        for start in range(0, len(records), max_records_per_draft):
+            drafts.append((section, records[start:start + max_records_per_draft]))
+    return drafts
+
+
+# A citation: one number, or a list of numbers and ranges ("[1, 2]", "[1-3]"); not a Markdown link
+_CITATION_PATTERN = re.compile(r"\[(\d+(?:\s*[,\-–]\s*\d+)*)\](?!\()")
+# ranges wider than this are not citations (e.g. "[1990-2020]")
+MAX_CITATION_RANGE = 20
+
+
+def source_urls(record: dict) -> List[str]:
+    """Source urls of a record: its merged `urls` if it stands for several duplicates, else its url"""
+    urls = record.get("urls") or [record.get("url")]
+    return [url for url in urls if url and url != "unknown"]
+
+
+def number_sources(history_infos: List[dict]) -> Dict[str, int]:
+    """Reference number of each source url, in order of first appearance"""
+    numbers: Dict[str, int] = {}
+    for record in history_infos:
+        for url in source_urls(record):
+            if url not in numbers:
+                numbers[url] = len(numbers) + 1
+    return numbers
+
+
+def _citation_numbers(citation: str) -> List[int]:
+    """Numbers of a citation list, ranges expanded; empty if a range is too wide to be one"""
+    numbers = []
+    for item in re.split(r"\s*,\s*", citation.strip()):
+        bounds = [int(bound) for bound in re.split(r"\s*[\-–]\s*", item)]
+        if len(bounds) == 1:
+            numbers.append(bounds[0])
+        elif len(bounds) == 2 and 0 <= bounds[1] - bounds[0] <= MAX_CITATION_RANGE:
+            numbers.extend(range(bounds[0], bounds[1] + 1))
+        else:
+            return []
+    return numbers
+
+
+def _clean_markdown(content: str) -> str:
+    return re.sub(r"^```\s*markdown\s*|^\s*```|```\s*$", "", content, flags=re.MULTILINE).strip()
+
+
+async def generate_sectioned_report(task: str, history_infos: List[dict], llm, max_concurrent_calls: int = 4,
+                                    max_records_per_draft: int = 30) -> str:
+    """
+    Staged report for large corpora: records are clustered by section, every section is
+    drafted by its own LLM call (at most max_concurrent_calls at a time), and the drafts
+    are assembled under one title with a single, renumbered reference list.
+    """
+    source_numbers = number_sources(history_infos)
+    titles = {}
+    for record in history_infos:
+        for url in source_urls(record):
+            # merged duplicates only keep the title of the record they were merged into
+            titles.setdefault(url, (record.get("title") if url == record.get("url") else None) or url)
+
+    drafts = cluster_records(history_infos, max_records_per_draft=max_records_per_draft)
+    logger.info(f"Drafting report in {len(drafts)} parts from {len(history_infos)} records")
+    semaphore = asyncio.Semaphore(max(1, max_concurrent_calls))
+
+    async def draft_section(section, records):
+        section_records = [{"refs": [source_numbers[url] for url in source_urls(record)],
+                            "title": record.get("title"),
+                            "summary_content": record.get("summary_content"),
+                            "thinking": record.get("thinking")} for record in records]
+        prompt = f"User Instruction:{task} \n Section: {section}\n Records:\n {json.dumps(section_records, indent=4)}"
+        async with semaphore:
+            ai_msg = await llm.ainvoke([SystemMessage(content=SECTION_WRITER_PROMPT), HumanMessage(content=prompt)])
+        return _clean_markdown(ai_msg.content)
+
+    async def write_title():
+        async with semaphore:
+            ai_msg = await llm.ainvoke([SystemMessage(content=TITLE_WRITER_PROMPT),
+                                        HumanMessage(content=f"User Instruction:{task}")])
+        return _clean_markdown(ai_msg.content).lstrip("# ").strip()
+
+    title, *bodies = await asyncio.gather(write_title(), *[draft_section(*draft) for draft in drafts])
+
+    # merge drafts of the same section under one heading
+    sections: Dict[str, List[str]] = {}
+    for (section, _), body in zip(drafts, bodies):
+        if body:
+            sections.setdefault(section, []).append(body)
+    report = f"# {title}\n\n" + "\n\n".join(f"## {section}\n\n" + "\n\n".join(parts)
+                                             for section, parts in sections.items())
+
+    # renumber citations in order of first use and list only the cited sources; lists and ranges
+    # become one bracket per source, brackets that don't map to sources (e.g. "[2024]") are left as they are
+    urls_by_number = {number: url for url, number in source_numbers.items()}
+    cited: Dict[int, int] = {}
+
+    def renumber(match):
+        numbers = _citation_numbers(match.group(1))
+        if not numbers or any(number not in urls_by_number for number in numbers):
+            return match.group(0)
+        for number in numbers:
+            cited.setdefault(number, len(cited) + 1)
+        return "".join(f"[{cited[number]}]" for number in dict.fromkeys(numbers))
+
+    report = _CITATION_PATTERN.sub(renumber, report)
+    if cited:
+        references = "\n\n".join(f"[{new}] {titles[urls_by_number[old]]} ({urls_by_number[old]})"
+                                 for old, new in sorted(cited.items(), key=lambda item: item[1]))
+        report += f"\n\n## References\n\n{references}"
+    return report
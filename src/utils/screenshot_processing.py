@@ -0,0 +1,119 @@
+import base64
+import io
+import logging
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+_FORMATS = {"png": "PNG", "jpeg": "JPEG", "jpg": "JPEG", "webp": "WEBP"}
+
+
+@dataclass
+class ScreenshotSettings:
+    """How the agent's screenshot is prepared before it is sent to a vision LLM"""
+
+    max_width: int = 1280
+    max_height: int = 1280
+    format: str = "jpeg"  # png / jpeg / webp
+    quality: int = 75  # jpeg / webp only
+    grayscale: bool = False
+    # cut screenshots taller than the viewport (full page / high DPI captures) to the visible area
+    crop_to_viewport: bool = True
+    viewport: Optional[Tuple[int, int]] = None  # (width, height) in CSS pixels
+    # send a "screen unchanged" note instead of a screenshot that looks like the last one sent,
+    # which then stays in the message history until a new screenshot is sent
+    skip_unchanged: bool = False
+    unchanged_threshold: int = 4  # max perceptual hash bits that differ
+    max_skipped: int = 3  # send a fresh screenshot after this many skipped in a row
+
+    @classmethod
+    def from_env(cls) -> "ScreenshotSettings":
+        """Settings from SCREENSHOT_MAX_WIDTH, SCREENSHOT_MAX_HEIGHT, SCREENSHOT_FORMAT, SCREENSHOT_QUALITY,
+        SCREENSHOT_GRAYSCALE, SCREENSHOT_CROP_TO_VIEWPORT, SCREENSHOT_SKIP_UNCHANGED,
+        SCREENSHOT_UNCHANGED_THRESHOLD and SCREENSHOT_MAX_SKIPPED"""
+        return cls(
+            max_width=int(os.getenv("SCREENSHOT_MAX_WIDTH", "") or cls.max_width),
+            max_height=int(os.getenv("SCREENSHOT_MAX_HEIGHT", "") or cls.max_height),
+            format=(os.getenv("SCREENSHOT_FORMAT", "") or cls.format).lower(),
+            quality=int(os.getenv("SCREENSHOT_QUALITY", "") or cls.quality),
+            grayscale=os.getenv("SCREENSHOT_GRAYSCALE", "false").lower() == "true",
+            crop_to_viewport=os.getenv("SCREENSHOT_CROP_TO_VIEWPORT", "true").lower() == "true",
+            skip_unchanged=os.getenv("SCREENSHOT_SKIP_UNCHANGED", "false").lower() == "true",
+            unchanged_threshold=int(os.getenv("SCREENSHOT_UNCHANGED_THRESHOLD", "") or cls.unchanged_threshold),
+            max_skipped=int(os.getenv("SCREENSHOT_MAX_SKIPPED", "") or cls.max_skipped),
+        )
+
+
+def process_screenshot(screenshot_b64: str, settings: Optional[ScreenshotSettings] = None) -> Tuple[str, str]:
+    """
+    Crop, downscale and re-encode a base64 PNG screenshot.
+    Returns (base64 data, format); the original screenshot is returned if it can't be decoded.
+    """
+    if settings is None:
+        return screenshot_b64, "png"
+    image_format = settings.format if settings.format in _FORMATS else "png"
+    try:
+        image = Image.open(io.BytesIO(base64.b64decode(screenshot_b64)))
+        image.load()
+    except Exception as e:
+        logger.warning(f"Could not decode screenshot, sending it unchanged: {e}")
+        return screenshot_b64, "png"
+
+    changed = False
+    if settings.crop_to_viewport and settings.viewport:
+        viewport_width, viewport_height = settings.viewport
+        # keep the viewport's aspect ratio, the capture may be scaled by the device pixel ratio
+        visible_height = round(image.width * viewport_height / viewport_width)
+        if image.height > visible_height:
+            image = image.crop((0, 0, image.width, visible_height))
+            changed = True
+
+    if image.width > settings.max_width or image.height > settings.max_height:
+        image.thumbnail((settings.max_width, settings.max_height), Image.LANCZOS)
+        changed = True
+
+    if settings.grayscale:
+        image = image.convert("L")
+        changed = True
+    elif image_format != "png" and image.mode not in ("RGB", "L"):
+        # jpeg has no alpha channel
+        image = image.convert("RGB")
+
+    if not changed and image_format == "png":
+        return screenshot_b64, "png"
+
+    buffer = io.BytesIO()
+    if image_format == "png":
+        image.save(buffer, format="PNG", optimize=True)
+    else:
+        image.save(buffer, format=_FORMATS[image_format], quality=settings.quality)
+    return base64.b64encode(buffer.getvalue()).decode("ascii"), "jpeg" if image_format == "jpg" else image_format
+
+
+def perceptual_hash(screenshot_b64: str, hash_size: int = 16) -> Optional[int]:
+    """
+    Difference hash of a base64 screenshot: one bit per horizontally adjacent pixel pair of a
+    grayscale (hash_size + 1) x hash_size thumbnail. None if the image can't be decoded.
+    """
+    try:
+        image = Image.open(io.BytesIO(base64.b64decode(screenshot_b64)))
+        pixels = list(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR).getdata())
+    except Exception as e:
+        logger.debug(f"Could not hash screenshot: {e}")
+        return None
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hash_distance(a: int, b: int) -> int:
+    """Number of differing bits between two perceptual hashes"""
+    return bin(a ^ b).count("1")
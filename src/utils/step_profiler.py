@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """Duration of one phase of an agent step"""
+
+    name: str
+    duration: float
+    step: int
+    start: float
+    labels: Dict[str, str] = field(default_factory=dict)
+
+
+class LoggingSink:
+    """Logs every span"""
+
+    def __init__(self, level: int = logging.INFO):
+        self.level = level
+
+    def record(self, span: Span):
+        labels = " ".join(f"{key}={value}" for key, value in span.labels.items())
+        logger.log(self.level, f"⏱️ step {span.step} {span.name}: {span.duration * 1000:.0f}ms {labels}".rstrip())
+
+
+class JsonLinesSink:
+    """Appends every span as a JSON line, for offline analysis"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def record(self, span: Span):
+        line = json.dumps(asdict(span), ensure_ascii=False)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class HistogramSink:
+    """
+    In-process latency distribution per phase, optionally split by span labels
+    (e.g. `group_by=("site", "model")`). Durations are kept as they are: a run has
+    at most a few hundred spans per phase.
+    """
+
+    def __init__(self, group_by: Sequence[str] = ()):
+        self.group_by = tuple(group_by)
+        self._durations: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, span: Span):
+        key = (span.name,) + tuple(span.labels.get(label, "") for label in self.group_by)
+        with self._lock:
+            self._durations.setdefault(key, []).append(span.duration)
+
+    @staticmethod
+    def _percentile(durations: List[float], fraction: float) -> float:
+        return durations[min(len(durations) - 1, int(fraction * len(durations)))]
+
+    def summary(self) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """count, total, mean, p50, p95 and max seconds per phase (and group), slowest total first"""
+        with self._lock:
+            items = [(key, sorted(durations)) for key, durations in self._durations.items()]
+        stats = {}
+        for key, durations in sorted(items, key=lambda item: sum(item[1]), reverse=True):
+            total = sum(durations)
+            stats[key] = {
+                "count": len(durations),
+                "total": total,
+                "mean": total / len(durations),
+                "p50": self._percentile(durations, 0.5),
+                "p95": self._percentile(durations, 0.95),
+                "max": durations[-1],
+            }
+        return stats
+
+    def format_markdown(self) -> str:
+        """Summary as a markdown table"""
+        stats = self.summary()
+        if not stats:
+            return ""
+        headers = ["phase", *self.group_by, "count", "total (s)", "mean (ms)", "p50 (ms)", "p95 (ms)", "max (ms)"]
+        lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+        for key, row in stats.items():
+            cells = [*key, str(row["count"]), f"{row['total']:.2f}",
+                     *(f"{row[name] * 1000:.0f}" for name in ("mean", "p50", "p95", "max"))]
+            lines.append("| " + " | ".join(cells) + " |")
+        return "\n".join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._durations.clear()
+
+
+class StepProfiler:
+    """
+    Timing spans for the phases of agent steps.
+
+    Every span goes to the run's own histogram and to the configured sinks; sinks only
+    need a `record(span)` method, and one failing is logged, never raised into the step.
+    `labels` (e.g. site and model) are attached to every span.
+    """
+
+    def __init__(self, sinks: Optional[Sequence] = None, labels: Optional[Dict[str, str]] = None):
+        self.sinks = list(sinks) if sinks is not None else get_profiler_sinks()
+        self.labels = dict(labels or {})
+        self.step = 0
+        self.run_stats = HistogramSink()
+
+    @contextmanager
+    def span(self, name: str, **labels: str) -> Iterator[None]:
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(Span(name=name, duration=time.perf_counter() - started, step=self.step,
+                             start=start, labels={**self.labels, **labels}))
+
+    def record(self, span: Span):
+        self.run_stats.record(span)
+        for sink in self.sinks:
+            try:
+                sink.record(span)
+            except Exception as e:
+                logger.debug(f"Profiler sink {type(sink).__name__} failed: {e}")
+
+    def format_summary(self) -> str:
+        return self.run_stats.format_markdown()
+
+
+_latency_histogram: Optional[HistogramSink] = None
+
+
+def get_latency_histogram() -> HistogramSink:
+    """Process-wide histogram of every run, split by site and model"""
+    global _latency_histogram
+    if _latency_histogram is None:
+        _latency_histogram = HistogramSink(group_by=("site", "model"))
+    return _latency_histogram
+
+
+def get_profiler_sinks() -> list:
+    """
+    Sinks named in AGENT_PROFILE_SINKS (comma separated: log, jsonl, histogram);
+    jsonl writes to AGENT_PROFILE_PATH.
+    """
+    sinks = []
+    for name in (os.getenv("AGENT_PROFILE_SINKS", "") or "").split(","):
+        name = name.strip().lower()
+        if name == "log":
+            sinks.append(LoggingSink())
+        elif name == "jsonl":
+            sinks.append(JsonLinesSink(os.getenv("AGENT_PROFILE_PATH", "") or "./tmp/step_profile.jsonl"))
+        elif name == "histogram":
+            sinks.append(get_latency_histogram())
+        elif name:
+            logger.warning(f"Unknown profiler sink: {name}")
+    return sinks
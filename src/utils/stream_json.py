@@ -0,0 +1,85 @@
+import json
+import logging
+from typing import List, Optional
+
+from json_repair import repair_json
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingActionParser:
+    """
+    Incremental scanner for the agent's JSON output.
+
+    Text is fed chunk by chunk as the model generates it; every element of the top-level
+    `action` array is returned as a dict as soon as its closing brace arrives, while the
+    rest of the output is still being generated. Code fences and anything before the first
+    `{` are ignored. Each character is scanned once.
+    """
+
+    def __init__(self, array_key: str = "action"):
+        self.array_key = array_key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None  # last string seen at depth 1
+        self._in_array = False
+        self._array_depth = 0
+        self._element_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Add generated text; returns the action elements completed by it"""
+        self.text += chunk
+        completed = []
+        text = self.text
+        while self._pos < len(text):
+            char = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:self._pos]
+            elif char == '"':
+                if self._depth > 0:
+                    self._in_string = True
+                    self._string_start = self._pos
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._last_key == self.array_key and not self._in_array:
+                    self._in_array = True
+                    self._array_depth = self._depth + 1
+                elif char == "{" and self._in_array and self._depth == self._array_depth:
+                    self._element_start = self._pos
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._in_array and char == "}" and self._depth == self._array_depth \
+                        and self._element_start is not None:
+                    element = self._parse(text[self._element_start:self._pos + 1])
+                    if element is not None:
+                        completed.append(element)
+                    self._element_start = None
+                elif self._in_array and char == "]" and self._depth == self._array_depth - 1:
+                    self._in_array = False
+                    # only the first top-level action array is streamed
+                    self.array_key = None
+            self._pos += 1
+        return completed
+
+    @staticmethod
+    def _parse(element_text: str) -> Optional[dict]:
+        try:
+            element = json.loads(element_text)
+        except json.JSONDecodeError:
+            try:
+                element = json.loads(repair_json(element_text))
+            except Exception:
+                logger.debug(f"Could not parse streamed action: {element_text}")
+                return None
+        return element if isinstance(element, dict) else None
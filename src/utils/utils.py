@@ -11,7 +11,13 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_ollama import ChatOllama
 from langchain_openai import AzureChatOpenAI, ChatOpenAI
 
+from src.browser.frame_cache import Frame
+
 from .llm import DeepSeekR1ChatOpenAI, DeepSeekR1ChatOllama
+from .llm_registry import create_http_async_client, get_llm_registry, key_hash
+
+# Frames younger than this (seconds) are reused by the live view instead of taking a new screenshot
+LIVE_FRAME_MAX_AGE = 1.0
 
 PROVIDER_DISPLAY_NAMES = {
     "openai": "OpenAI",
@@ -26,11 +32,26 @@ PROVIDER_DISPLAY_NAMES = {
 
 def get_llm_model(provider: str, **kwargs):
     """
-    获取LLM 模型
+    获取LLM 模型，相同配置的客户端在同一事件循环中复用（见 src/utils/llm_registry.py）
     :param provider: 模型类型
     :param kwargs:
     :return:
     """
+    api_key = kwargs.get("api_key", "") or os.getenv(f"{provider.upper()}_API_KEY", "")
+    key = (
+        provider,
+        kwargs.get("model_name"),
+        kwargs.get("base_url", "") or os.getenv(f"{provider.upper()}_ENDPOINT", ""),
+        key_hash(api_key),
+        kwargs.get("temperature", 0.0),
+        kwargs.get("num_ctx"),
+        kwargs.get("num_predict"),
+        kwargs.get("api_version", ""),
+    )
+    return get_llm_registry().get(key, lambda: _create_llm_model(provider, **kwargs))
+
+
+def _create_llm_model(provider: str, **kwargs):
     if provider not in ["ollama"]:
         env_var = f"{provider.upper()}_API_KEY"
         api_key = kwargs.get("api_key", "") or os.getenv(env_var, "")
@@ -77,6 +98,7 @@ def get_llm_model(provider: str, **kwargs):
             temperature=kwargs.get("temperature", 0.0),
             base_url=base_url,
             api_key=api_key,
+            http_async_client=create_http_async_client(),
         )
     elif provider == "deepseek":
         if not kwargs.get("base_url", ""):
@@ -90,6 +112,7 @@ def get_llm_model(provider: str, **kwargs):
                 temperature=kwargs.get("temperature", 0.0),
                 base_url=base_url,
                 api_key=api_key,
+                http_async_client=create_http_async_client(),
             )
         else:
             return ChatOpenAI(
@@ -97,6 +120,7 @@ def get_llm_model(provider: str, **kwargs):
                 temperature=kwargs.get("temperature", 0.0),
                 base_url=base_url,
                 api_key=api_key,
+                http_async_client=create_http_async_client(),
             )
     elif provider == "google":
         return ChatGoogleGenerativeAI(
@@ -137,6 +161,7 @@ def get_llm_model(provider: str, **kwargs):
             api_version=api_version,
             azure_endpoint=base_url,
             api_key=api_key,
+            http_async_client=create_http_async_client(),
         )
     elif provider == "alibaba":
         if not kwargs.get("base_url", ""):
@@ -149,6 +174,7 @@ def get_llm_model(provider: str, **kwargs):
             temperature=kwargs.get("temperature", 0.0),
             base_url=base_url,
             api_key=api_key,
+            http_async_client=create_http_async_client(),
         )
 
     elif provider == "moonshot":
@@ -157,6 +183,7 @@ def get_llm_model(provider: str, **kwargs):
             temperature=kwargs.get("temperature", 0.0),
             base_url=os.getenv("MOONSHOT_ENDPOINT"),
             api_key=os.getenv("MOONSHOT_API_KEY"),
+            http_async_client=create_http_async_client(),
         )
     else:
         raise ValueError(f"Unsupported provider: {provider}")
@@ -234,16 +261,26 @@ def get_latest_files(directory: str, file_types: list = ['.webm', '.zip']) -> Di
     return latest_files
 
 
-async def capture_screenshot(browser_context):
-    """Capture and encode a screenshot"""
-    # Extract the Playwright browser instance
-    playwright_browser = browser_context.browser.playwright_browser  # Ensure this is correct.
-
-    # Check if the browser instance is valid and if an existing context can be reused
-    if playwright_browser and playwright_browser.contexts:
-        playwright_context = playwright_browser.contexts[0]
+async def capture_frame(browser_context, max_age: float = LIVE_FRAME_MAX_AGE, show_highlights: Optional[bool] = None):
+    """
+    Latest picture of the active page for the live view.
+    Reuses the frame the agent (or screencast) captured within max_age seconds, otherwise takes
+    a JPEG screenshot and publishes it to the context's frame cache. The agent's screenshots show
+    its element highlights; with show_highlights False (LIVE_VIEW_SHOW_HIGHLIGHTS) they are not
+    reused, at the cost of a screenshot of its own.
+    """
+    if show_highlights is None:
+        show_highlights = os.getenv("LIVE_VIEW_SHOW_HIGHLIGHTS", "true").lower() == "true"
+    # Use the context's own Playwright context: pooled contexts share one browser,
+    # so browser.contexts[0] may belong to another session
+    if browser_context.session is not None:
+        playwright_context = browser_context.session.context
     else:
-        return None
+        playwright_browser = browser_context.browser.playwright_browser
+        if playwright_browser and playwright_browser.contexts:
+            playwright_context = playwright_browser.contexts[0]
+        else:
+            return None
 
     # Access pages in the context
     pages = None
@@ -259,6 +296,12 @@ async def capture_screenshot(browser_context):
     else:
         return None
 
+    frame_cache = getattr(browser_context, "frame_cache", None)
+    if frame_cache is not None:
+        frame = frame_cache.latest(max_age=max_age, url=active_page.url, highlighted=show_highlights)
+        if frame is not None:
+            return frame
+
     # Take screenshot
     try:
         screenshot = await active_page.screenshot(
@@ -267,6 +310,8 @@ async def capture_screenshot(browser_context):
             scale="css"
         )
         encoded = base64.b64encode(screenshot).decode('utf-8')
-        return encoded
     except Exception as e:
         return None
+    if frame_cache is not None:
+        return frame_cache.publish(encoded, url=active_page.url, format="jpeg")
+    return Frame(data=encoded, url=active_page.url, timestamp=time.time(), format="jpeg")
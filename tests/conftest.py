@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(".")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "false")
+
+
+class FakeBrowserContext:
+    """按顺序切换的页面，pages 为 (url, state) 列表；每次点击后切换到下一个页面"""
+
+    def __init__(self, pages):
+        from browser_use.browser.context import BrowserContextConfig
+
+        self.config = BrowserContextConfig(wait_between_actions=0)
+        self.pages = pages
+        self.position = 0
+
+    async def get_state(self):
+        return self.pages[self.position][1]
+
+    async def get_selector_map(self):
+        return self.pages[self.position][1].selector_map
+
+    async def get_current_page(self):
+        return SimpleNamespace(url=self.pages[self.position][0])
+
+    async def remove_highlights(self):
+        pass
+
+
+def make_agent(llm=None, pages=None, **kwargs):
+    """
+    通过构造函数创建的 CustomAgent，使用假的浏览器上下文和控制器；
+    agent.controller.executed 记录执行过的动作参数，executed_at 记录执行时间
+    """
+    from browser_use.agent.views import ActionResult
+    from langchain_core.language_models import FakeListChatModel
+
+    from src.agent.custom_agent import CustomAgent
+    from src.agent.custom_prompts import CustomAgentMessagePrompt, CustomSystemPrompt
+    from src.controller.custom_controller import CustomController
+    from src.utils.step_profiler import StepProfiler
+
+    browser_context = kwargs.pop("browser_context", None) or FakeBrowserContext(
+        pages or [("about:blank", SimpleNamespace(selector_map={}))])
+
+    class FakeController(CustomController):
+        def __init__(self):
+            super().__init__()
+            self.executed = []
+            self.executed_at = []
+
+        async def act(self, action, *args, **kwargs):
+            params = action.model_dump(exclude_unset=True)
+            self.executed.append(params)
+            self.executed_at.append(time.time())
+            name = next(iter(params))
+            if name == "click_element":
+                browser_context.position = min(browser_context.position + 1, len(browser_context.pages) - 1)
+            return ActionResult(is_done=name == "done", extracted_content=name)
+
+    kwargs.setdefault("system_prompt_class", CustomSystemPrompt)
+    kwargs.setdefault("agent_prompt_class", CustomAgentMessagePrompt)
+    kwargs.setdefault("prefetch_state", False)
+    kwargs.setdefault("stream_actions", False)
+    kwargs.setdefault("profiler", StepProfiler(sinks=[]))
+    # AgentSettings 只接受真正的聊天模型
+    kwargs.setdefault("page_extraction_llm", FakeListChatModel(responses=[""]))
+    return CustomAgent(task="test", llm=llm or SimpleNamespace(model_name="fake-model"),
+                       browser_context=browser_context, controller=FakeController(), **kwargs)
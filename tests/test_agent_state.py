@@ -0,0 +1,61 @@
+import asyncio
+import sys
+import threading
+import time
+
+sys.path.append(".")
+
+
+def test_takeover_finish_wakes_waiter():
+    from src.agent.custom_views import CustomAgentState
+    from src.utils.agent_state import AgentState
+
+    async def run():
+        control = AgentState()
+        agent_state = CustomAgentState(parent=control)
+        control.set_user_control_active(True)
+
+        # Gradio 的同步回调在线程池中执行
+        timer = threading.Timer(0.05, control.set_user_control_active, args=(False,))
+        start = time.time()
+        timer.start()
+        finished = await agent_state.wait_for_user_control_finished(timeout=2)
+        assert finished
+        assert time.time() - start < 0.5
+
+    asyncio.run(run())
+
+
+def test_stop_wakes_takeover_waiter():
+    from src.utils.agent_state import AgentState
+
+    async def run():
+        state = AgentState()
+        state.set_user_control_active(True)
+        waiter = asyncio.create_task(state.wait_for_user_control_finished())
+        await asyncio.sleep(0)
+        state.request_stop()
+        assert await asyncio.wait_for(waiter, timeout=1) is False
+
+    asyncio.run(run())
+
+
+def test_wait_for_control_change():
+    from src.utils.agent_state import AgentState
+
+    async def run():
+        state = AgentState()
+        version = state.control_version
+        # 已知版本过期时立即返回
+        state.set_user_control_active(True)
+        assert await state.wait_for_control_change(version, timeout=1) == version + 1
+        # 无变化时超时返回当前版本
+        assert await state.wait_for_control_change(version + 1, timeout=0.05) == version + 1
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_takeover_finish_wakes_waiter()
+    test_stop_wakes_takeover_waiter()
+    test_wait_for_control_change()
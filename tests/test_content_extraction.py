@@ -0,0 +1,147 @@
+import asyncio
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(".")
+
+HTML = """
+<html><head><title>Doc</title></head>
+<body><nav>menu</nav><article><h1>Heading</h1><p>Main paragraph of the article.</p></article></body></html>
+"""
+
+
+def test_extract_in_process_pool(monkeypatch):
+    from src.utils import content_extraction
+
+    monkeypatch.setenv("EXTRACT_PROCESS_WORKERS", "1")
+    try:
+        content = asyncio.run(content_extraction.extract_main_content(HTML, timeout=60))
+    finally:
+        content_extraction.shutdown_extraction_pool()
+    assert "Main paragraph of the article." in content
+
+
+def test_extract_in_thread(monkeypatch):
+    from src.utils import content_extraction
+
+    monkeypatch.setenv("EXTRACT_PROCESS_WORKERS", "0")
+    content = asyncio.run(content_extraction.extract_main_content(HTML))
+    assert "Main paragraph of the article." in content
+
+
+
+def test_timeout_only_abandons_its_own_task(monkeypatch):
+    import time
+
+    from src.utils import content_extraction
+
+    monkeypatch.setenv("EXTRACT_PROCESS_WORKERS", "2")
+    executor = content_extraction._get_executor()
+
+    async def run():
+        stuck = content_extraction._run_in_pool(executor, time.sleep, 10, timeout=1)
+        # 同一进程池中另一个仍在运行的任务不受超时影响
+        other = content_extraction._run_in_pool(executor, time.sleep, 3, timeout=30)
+        return await asyncio.gather(stuck, other, return_exceptions=True)
+
+    try:
+        stuck, other = asyncio.run(run())
+        assert isinstance(stuck, asyncio.TimeoutError)
+        assert other is None
+        # 超时后新任务进入新的进程池，旧进程池在任务结束后才回收
+        assert content_extraction._get_executor() is not executor
+        assert executor not in content_extraction._retired_executors
+    finally:
+        content_extraction.shutdown_extraction_pool()
+
+
+ARTICLE = "<html><head><title>Docs &amp; Guides</title></head><body><article><h1>Docs</h1>" + "<p>Static documentation paragraph.</p>" * 40 + "</article></body></html>"
+JS_SHELL = "<html><body><div id='root'></div><script src='/app.js'></script></body></html>"
+LOGIN_FORM = ("<html><body><article>" + "<p>Sign in to read this documentation page.</p>" * 40 +
+              "<form><input name='user'><input type='password' name='pass'></form></article></body></html>")
+PAYWALL = ("<html><head><script type='application/ld+json'>{\"isAccessibleForFree\": false}</script></head>"
+           "<body><article>" + "<p>Static documentation paragraph.</p>" * 40 + "</article></body></html>")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        StubHandler.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/article":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body, etag = ARTICLE, '"v1"'
+        elif self.path == "/app":
+            body, etag = JS_SHELL, None
+        elif self.path == "/private":
+            self.send_response(302)
+            self.send_header("Location", "/login?next=/private")
+            self.end_headers()
+            return
+        elif self.path.startswith("/login"):
+            body, etag = LOGIN_FORM, None
+        elif self.path == "/premium":
+            body, etag = PAYWALL, None
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_http_fast_path(tmp_path, monkeypatch):
+    from src.utils.content_extraction import fetch_page_content
+    from src.utils.extract_cache import ExtractCache
+
+    monkeypatch.setenv("EXTRACT_PROCESS_WORKERS", "0")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    cache = ExtractCache(str(tmp_path), ttl=60)
+
+    async def run():
+        content = await fetch_page_content(f"{base_url}/article", cache)
+        assert "Static documentation paragraph." in content
+        # 与浏览器路径(jina)相同的头部
+        assert content.startswith(f"Title: Docs & Guides\n\nURL Source: {base_url}/article\n\nMarkdown Content:\n")
+        # 命中缓存，不再请求
+        assert await fetch_page_content(f"{base_url}/article", cache) == content
+        assert len(StubHandler.requests) == 1
+
+        # 缓存过期后用ETag条件请求，304时复用
+        cache.ttl = 0
+        assert await fetch_page_content(f"{base_url}/article", cache) == content
+        assert StubHandler.requests[-1] == ("/article", '"v1"')
+
+        # JS渲染的页面和错误页退回浏览器
+        assert await fetch_page_content(f"{base_url}/app", cache) is None
+        assert await fetch_page_content(f"{base_url}/missing", cache) is None
+        # 登录页和付费墙也交给浏览器
+        assert await fetch_page_content(f"{base_url}/private", cache) is None
+        assert await fetch_page_content(f"{base_url}/premium", cache) is None
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    from src.utils.content_extraction import extract_main_content, shutdown_extraction_pool
+
+    print(asyncio.run(extract_main_content(HTML)))
+    shutdown_extraction_pool()
@@ -0,0 +1,61 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+sys.path.append(".")
+
+
+def _make_pool(max_size):
+    from browser_use.browser.browser import BrowserConfig
+    from browser_use.browser.context import BrowserContextConfig
+
+    from src.browser.context_pool import BrowserContextPool
+
+    class FakePool(BrowserContextPool):
+        """不启动浏览器的上下文池"""
+        created = 0
+
+        async def _create_context(self):
+            FakePool.created += 1
+            return SimpleNamespace(context_id=f"context-{FakePool.created}", session=None)
+
+        async def _is_healthy(self, context):
+            return True
+
+        async def _reset(self, context):
+            return True
+
+        async def _close_context(self, context):
+            pass
+
+    return FakePool(BrowserConfig(), BrowserContextConfig(), min_size=0, max_size=max_size)
+
+
+def test_acquire_waits_when_all_contexts_are_leased():
+    async def run():
+        pool = _make_pool(max_size=2)
+        first = await pool.acquire()
+        await pool.acquire()
+        # 已借出max_size个上下文时，新的请求等待归还
+        waiting = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0.05)
+        assert not waiting.done() and pool.size == 2
+
+        await pool.release(first)
+        third = await asyncio.wait_for(waiting, timeout=1)
+        # 复用归还的上下文，不新建
+        assert pool.size == 2 and type(pool).created == 2
+        assert third is first
+
+        # 取消等待不会占用名额
+        cancelled = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0.05)
+        cancelled.cancel()
+        await pool.release(third)
+        assert (await asyncio.wait_for(pool.acquire(), timeout=1)) is third
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_acquire_waits_when_all_contexts_are_leased()
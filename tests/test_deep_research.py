@@ -1,5 +1,7 @@
 import asyncio
+import json
 import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -26,5 +28,157 @@ async def test_deep_research():
     
 
 
+def test_query_agents_are_bounded(monkeypatch):
+    from src.utils import deep_research
+
+    running = []
+    peak = []
+
+    class FakeAgent:
+        def __init__(self, task, **kwargs):
+            self.task = task
+
+        async def run(self, max_steps):
+            running.append(self.task)
+            peak.append(len(running))
+            await asyncio.sleep(0.05)
+            running.remove(self.task)
+            return self.task
+
+    monkeypatch.setattr(deep_research, "CustomAgent", FakeAgent)
+    results = asyncio.run(deep_research.run_query_agents(
+        [f"query {i}" for i in range(5)], llm=None, add_infos="", controller=None,
+        max_concurrent_queries=2))
+
+    # 结果顺序与查询一致
+    assert results == [f"query {i}" for i in range(5)]
+    assert max(peak) == 2
+
+
+def test_report_uses_async_llm(tmp_path):
+    from langchain_core.messages import AIMessage
+
+    from src.utils.deep_research import generate_final_report
+
+    class FakeLLM:
+        def invoke(self, messages):
+            raise AssertionError("blocking invoke called inside the event loop")
+
+        async def ainvoke(self, messages):
+            return AIMessage(content="# Report")
+
+    report, report_path = asyncio.run(generate_final_report("task", [], str(tmp_path), FakeLLM()))
+    assert report == "# Report"
+    assert os.path.exists(report_path)
+
+
+def test_record_index_drops_near_duplicates():
+    from src.utils.record_index import RecordIndex, normalize_url
+
+    index = RecordIndex([{"url": "https://www.example.com/a/?utm_source=x",
+                          "summary_content": "DeepSeek-R1 scores 79.8% on AIME 2024."}])
+    # 同一来源的重复记录被丢弃
+    assert not index.add({"url": "https://example.com/a", "summary_content": "deepseek-r1 scores 79.8% on AIME 2024"})
+    # 更完整的记录替换旧记录
+    assert not index.add({"url": "https://example.com/a",
+                          "summary_content": "DeepSeek-R1 scores 79.8% on AIME 2024, on par with o1."})
+    assert index.records[0]["summary_content"].endswith("on par with o1.")
+    # 其他来源的近似重复也被丢弃
+    summary = ("DeepSeek-R1 is trained with large scale reinforcement learning without supervised "
+               "fine-tuning as a preliminary step and shows remarkable reasoning capabilities")
+    assert index.add({"url": "b", "summary_content": summary})
+    assert not index.add({"url": "c", "summary_content": summary + " in math."})
+    assert index.add({"url": "c", "summary_content": "The model weights are released under the MIT license."})
+    assert not index.add({"url": "d", "summary_content": ""})
+    assert len(index) == 3
+    assert index.records[1]["summary_content"].endswith("in math.")
+    assert normalize_url("HTTPS://WWW.Example.com/a/?b=1&utm_medium=y#top") == "example.com/a?b=1"
+
+
+def test_merge_record_infos():
+    from src.utils.deep_research import merge_record_infos
+    from src.utils.record_index import RecordIndex
+
+    chunk = [
+        {"url": "a", "summary_content": "DeepSeek-R1 scores 79.8% on AIME 2024."},
+        # 同一来源的重复记录被丢弃
+        {"url": "a", "summary_content": "deepseek-r1 scores 79.8% on AIME 2024"},
+        # 更完整的记录替换旧记录
+        {"url": "a", "summary_content": "DeepSeek-R1 scores 79.8% on AIME 2024, on par with o1."},
+        # 其他来源的重复记录合并，保留两个来源
+        {"url": "b", "summary_content": "DeepSeek-R1 scores 79.8% on AIME 2024, on par with o1"},
+        {"url": "c", "summary_content": ""},
+    ]
+    history = merge_record_infos(RecordIndex(), chunk)
+    assert len(history) == 1
+    assert history[0]["summary_content"].endswith("on par with o1.")
+    assert history[0]["url"] == "a" and history[0]["urls"] == ["a", "b"]
+    # 输入的记录不被修改
+    assert "urls" not in chunk[2] and chunk[2]["summary_content"].endswith("on par with o1.")
+
+
+def test_record_index_replacement_updates_buckets():
+    from src.utils.record_index import RecordIndex
+
+    short = "Solar panels convert sunlight into electricity using photovoltaic cells made of silicon"
+    longer = short + " and their efficiency has improved steadily over the last two decades"
+    index = RecordIndex([{"url": "https://a", "summary_content": short}])
+    assert not index.add({"url": "https://a", "summary_content": longer})
+    assert index._by_url == {"a": [0]}
+    # 被替换的签名不再留在LSH桶中
+    signature = index._signature(longer)
+    assert all(index._buckets.get(key) == [0] for key in index._band_keys(signature))
+    assert sum(len(bucket) for bucket in index._buckets.values()) == index.bands
+
+
+def test_sectioned_report(tmp_path):
+    from langchain_core.messages import AIMessage
+
+    from src.utils.deep_research import generate_final_report
+
+    records = [
+        {"url": "https://a", "urls": ["https://a", "https://a2"], "title": "A",
+         "summary_content": "Fact A about the training recipe.",
+         "thinking": "Belongs to the methodology section."},
+        {"url": "https://b", "title": "B", "summary_content": "Fact B, intro context.",
+         "thinking": "Could be used in the introduction."},
+        {"url": "https://c", "title": "C", "summary_content": "Fact C with benchmark numbers.",
+         "thinking": "Key results for the analysis."},
+    ]
+
+    class FakeLLM:
+        async def ainvoke(self, messages):
+            prompt = messages[-1].content
+            if "Section:" not in prompt:
+                return AIMessage(content="Report Title")
+            # 每个章节只引用自己收到的记录，多个来源写在同一个括号里
+            refs = [ref for record in json.loads(prompt.split("Records:\n", 1)[1]) for ref in record["refs"]]
+            return AIMessage(content=f"Draft [{', '.join(map(str, refs))}] in [2024]")
+
+    report, _ = asyncio.run(generate_final_report("task", records, str(tmp_path), FakeLLM(),
+                                                  max_single_pass_chars=10))
+    assert report.startswith("# Report Title")
+    sections = re.findall(r"^## (.+)$", report, flags=re.MULTILINE)
+    assert sections == ["Introduction", "Methodology", "Key Findings", "References"]
+    # 引用按首次出现重新编号
+    assert "## Introduction\n\nDraft [1]" in report
+    assert "[1] B (https://b)" in report and "[2] A (https://a)" in report
+    # 不对应来源的编号保持不变
+    assert "Draft [1] in [2024]" in report
+    # 成组引用逐个重新编号，合并记录的第二个来源也列入参考文献
+    assert "## Methodology\n\nDraft [2][3] in [2024]" in report
+    assert "[3] https://a2 (https://a2)" in report and "[4] C (https://c)" in report
+
+
+def test_grouped_citations_are_renumbered():
+    from src.utils.report_builder import _citation_numbers
+
+    assert _citation_numbers("1, 2") == [1, 2]
+    assert _citation_numbers("1-3") == [1, 2, 3]
+    assert _citation_numbers("2, 4–5") == [2, 4, 5]
+    # 年份区间不是引用
+    assert _citation_numbers("1990-2020") == []
+
+
 if __name__ == "__main__":
     asyncio.run(test_deep_research())
\ No newline at end of file
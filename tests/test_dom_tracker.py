@@ -0,0 +1,132 @@
+import asyncio
+import sys
+
+sys.path.append(".")
+
+
+class FakePage:
+    """模拟 Playwright Page：evaluate 返回当前 DOM 版本"""
+
+    def __init__(self, url="https://example.com"):
+        self.url = url
+        self.token = "doc1"
+        self.version = 0
+
+    async def evaluate(self, script):
+        return f"{self.token}:{self.version}"
+
+
+def _state(url="https://example.com"):
+    from browser_use.browser.views import BrowserState
+    from browser_use.dom.views import DOMElementNode
+
+    body = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="/body", attributes={}, children=[])
+    return BrowserState(element_tree=body, selector_map={}, url=url, title="", tabs=[])
+
+
+def test_cached_state_reused_until_dom_changes():
+    from src.browser.dom_tracker import DomStateCache
+
+    async def run():
+        cache = DomStateCache(max_age=30)
+        page = FakePage()
+        state = _state()
+        assert await cache.lookup(page, tab_count=1) is None
+        cache.store(state, page, "doc1:0", "doc1:0", tab_count=1)
+
+        # DOM 未变化时复用状态
+        assert await cache.lookup(page, tab_count=1) is state
+        # 打开新标签页
+        assert await cache.lookup(page, tab_count=2) is None
+        # DOM 变化
+        page.version = 1
+        assert await cache.lookup(page, tab_count=1) is None
+        # 同一 url 重新加载（新文档）
+        page.version, page.token = 0, "doc2"
+        assert await cache.lookup(page, tab_count=1) is None
+        assert cache.hits == 1
+
+    asyncio.run(run())
+
+
+def test_state_not_cached_when_changed_during_build_or_expired():
+    from src.browser.dom_tracker import DomStateCache
+
+    async def run():
+        cache = DomStateCache(max_age=30)
+        page = FakePage()
+        # 构建期间 DOM 发生变化
+        cache.store(_state(), page, "doc1:0", "doc1:1", tab_count=1)
+        assert await cache.lookup(page, tab_count=1) is None
+        # 状态的 url 与页面不符（构建失败时返回的旧状态）
+        cache.store(_state("https://example.com/old"), page, "doc1:0", "doc1:0", tab_count=1)
+        assert await cache.lookup(page, tab_count=1) is None
+
+        expired = DomStateCache(max_age=0)
+        expired.store(_state(), page, "doc1:0", "doc1:0", tab_count=1)
+        await asyncio.sleep(0.01)
+        assert await expired.lookup(page, tab_count=1) is None
+
+    asyncio.run(run())
+
+
+
+def test_prefetched_state_validated_before_use():
+    from types import SimpleNamespace
+
+    from src.agent.custom_agent import CustomAgent
+
+    class FakeContext:
+        def __init__(self):
+            self.current = True
+            self.fresh_calls = 0
+
+        async def is_state_current(self, state):
+            return self.current
+
+        async def get_state(self):
+            self.fresh_calls += 1
+            return "fresh"
+
+    async def prefetched():
+        return "prefetched"
+
+    async def run():
+        context = FakeContext()
+        agent = SimpleNamespace(browser_context=context, _state_prefetch=asyncio.create_task(prefetched()))
+        assert await CustomAgent._get_browser_state(agent) == "prefetched"
+        assert agent._state_prefetch is None and context.fresh_calls == 0
+
+        # 页面在预取之后发生了变化
+        context.current = False
+        agent._state_prefetch = asyncio.create_task(prefetched())
+        assert await CustomAgent._get_browser_state(agent) == "fresh"
+        # 没有预取时直接获取
+        assert await CustomAgent._get_browser_state(agent) == "fresh"
+        assert context.fresh_calls == 2
+
+    asyncio.run(run())
+
+
+def test_prefetch_disabled_without_state_cache():
+    from types import SimpleNamespace
+
+    from conftest import FakeBrowserContext, make_agent
+
+    from src.browser.dom_tracker import DomStateCache
+
+    # 默认不预取
+    assert not make_agent(prefetch_state=None).prefetch_state
+    # 没有状态缓存时无法验证预取结果，因此不预取
+    assert not make_agent(prefetch_state=True).prefetch_state
+
+    browser_context = FakeBrowserContext([("about:blank", SimpleNamespace(selector_map={}))])
+    browser_context.state_cache = DomStateCache(max_age=30)
+    assert make_agent(prefetch_state=True, browser_context=browser_context).prefetch_state
+
+
+if __name__ == "__main__":
+    test_cached_state_reused_until_dom_changes()
+    test_state_not_cached_when_changed_during_build_or_expired()
+    test_prefetched_state_validated_before_use()
+    test_prefetch_disabled_without_state_cache()
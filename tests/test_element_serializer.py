@@ -0,0 +1,75 @@
+import sys
+
+sys.path.append(".")
+
+
+def _page(items, extra_text=None):
+    """body 下每个 (index, text, placeholder) 生成一个可交互元素"""
+    from browser_use.dom.views import DOMElementNode, DOMTextNode
+
+    body = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="/body", attributes={}, children=[])
+    for position, (index, text, placeholder) in enumerate(items):
+        element = DOMElementNode(is_visible=True, parent=body, tag_name="input", xpath=f"/body/input[{position + 1}]",
+                                 attributes={"placeholder": placeholder, "type": "text"}, children=[],
+                                 highlight_index=index)
+        element.children.append(DOMTextNode(is_visible=True, parent=element, text=text))
+        body.children.append(element)
+    if extra_text:
+        body.children.append(DOMTextNode(is_visible=True, parent=body, text=extra_text))
+    return body
+
+
+def test_compact_listing():
+    from src.utils.element_serializer import ElementSerializationSettings, ElementSerializer
+
+    shared = "Search for products, brands and more"
+    tree = _page([(1, "a" * 300, shared), (2, "go", shared)])
+    serializer = ElementSerializer(["placeholder", "type"], ElementSerializationSettings(max_text_length=50))
+    listing = serializer.serialize(tree)
+    lines = listing.text.splitlines()
+
+    # 重复的长属性值只列出一次
+    assert f"@1={shared}" in lines
+    assert listing.text.count(shared) == 1
+    assert lines[-2] == "[1]<input @1;text>" + "a" * 50 + "…/>"
+    assert lines[-1] == "[2]<input @1;text>go/>"
+    assert listing.reference is None
+
+
+def test_non_compact_matches_original_format():
+    from src.utils.element_serializer import ElementSerializationSettings, ElementSerializer
+
+    tree = _page([(1, "Login", "user name")], extra_text="Welcome")
+    serializer = ElementSerializer(["placeholder"], ElementSerializationSettings(compact=False))
+    assert serializer.serialize(tree).text == tree.clickable_elements_to_string(include_attributes=["placeholder"])
+
+
+def test_diff_mode():
+    from src.utils.element_serializer import ElementSerializationSettings, ElementSerializer
+
+    items = [(i, f"item {i}", f"field {i}") for i in range(1, 11)]
+    serializer = ElementSerializer(["placeholder"], ElementSerializationSettings(diff_mode=True))
+
+    # 第一步生成完整参考列表
+    first = serializer.serialize(_page(items), url="https://example.com")
+    assert first.reference is not None and "[10]<input field 10>item 10/>" in first.reference
+    assert "unchanged" in first.text
+
+    # 只发送变化的元素
+    changed = list(items)
+    changed[2] = (3, "item 3 selected", "field 3")
+    second = serializer.serialize(_page(changed[:-1]), url="https://example.com")
+    assert second.reference is None
+    assert "[3]<input field 3>item 3 selected/>" in second.text
+    assert "No longer on the page: [10]" in second.text
+    assert "item 4" not in second.text
+
+    # 变化过多或切换页面时重新生成参考列表
+    assert serializer.serialize(_page(items[:3]), url="https://example.com").reference is not None
+    assert serializer.serialize(_page(items[:3]), url="https://example.com/other").reference is not None
+
+
+if __name__ == "__main__":
+    test_compact_listing()
+    test_non_compact_matches_original_format()
+    test_diff_mode()
@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.append(".")
+
+
+def test_cache_hit_and_ttl(tmp_path):
+    from src.utils.extract_cache import ExtractCache
+
+    cache = ExtractCache(str(tmp_path), ttl=60)
+    assert cache.get("https://example.com/a") is None
+    cache.put("https://example.com/a", "# A", etag='"v1"')
+    # 规范化后的同一URL命中缓存
+    assert cache.get("https://www.example.com/a/?utm_source=x") == "# A"
+
+    # 重新加载索引后仍可命中
+    reloaded = ExtractCache(str(tmp_path), ttl=60)
+    assert reloaded.get("https://example.com/a") == "# A"
+
+    expired = ExtractCache(str(tmp_path), ttl=0)
+    assert expired.get("https://example.com/a") is None
+    entry = expired.lookup("https://example.com/a")
+    assert entry.etag == '"v1"'
+    expired.ttl = 60
+    expired.touch("https://example.com/a")
+    assert expired.get("https://example.com/a") == "# A"
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    from src.utils.extract_cache import ExtractCache
+
+    cache = ExtractCache(str(tmp_path), ttl=60, max_bytes=25)
+    cache.put("https://a", "a" * 10)
+    cache.put("https://b", "b" * 10)
+    # 访问a后，b成为最久未使用
+    assert cache.get("https://a") is not None
+    cache.put("https://c", "c" * 10)
+    assert cache.get("https://b") is None
+    assert cache.get("https://a") is not None and cache.get("https://c") is not None
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".md")]) == 2
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    test_cache_hit_and_ttl(tempfile.mkdtemp())
+    test_cache_evicts_least_recently_used(tempfile.mkdtemp())
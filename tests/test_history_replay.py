@@ -0,0 +1,171 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+sys.path.append(".")
+
+from conftest import make_agent
+
+
+def _page(buttons):
+    """body 下每个 (index, xpath_position, attributes) 生成一个按钮"""
+    from browser_use.dom.views import DOMElementNode
+
+    body = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="/body", attributes={}, children=[])
+    selector_map = {}
+    for index, position, attributes in buttons:
+        element = DOMElementNode(is_visible=True, parent=body, tag_name="button",
+                                 xpath=f"/body/button[{position}]", attributes=attributes, children=[],
+                                 highlight_index=index)
+        body.children.append(element)
+        selector_map[index] = element
+    return SimpleNamespace(element_tree=body, selector_map=selector_map)
+
+
+def _recorded(state, index):
+    from browser_use.dom.history_tree_processor.service import HistoryTreeProcessor
+
+    return HistoryTreeProcessor.convert_dom_element_to_history_element(state.selector_map[index])
+
+
+def test_find_replay_element():
+    from src.agent.history_replay import find_replay_element, urls_match
+
+    recorded_page = _page([(1, 1, {"id": "search"}), (2, 2, {"name": "submit", "type": "submit"})])
+    search = _recorded(recorded_page, 1)
+    submit = _recorded(recorded_page, 2)
+
+    # 元素未变化，仅编号改变
+    page = _page([(5, 1, {"id": "search"}), (6, 2, {"name": "submit", "type": "submit"})])
+    assert find_replay_element(search, page).highlight_index == 5
+
+    # xpath 改变时按属性匹配
+    page = _page([(1, 1, {"id": "banner"}), (2, 2, {"id": "search", "class": "x"}),
+                  (3, 3, {"name": "submit", "type": "submit", "class": "y"})])
+    assert find_replay_element(search, page).highlight_index == 2
+    assert find_replay_element(submit, page).highlight_index == 3
+
+    # 元素消失或匹配不唯一时无法定位
+    page = _page([(1, 3, {"type": "submit"}), (2, 4, {"type": "submit"})])
+    assert find_replay_element(submit, page) is None
+    assert find_replay_element(search, _page([(1, 3, {"id": "other"})])) is None
+
+    assert urls_match("https://www.example.com/a/?utm_source=x", "https://example.com/a")
+    assert not urls_match("https://example.com/a", "https://example.com/b")
+
+
+def _save_history(agent, path, steps):
+    from browser_use.agent.views import ActionResult, AgentHistory, AgentHistoryList
+    from browser_use.browser.views import BrowserStateHistory
+
+    history = []
+    for url, actions, interacted in steps:
+        model_output = agent.AgentOutput(
+            current_state={"evaluation_previous_goal": "", "important_contents": "", "thought": "", "next_goal": ""},
+            action=[agent.ActionModel(**action) for action in actions])
+        history.append(AgentHistory(model_output=model_output, result=[ActionResult() for _ in actions],
+                                    state=BrowserStateHistory(url=url, title="", tabs=[],
+                                                              interacted_element=interacted)))
+    AgentHistoryList(history=history).save_to_file(path)
+
+
+def test_replay_without_llm(tmp_path):
+    recorded_home = _page([(1, 1, {"id": "search"}), (2, 2, {"id": "next"})])
+    # 重放时页面结构变化，元素编号不同
+    pages = [("https://example.com", _page([(1, 1, {"id": "banner"}), (4, 2, {"id": "search"}),
+                                           (7, 3, {"id": "next"})])),
+             ("https://example.com/results", _page([(1, 1, {"id": "more"})])),
+             ("https://example.com/results", _page([]))]
+    agent = make_agent(pages=pages)
+    history_file = str(tmp_path / "history.json")
+    _save_history(agent, history_file, [
+        ("https://example.com", [{"click_element": {"index": 1}}], [_recorded(recorded_home, 1)]),
+        ("https://www.example.com/results/", [{"click_element": {"index": 1}}],
+         [_recorded(pages[1][1], 1)]),
+        ("https://example.com/results", [{"done": {"text": "finished", "success": True}}], [None]),
+    ])
+
+    results, report = asyncio.run(agent.replay(history_file))
+    assert agent.controller.executed[0] == {"click_element": {"index": 4}}
+    assert agent.controller.executed[-1]["done"]["text"] == "finished"
+    assert results[-1].is_done
+    assert report.success and report.replayed_steps == 3 and report.actions == 3
+
+
+def test_replay_reports_url_mismatch(tmp_path):
+    recorded_home = _page([(1, 1, {"id": "search"})])
+    pages = [("https://example.com", recorded_home), ("https://example.com/login", _page([]))]
+    agent = make_agent(pages=pages)
+    history_file = str(tmp_path / "history.json")
+    _save_history(agent, history_file, [
+        ("https://example.com", [{"click_element": {"index": 1}}], [_recorded(recorded_home, 1)]),
+        ("https://example.com/results", [{"done": {"text": "finished", "success": True}}], [None]),
+    ])
+
+    results, report = asyncio.run(agent.replay(history_file))
+    # 页面跳转与记录不一致时停止重放
+    assert not report.success
+    assert report.url_mismatches == ["Step 1: expected https://example.com/results, got https://example.com/login"]
+    assert len(agent.controller.executed) == 1
+
+
+def test_replay_does_not_repeat_executed_actions(tmp_path):
+    recorded_home = _page([(1, 1, {"id": "search"})])
+    pages = [("https://example.com", recorded_home), ("https://example.com/results", _page([]))]
+    agent = make_agent(pages=pages)
+    history_file = str(tmp_path / "history.json")
+    _save_history(agent, history_file, [
+        ("https://example.com", [{"click_element": {"index": 1}}, {"go_back": {}}],
+         [_recorded(recorded_home, 1), None]),
+    ])
+    act = agent.controller.act
+
+    async def failing_act(action, *args, **kwargs):
+        result = await act(action, *args, **kwargs)
+        if "go_back" in action.model_dump(exclude_unset=True):
+            raise RuntimeError("browser closed")
+        return result
+
+    agent.controller.act = failing_act
+    results, report = asyncio.run(agent.replay(history_file, retry_delay=0))
+    # 执行中失败的步骤不重试，已执行的点击不会重复
+    assert [next(iter(action)) for action in agent.controller.executed] == ["click_element", "go_back"]
+    assert not report.success and report.errors == ["Step 1 failed: browser closed"]
+
+
+def test_replay_runner_uses_session_browser(tmp_path):
+    from langchain_core.language_models import FakeListChatModel
+
+    from conftest import FakeBrowserContext
+    from src.agent_runners import run_replay_agent
+    from src.globals import _session_manager
+
+    history_file = str(tmp_path / "history.json")
+    _save_history(make_agent(), history_file, [
+        ("about:blank", [{"done": {"text": "finished", "success": True}}], [None]),
+    ])
+    # 保持打开的会话浏览器直接用于重放
+    session = _session_manager.get_session("replay-test")
+    session.browser = SimpleNamespace()
+    session.browser_context = FakeBrowserContext([("about:blank", _page([]))])
+
+    # 重放不调用LLM，FakeListChatModel 没有可用的回复
+    final_result, errors, trace_file = asyncio.run(run_replay_agent(
+        llm=FakeListChatModel(responses=[]), use_own_browser=False, keep_browser_open=True, headless=True,
+        disable_security=True, window_w=1280, window_h=1100, save_recording_path=None,
+        save_trace_path=str(tmp_path / "traces"), history_file=history_file, chrome_cdp="",
+        session_id="replay-test"))
+    assert errors == "" and trace_file is None
+    assert final_result.startswith("finished\n\n🔁 Replayed 1/1 steps")
+    assert session.agent is None and not session.running
+
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+
+    test_find_replay_element()
+    test_replay_without_llm(pathlib.Path(tempfile.mkdtemp()))
+    test_replay_reports_url_mismatch(pathlib.Path(tempfile.mkdtemp()))
+    test_replay_does_not_repeat_executed_actions(pathlib.Path(tempfile.mkdtemp()))
+    test_replay_runner_uses_session_browser(pathlib.Path(tempfile.mkdtemp()))
@@ -0,0 +1,77 @@
+import asyncio
+import sys
+
+sys.path.append(".")
+
+
+class FakeLLM:
+    """记录调用次数的模型"""
+
+    def __init__(self, temperature=0.0):
+        self.model_name = "fake-model"
+        self.temperature = temperature
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        from langchain_core.messages import AIMessage
+
+        self.calls += 1
+        message = AIMessage(content=f"answer {self.calls}")
+        message.reasoning_content = "because"
+        return message
+
+
+def test_cached_ainvoke(tmp_path):
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    from src.utils.llm_cache import LLMResponseCache, cached_ainvoke
+
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite"), ttl=60)
+    llm = FakeLLM()
+    messages = [SystemMessage(content="plan"), HumanMessage(content="Current date and time: 2025-01-01 10:00\ntask")]
+    first = asyncio.run(cached_ainvoke(llm, messages, cache=cache))
+    # 只有时间不同的消息命中缓存
+    later = [messages[0], HumanMessage(content="Current date and time: 2025-01-02 11:30\ntask  ")]
+    second = asyncio.run(cached_ainvoke(llm, later, cache=cache))
+    assert llm.calls == 1
+    assert second.content == first.content and second.reasoning_content == "because"
+
+    # 重新打开数据库后仍可命中
+    reopened = LLMResponseCache(str(tmp_path / "llm_cache.sqlite"), ttl=60)
+    assert asyncio.run(cached_ainvoke(llm, messages, cache=reopened)).content == "answer 1"
+
+    # 消息不同或温度不为0时调用模型
+    asyncio.run(cached_ainvoke(llm, [HumanMessage(content="other")], cache=cache))
+    assert llm.calls == 2
+    hot = FakeLLM(temperature=0.7)
+    asyncio.run(cached_ainvoke(hot, messages, cache=cache))
+    asyncio.run(cached_ainvoke(hot, messages, cache=cache))
+    assert hot.calls == 2
+
+    expired = LLMResponseCache(str(tmp_path / "llm_cache.sqlite"), ttl=0)
+    asyncio.run(cached_ainvoke(llm, messages, cache=expired))
+    assert llm.calls == 3
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    from langchain_core.messages import AIMessage
+
+    from src.utils.llm_cache import LLMResponseCache
+
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite"), ttl=60, max_bytes=200)
+    for key in ["a", "b"]:
+        cache.put(key, "fake-model", AIMessage(content=key * 40))
+    # 访问a后，b成为最久未使用
+    assert cache.get("a") is not None
+    cache.put("c", "fake-model", AIMessage(content="c" * 40))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert len(cache) == 2
+
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+
+    test_cached_ainvoke(pathlib.Path(tempfile.mkdtemp()))
+    test_cache_evicts_least_recently_used(pathlib.Path(tempfile.mkdtemp()))
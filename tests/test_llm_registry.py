@@ -0,0 +1,116 @@
+import asyncio
+import sys
+
+sys.path.append(".")
+
+
+def test_registry_reuses_and_evicts():
+    from src.utils.llm_registry import LLMClientRegistry
+
+    created = []
+
+    def factory():
+        created.append(object())
+        return created[-1]
+
+    async def run():
+        registry = LLMClientRegistry(idle_timeout=600, max_size=2)
+        first = registry.get("a", factory)
+        assert registry.get("a", factory) is first
+        registry.get("b", factory)
+        registry.get("c", factory)
+        # 超出容量时淘汰最久未使用的客户端
+        assert len(registry) == 2
+        assert registry.get("a", factory) is not first
+
+        registry.idle_timeout = 0
+        await asyncio.sleep(0.01)
+        registry.get("d", factory)
+        assert len(registry) == 1
+        return registry
+
+    registry = asyncio.run(run())
+    last = created[-1]
+
+    async def get_again():
+        return registry.get("d", factory)
+
+    # 不同的事件循环不共享客户端（连接池绑定事件循环）
+    assert asyncio.run(get_again()) is not last
+    # 没有运行中的事件循环时不缓存
+    assert registry.get("d", factory) is created[-1]
+    assert registry.get("d", factory) is not created[-2]
+
+
+def test_get_llm_model_reuses_clients():
+    from src.utils import utils
+
+    async def run():
+        kwargs = dict(model_name="gpt-4o", temperature=0.5, base_url="http://localhost:1/v1", api_key="sk-test")
+        llm = utils.get_llm_model(provider="openai", **kwargs)
+        assert utils.get_llm_model(provider="openai", **kwargs) is llm
+        assert utils.get_llm_model(provider="openai", **{**kwargs, "temperature": 0.2}) is not llm
+        assert utils.get_llm_model(provider="openai", **{**kwargs, "api_key": "sk-other"}) is not llm
+        assert llm.http_async_client is not None
+
+    asyncio.run(run())
+
+
+def test_evicted_client_stays_usable():
+    from src.utils.llm_registry import LLMClientRegistry, create_http_async_client
+
+    # 提前创建客户端，创建耗时不计入下面很短的空闲超时
+    clients = [type("FakeLLM", (), {"http_async_client": create_http_async_client()})() for _ in range(4)]
+
+    def factory():
+        return clients.pop()
+
+    async def run():
+        registry = LLMClientRegistry(idle_timeout=600, max_size=1)
+        held = registry.get("a", factory)
+        registry.get("b", factory)
+        # 被淘汰的客户端仍被任务持有，连接池不能被关闭
+        assert len(registry) == 1
+        await asyncio.sleep(0)
+        assert not held.http_async_client.is_closed
+
+        # 发送请求会刷新最近使用时间，长时间运行的任务不会被当作空闲
+        registry.idle_timeout = 0.05
+        registry.max_size = 2
+        busy = registry.get("c", factory)
+        await asyncio.sleep(0.1)
+        for hook in busy.http_async_client.event_hooks["request"]:
+            await hook(None)
+        registry.get("d", factory)
+        assert registry.get("c", factory) is busy
+
+    asyncio.run(run())
+
+
+def test_deepseek_reasoner_ainvoke_is_async():
+    import httpx
+    from langchain_core.messages import HumanMessage
+
+    from src.utils.llm import DeepSeekR1ChatOpenAI
+
+    async def handler(request):
+        return httpx.Response(200, json={
+            "id": "1", "object": "chat.completion", "created": 0, "model": "deepseek-reasoner",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "answer", "reasoning_content": "because"}}],
+        })
+
+    # 请求走异步连接池，而不是同步客户端
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    llm = DeepSeekR1ChatOpenAI(model="deepseek-reasoner", base_url="http://deepseek.test/v1", api_key="key",
+                               http_async_client=http_client)
+    llm.client = None
+    message = asyncio.run(llm.ainvoke([HumanMessage(content="hi")]))
+    assert message.content == "answer" and message.reasoning_content == "because"
+
+
+if __name__ == "__main__":
+    test_registry_reuses_and_evicts()
+    test_get_llm_model_reuses_clients()
+    test_evicted_client_stays_usable()
+    test_deepseek_reasoner_ainvoke_is_async()
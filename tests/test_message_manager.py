@@ -0,0 +1,234 @@
+import asyncio
+import json
+import sys
+
+sys.path.append(".")
+
+
+def _make_manager(max_input_tokens, message_context=None):
+    from browser_use.agent.message_manager.views import MessageManagerState
+    from langchain_core.messages import SystemMessage
+
+    from src.agent.custom_message_manager import CustomMessageManager, CustomMessageManagerSettings
+
+    return CustomMessageManager(
+        task="find the weather",
+        system_message=SystemMessage(content="You are a browser agent."),
+        settings=CustomMessageManagerSettings(max_input_tokens=max_input_tokens, message_context=message_context),
+        state=MessageManagerState(),
+    )
+
+
+def _state_message(step):
+    from langchain_core.messages import HumanMessage
+
+    return HumanMessage(content=[
+        {"type": "text", "text": f"Current url: https://example.com/{step} " + "x" * 300},
+        {"type": "image_url", "image_url": {"url": "data:image/png;base64,AAAA"}},
+    ])
+
+
+def _model_output(step):
+    from langchain_core.messages import AIMessage
+
+    return AIMessage(content=json.dumps({"current_state": {"evaluation_previous_goal": f"Success {step}",
+                                                           "important_contents": "",
+                                                           "thought": "",
+                                                           "next_goal": f"open page {step + 1}"},
+                                         "action": []}))
+
+
+def test_screenshots_replaced_before_dropping():
+    from src.agent.custom_message_manager import SCREENSHOT_PLACEHOLDER
+
+    manager = _make_manager(max_input_tokens=1200)
+    for step in range(3):
+        manager._add_message_with_tokens(_state_message(step))
+    manager.cut_messages()
+
+    history = manager.state.history
+    # 只替换旧截图即可满足预算，不删除消息，最新状态保留截图
+    assert len(history.messages) == 4
+    assert history.messages[1].message.content[1]["text"] == SCREENSHOT_PLACEHOLDER
+    assert "image_url" in history.messages[-1].message.content[1]
+    assert history.current_tokens == sum(m.metadata.tokens for m in history.messages)
+    assert history.current_tokens <= 1200
+
+
+def test_old_steps_dropped_and_summarized():
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    from src.agent.custom_message_manager import COMPACTED_HISTORY_HEADER
+
+    manager = _make_manager(max_input_tokens=1200, message_context="use metric units")
+    for step in range(10):
+        manager._add_message_with_tokens(_model_output(step))
+        manager._add_message_with_tokens(HumanMessage(content=f"Action result: opened page {step}"))
+    manager._add_message_with_tokens(_state_message(10))
+    manager.cut_messages()
+
+    messages = manager.state.history.messages
+    # 系统提示与上下文消息固定不动
+    assert isinstance(messages[0].message, SystemMessage)
+    assert "use metric units" in messages[1].message.content
+    summary = messages[2].message.content
+    assert summary.startswith(COMPACTED_HISTORY_HEADER)
+    assert "next goal: open page 1" in summary
+    assert "Action result: opened page 0" in summary
+    assert "image_url" in messages[-1].message.content[1]
+    assert manager.state.history.current_tokens <= 1200
+
+    # 再次压缩时合并之前的摘要
+    for step in range(10, 20):
+        manager._add_message_with_tokens(_model_output(step))
+    manager._add_message_with_tokens(_state_message(20))
+    manager.cut_messages()
+    summary = manager.state.history.messages[2].message.content
+    assert summary.startswith(COMPACTED_HISTORY_HEADER)
+    assert summary.count(COMPACTED_HISTORY_HEADER) == 1
+    assert "next goal: open page 11" in summary
+    assert manager.state.history.current_tokens <= 1200
+
+
+
+def test_elements_reference_kept_once():
+    from browser_use.agent.message_manager.views import MessageManagerState
+    from browser_use.browser.views import BrowserState
+    from browser_use.dom.views import DOMElementNode
+    from langchain_core.messages import SystemMessage
+
+    from src.agent.custom_message_manager import CustomMessageManager, CustomMessageManagerSettings
+    from src.agent.custom_prompts import CustomAgentMessagePrompt
+    from src.agent.custom_views import CustomAgentStepInfo
+    from src.utils.element_serializer import ELEMENTS_REFERENCE_HEADER, ElementSerializationSettings
+
+    def state(labels):
+        body = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="/body", attributes={}, children=[])
+        for i, label in enumerate(labels):
+            body.children.append(DOMElementNode(is_visible=True, parent=body, tag_name="button",
+                                                xpath=f"/body/button[{i + 1}]", attributes={"aria-label": label},
+                                                children=[], highlight_index=i + 1))
+        return BrowserState(element_tree=body, selector_map={}, url="https://example.com", title="", tabs=[])
+
+    manager = CustomMessageManager(
+        task="click buttons",
+        system_message=SystemMessage(content="You are a browser agent."),
+        settings=CustomMessageManagerSettings(include_attributes=["aria-label"],
+                                              agent_prompt_class=CustomAgentMessagePrompt,
+                                              element_settings=ElementSerializationSettings(diff_mode=True)),
+        state=MessageManagerState(),
+    )
+    labels = [f"button {i}" for i in range(10)]
+    for step in range(3):
+        step_info = CustomAgentStepInfo(step_number=step + 1, max_steps=10, task="click buttons", add_infos="",
+                                        memory="")
+        labels[step] = f"pressed {step}"
+        manager.add_state_message(state(labels), step_info=step_info)
+        manager._remove_state_message_by_index(-1)
+        if step == 0:
+            # 状态消息中只有变化（这里是参考列表本身）
+            assert manager.state.history.messages[-1].message.content.startswith(ELEMENTS_REFERENCE_HEADER)
+
+    references = [m for m in manager.state.history.messages
+                  if isinstance(m.message.content, str) and m.message.content.startswith(ELEMENTS_REFERENCE_HEADER)]
+    assert len(references) == 1
+    assert "[1]<button pressed 0/>" in references[0].message.content
+    assert manager.state.history.current_tokens == sum(m.metadata.tokens for m in manager.state.history.messages)
+
+
+def test_unchanged_screenshot_only_refers_to_kept_image():
+    import base64
+    import io
+
+    from browser_use.agent.message_manager.views import MessageManagerState
+    from browser_use.browser.views import BrowserState
+    from browser_use.dom.views import DOMElementNode
+    from langchain_core.messages import SystemMessage
+    from PIL import Image
+
+    from src.agent.custom_message_manager import CustomMessageManager, CustomMessageManagerSettings
+    from src.agent.custom_prompts import CustomAgentMessagePrompt
+    from src.agent.custom_views import CustomAgentStepInfo
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "white").save(buffer, format="PNG")
+    body = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="/body", attributes={}, children=[])
+    state = BrowserState(element_tree=body, selector_map={}, url="https://example.com", title="", tabs=[],
+                         screenshot=base64.b64encode(buffer.getvalue()).decode())
+    manager = CustomMessageManager(
+        task="read the page",
+        system_message=SystemMessage(content="You are a browser agent."),
+        settings=CustomMessageManagerSettings(max_input_tokens=600, agent_prompt_class=CustomAgentMessagePrompt),
+        state=MessageManagerState(),
+    )
+    step_info = CustomAgentStepInfo(step_number=1, max_steps=10, task="read the page", add_infos="", memory="")
+
+    manager.add_state_message(state, step_info=step_info, use_vision=True)
+    assert manager.screenshot_in_history()
+    # 未开启跳过时，step 在模型调用后删除状态消息，截图随之消失，不能再引用它
+    manager._remove_state_message_by_index(-1)
+    assert not manager.screenshot_in_history()
+
+    # 保留状态消息时，被引用的截图在压缩历史时不会被替换
+    manager.add_state_message(state, step_info=step_info, use_vision=True)
+    manager.add_state_message(state, step_info=step_info, use_vision=True, screenshot_unchanged=True)
+    manager.cut_messages()
+    assert manager.screenshot_in_history()
+
+
+def test_unchanged_screenshot_skipped_across_steps():
+    import base64
+    import io
+
+    from browser_use.browser.views import BrowserState
+    from browser_use.dom.views import DOMElementNode
+    from langchain_core.messages import AIMessage
+    from PIL import Image
+
+    from conftest import make_agent
+    from src.agent.custom_views import CustomAgentStepInfo
+    from src.utils.screenshot_processing import ScreenshotSettings
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "white").save(buffer, format="PNG")
+    body = DOMElementNode(is_visible=True, parent=None, tag_name="body", xpath="/body", attributes={}, children=[])
+    state = BrowserState(element_tree=body, selector_map={}, url="https://example.com", title="", tabs=[],
+                         screenshot=base64.b64encode(buffer.getvalue()).decode())
+    output = json.dumps({"current_state": {"evaluation_previous_goal": "", "important_contents": "",
+                                           "thought": "", "next_goal": "scroll"},
+                         "action": [{"scroll_down": {}}]})
+
+    class FakeLLM:
+        model_name = "fake-model"
+
+        def __init__(self):
+            self.calls = []
+
+        async def ainvoke(self, messages):
+            self.calls.append([message.model_copy(deep=True) for message in messages])
+            return AIMessage(content=output)
+
+    def images(messages):
+        return sum(1 for message in messages if isinstance(message.content, list)
+                   for item in message.content if isinstance(item, dict) and "image_url" in item)
+
+    llm = FakeLLM()
+    agent = make_agent(llm, pages=[(state.url, state)],
+                       screenshot_settings=ScreenshotSettings(skip_unchanged=True, viewport=(64, 64)))
+    step_info = CustomAgentStepInfo(step_number=1, max_steps=10, task="test", add_infos="", memory="")
+
+    asyncio.run(agent.step(step_info))
+    asyncio.run(agent.step(step_info))
+    # 第二步画面未变化，只发送说明，模型仍能看到上一步保留下来的截图
+    assert agent.state.screenshots_skipped == 1
+    assert images(llm.calls[0]) == 1 and images(llm.calls[1]) == 1
+    assert "the screen looks the same" in llm.calls[1][-1].content
+    assert agent.message_manager.screenshot_in_history()
+
+
+if __name__ == "__main__":
+    test_screenshots_replaced_before_dropping()
+    test_old_steps_dropped_and_summarized()
+    test_elements_reference_kept_once()
+    test_unchanged_screenshot_only_refers_to_kept_image()
+    test_unchanged_screenshot_skipped_across_steps()
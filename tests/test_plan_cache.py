@@ -0,0 +1,121 @@
+import sys
+from types import SimpleNamespace
+
+sys.path.append(".")
+
+
+def _state(url, elements):
+    """elements 为 (index, tag, attributes) 列表"""
+    from browser_use.dom.views import DOMElementNode
+
+    selector_map = {index: DOMElementNode(is_visible=True, parent=None, tag_name=tag, xpath=f"/{tag}[{index}]",
+                                          attributes=attributes, children=[], highlight_index=index)
+                    for index, tag, attributes in elements}
+    return SimpleNamespace(url=url, selector_map=selector_map)
+
+
+def _output_type():
+    from src.agent.custom_views import CustomAgentOutput
+    from src.controller.custom_controller import CustomController
+
+    return CustomAgentOutput.type_with_custom_actions(CustomController().registry.create_action_model())
+
+
+def _output(output_type, actions):
+    brain = {"evaluation_previous_goal": "", "important_contents": "", "thought": "", "next_goal": "search"}
+    return output_type.model_validate({"current_state": brain, "action": actions})
+
+
+def test_key_ignores_variable_parts():
+    from src.agent.plan_cache import PlanCache, url_pattern
+
+    assert url_pattern("https://www.shop.com/item/12345?id=7&ref=a") == url_pattern("https://shop.com/item/999?ref=b&id=8")
+    assert url_pattern("https://shop.com/item/1") != url_pattern("https://shop.com/cart/1")
+
+    elements = [(1, "input", {"name": "q", "value": "phones"}), (2, "button", {"type": "submit"})]
+    key = PlanCache.make_key("Search  phones", _state("https://shop.com/", elements))
+    # 输入框的值和任务中的空白不影响指纹
+    other = [(1, "input", {"name": "q", "value": "tv"}), (2, "button", {"type": "submit"})]
+    assert PlanCache.make_key("search phones", _state("https://shop.com", other)) == key
+    # 页面结构或上一步动作不同时使用不同的键
+    changed = [(1, "input", {"name": "query"}), (2, "button", {"type": "submit"})]
+    assert PlanCache.make_key("search phones", _state("https://shop.com", changed)) != key
+    assert PlanCache.make_key("search phones", _state("https://shop.com", elements),
+                              [{"go_to_url": {"url": "https://shop.com"}}]) != key
+
+
+def test_plan_reused_after_enough_successes(tmp_path):
+    from src.agent.plan_cache import PlanCache
+
+    output_type = _output_type()
+    cache = PlanCache(str(tmp_path / "plans.sqlite"), min_successes=2, min_confidence=0.8)
+    plan = _output(output_type, [{"input_text": {"index": 1, "text": "phones"}}, {"click_element": {"index": 2}}])
+
+    cache.record_success("k", plan)
+    assert cache.lookup("k", output_type) is None
+    cache.record_success("k", plan)
+    cached = cache.lookup("k", output_type)
+    assert cached.action[1].get_index() == 2
+
+    # 持久化后可重新加载
+    reloaded = PlanCache(str(tmp_path / "plans.sqlite"))
+    assert reloaded.lookup("k", output_type) is not None
+
+    # 模型给出不同的动作时替换旧计划，需要重新积累成功次数
+    other = _output(output_type, [{"click_element": {"index": 3}}])
+    cache.record_success("k", other)
+    assert cache.lookup("k", output_type) is None
+
+    # 包含 done 的计划不缓存
+    done = _output(output_type, [{"done": {"text": "finished", "success": True}}])
+    cache.record_success("d", done)
+    cache.record_success("d", done)
+    assert cache.lookup("d", output_type) is None
+
+
+def test_plan_invalidated_on_failure(tmp_path):
+    from src.agent.plan_cache import PlanCache
+
+    output_type = _output_type()
+    cache = PlanCache(str(tmp_path / "plans.sqlite"), min_successes=2, min_confidence=0.8, max_entries=2)
+    plan = _output(output_type, [{"click_element": {"index": 2}}])
+    for _ in range(4):
+        cache.record_success("k", plan)
+    # 其他动作的失败不影响缓存的计划
+    cache.record_failure("k", _output(output_type, [{"click_element": {"index": 5}}]))
+    cache.record_failure("k", plan)
+    assert cache.lookup("k", output_type) is not None
+    cache.record_failure("k", plan)
+    assert cache.lookup("k", output_type) is None and len(cache) == 0
+
+    # 超出容量时淘汰最久未使用的计划
+    for key in ["a", "b", "c"]:
+        cache.record_success(key, plan)
+    assert len(cache) == 2
+
+
+def test_processes_share_the_cache(tmp_path):
+    from src.agent.plan_cache import PlanCache
+
+    output_type = _output_type()
+    plan = _output(output_type, [{"click_element": {"index": 2}}])
+    # 两个进程各自打开同一个缓存文件，互不覆盖对方的计划
+    first = PlanCache(str(tmp_path / "plans.sqlite"), min_successes=2)
+    second = PlanCache(str(tmp_path / "plans.sqlite"), min_successes=2)
+    first.record_success("a", plan)
+    second.record_success("b", plan)
+    first.record_success("a", plan)
+    second.record_success("a", plan)
+    assert len(first) == 2 and len(second) == 2
+    assert first.lookup("b", output_type) is None
+    assert second.lookup("a", output_type) is not None
+
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+
+    test_key_ignores_variable_parts()
+    test_plan_reused_after_enough_successes(pathlib.Path(tempfile.mkdtemp()))
+    test_plan_invalidated_on_failure(pathlib.Path(tempfile.mkdtemp()))
+    test_processes_share_the_cache(pathlib.Path(tempfile.mkdtemp()))
@@ -0,0 +1,99 @@
+import asyncio
+import sys
+
+sys.path.append(".")
+
+
+def test_duplicate_frames_are_skipped():
+    from src.browser.screencast import ScreencastStream
+
+    async def run():
+        stream = ScreencastStream(browser_context=None)
+        stream._attach = lambda: asyncio.sleep(0)
+        stream._on_frame({"sessionId": 1, "data": "frame-a"})
+        assert await stream.next_frame(timeout=0.1) == "frame-a"
+        stream._on_frame({"sessionId": 2, "data": "frame-a"})
+        assert await stream.next_frame(timeout=0.05) is None
+
+    asyncio.run(run())
+
+
+def test_backlog_lowers_quality_and_rate():
+    from src.browser.screencast import ScreencastStream
+
+    async def run():
+        stream = ScreencastStream(browser_context=None, quality=70)
+        stream._attach = lambda: asyncio.sleep(0)
+        # consumer only pulls once per ADAPT_INTERVAL frames
+        for i in range(ScreencastStream.ADAPT_INTERVAL):
+            stream._on_frame({"sessionId": i, "data": f"frame-{i}"})
+        assert await stream.next_frame(timeout=0.1) == f"frame-{ScreencastStream.ADAPT_INTERVAL - 1}"
+        assert stream.quality == 60
+        assert stream.every_nth_frame == 2
+
+        # consumer keeps up again
+        for i in range(ScreencastStream.ADAPT_INTERVAL):
+            stream._on_frame({"sessionId": i, "data": f"next-{i}"})
+            await stream.next_frame(timeout=0.1)
+        assert stream.quality == 65
+        assert stream.every_nth_frame == 1
+
+    asyncio.run(run())
+
+
+def test_frame_cache_freshness():
+    from src.browser.frame_cache import FrameCache
+
+    cache = FrameCache()
+    assert cache.latest() is None
+    frame = cache.publish("abc", url="https://example.com/", format="png")
+    assert frame.data_url == "data:image/png;base64,abc"
+    assert cache.latest(max_age=5, url="https://example.com/") is frame
+    # 页面已跳转或画面过期时不复用
+    assert cache.latest(url="https://example.org/") is None
+    assert cache.latest(max_age=-1) is None
+
+    # 带元素高亮的画面不用于实时画面
+    highlighted = cache.publish("def", url="https://example.com/", highlighted=True)
+    assert cache.latest() is highlighted
+    assert cache.latest(url="https://example.com/", highlighted=False) is frame
+
+
+def test_live_view_reuses_agent_frame():
+    from types import SimpleNamespace
+
+    from browser_use.browser.context import BrowserContextConfig
+
+    from src.browser.frame_cache import FrameCache
+    from src.utils.utils import capture_frame
+
+    class Page:
+        url = "https://example.com/"
+        screenshots = 0
+
+        async def screenshot(self, **kwargs):
+            Page.screenshots += 1
+            return b"live"
+
+    # 默认配置下agent截图带元素高亮
+    config = BrowserContextConfig()
+    browser_context = SimpleNamespace(session=SimpleNamespace(context=SimpleNamespace(pages=[Page()])),
+                                      frame_cache=FrameCache(), config=config)
+    agent_frame = browser_context.frame_cache.publish("agent", url=Page.url, highlighted=config.highlight_elements)
+
+    async def run():
+        # 实时画面直接复用agent的截图，不再额外截图
+        assert await capture_frame(browser_context) is agent_frame
+        assert Page.screenshots == 0
+        # 不显示高亮时自己截图
+        frame = await capture_frame(browser_context, show_highlights=False)
+        assert frame.format == "jpeg" and not frame.highlighted and Page.screenshots == 1
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_duplicate_frames_are_skipped()
+    test_backlog_lowers_quality_and_rate()
+    test_frame_cache_freshness()
+    test_live_view_reuses_agent_frame()
@@ -0,0 +1,86 @@
+import base64
+import io
+import sys
+
+sys.path.append(".")
+
+
+def _png_b64(width, height, mode="RGBA"):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height), (200, 30, 30, 255) if mode == "RGBA" else (200, 30, 30)).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def _decode(data):
+    from PIL import Image
+
+    return Image.open(io.BytesIO(base64.b64decode(data)))
+
+
+def test_downscale_and_reencode():
+    from src.utils.screenshot_processing import ScreenshotSettings, process_screenshot
+
+    settings = ScreenshotSettings(max_width=640, max_height=640, format="jpeg", quality=60)
+    data, image_format = process_screenshot(_png_b64(1280, 1100), settings)
+    image = _decode(data)
+    assert image_format == "jpeg"
+    assert image.format == "JPEG"
+    # 保持宽高比缩放
+    assert image.size == (640, 550)
+
+
+def test_crop_to_viewport_and_grayscale():
+    from src.utils.screenshot_processing import ScreenshotSettings, process_screenshot
+
+    # 高DPI截图（2倍）且比视口高
+    settings = ScreenshotSettings(max_width=4000, max_height=4000, format="png", grayscale=True,
+                                  viewport=(1280, 1100))
+    data, image_format = process_screenshot(_png_b64(2560, 3000), settings)
+    image = _decode(data)
+    assert image_format == "png"
+    assert image.size == (2560, 2200)
+    assert image.mode == "L"
+
+
+def test_unchanged_png_and_invalid_input():
+    from src.utils.screenshot_processing import ScreenshotSettings, process_screenshot
+
+    original = _png_b64(800, 600)
+    assert process_screenshot(original, ScreenshotSettings(format="png")) == (original, "png")
+    assert process_screenshot(original, None) == (original, "png")
+    assert process_screenshot("not an image", ScreenshotSettings()) == ("not an image", "png")
+
+
+
+def test_perceptual_hash_ignores_small_changes():
+    from PIL import Image, ImageDraw
+
+    from src.utils.screenshot_processing import hash_distance, perceptual_hash
+
+    def page(text, highlight=False):
+        image = Image.new("RGB", (1280, 1100), "white")
+        draw = ImageDraw.Draw(image)
+        for i in range(10):
+            draw.rectangle((40, 40 + i * 100, 1200, 80 + i * 100), fill=(30 + i * 20, 60, 120))
+        draw.text((60, 1050), text, fill="black")
+        if highlight:
+            draw.rectangle((0, 0, 640, 1100), fill=(250, 200, 0))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    base = perceptual_hash(page("hello"))
+    # 输入少量文字：画面几乎不变
+    assert hash_distance(base, perceptual_hash(page("hello world"))) <= 4
+    # 大面积变化：画面明显不同
+    assert hash_distance(base, perceptual_hash(page("hello", highlight=True))) > 4
+    assert perceptual_hash("not an image") is None
+
+
+if __name__ == "__main__":
+    test_downscale_and_reencode()
+    test_crop_to_viewport_and_grayscale()
+    test_unchanged_png_and_invalid_input()
+    test_perceptual_hash_ignores_small_changes()
@@ -0,0 +1,67 @@
+import asyncio
+import sys
+
+sys.path.append(".")
+
+
+def test_sessions_are_isolated():
+    from src.session_manager import SessionManager
+
+    manager = SessionManager(max_concurrent_sessions=2, admission_timeout=1, idle_timeout=60)
+    session_a = manager.get_session("a")
+    session_b = manager.get_session("b")
+
+    session_a.agent_state.set_user_control_active(True)
+    assert session_a.agent_state.is_user_control_active()
+    assert not session_b.agent_state.is_user_control_active()
+    assert manager.get_session("a") is session_a
+
+
+def test_child_state_delegates_control_flags():
+    from src.agent.custom_views import CustomAgentState
+    from src.utils.agent_state import AgentState
+
+    control = AgentState()
+    child_1 = CustomAgentState(parent=control)
+    child_2 = CustomAgentState(parent=control)
+
+    control.request_stop()
+    assert child_1.is_stop_requested() and child_2.is_stop_requested()
+    # run data stays per agent
+    child_1.n_steps += 1
+    assert child_2.n_steps == 0
+    assert child_1.history is not child_2.history
+
+
+def test_admission_limit():
+    from src.session_manager import SessionBusyError, SessionLimitError, SessionManager
+
+    async def run():
+        manager = SessionManager(max_concurrent_sessions=1, admission_timeout=0.1, idle_timeout=60)
+        async with manager.admit("a"):
+            try:
+                async with manager.admit("a"):
+                    pass
+                assert False, "same session admitted twice"
+            except SessionBusyError:
+                pass
+
+            try:
+                async with manager.admit("b"):
+                    pass
+                assert False, "admitted over the concurrency cap"
+            except SessionLimitError:
+                pass
+            assert not manager.get_session("b").running
+
+        async with manager.admit("b") as session:
+            assert session.running
+        assert manager.running_count == 0
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_sessions_are_isolated()
+    test_child_state_delegates_control_flags()
+    test_admission_limit()
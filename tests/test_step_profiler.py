@@ -0,0 +1,61 @@
+import json
+import sys
+import time
+
+sys.path.append(".")
+
+
+def test_spans_aggregated_per_run(tmp_path):
+    from src.utils.step_profiler import HistogramSink, JsonLinesSink, StepProfiler
+
+    class BrokenSink:
+        def record(self, span):
+            raise RuntimeError("sink down")
+
+    histogram = HistogramSink(group_by=("site", "model"))
+    path = tmp_path / "profile.jsonl"
+    profiler = StepProfiler(sinks=[JsonLinesSink(str(path)), histogram, BrokenSink()], labels={"model": "gpt-4o"})
+    for step in range(1, 4):
+        profiler.step = step
+        with profiler.span("get_state"):
+            # 在 span 内设置的标签同样生效
+            profiler.labels["site"] = "example.com"
+        with profiler.span("llm"):
+            time.sleep(0.01)
+
+    stats = profiler.run_stats.summary()
+    # 按总耗时从高到低排列
+    assert list(stats) == [("llm",), ("get_state",)]
+    assert stats[("llm",)]["count"] == 3 and stats[("llm",)]["p50"] >= 0.01
+    assert ("llm", "example.com", "gpt-4o") in histogram.summary()
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(lines) == 6
+    assert lines[-1]["name"] == "llm" and lines[-1]["step"] == 3 and lines[-1]["labels"]["site"] == "example.com"
+
+    table = profiler.format_summary().splitlines()
+    assert table[0].startswith("| phase |") and table[2].startswith("| llm | 3 |")
+
+
+def test_sinks_from_env(monkeypatch, tmp_path):
+    from src.utils.step_profiler import JsonLinesSink, LoggingSink, get_latency_histogram, get_profiler_sinks
+
+    monkeypatch.setenv("AGENT_PROFILE_SINKS", "log, jsonl,histogram")
+    monkeypatch.setenv("AGENT_PROFILE_PATH", str(tmp_path / "profile.jsonl"))
+    sinks = get_profiler_sinks()
+    assert isinstance(sinks[0], LoggingSink) and isinstance(sinks[1], JsonLinesSink)
+    assert sinks[2] is get_latency_histogram()
+
+    monkeypatch.setenv("AGENT_PROFILE_SINKS", "")
+    assert get_profiler_sinks() == []
+
+
+if __name__ == "__main__":
+    import pathlib
+    import tempfile
+
+    import pytest
+
+    test_spans_aggregated_per_run(pathlib.Path(tempfile.mkdtemp()))
+    with pytest.MonkeyPatch.context() as mp:
+        test_sinks_from_env(mp, pathlib.Path(tempfile.mkdtemp()))
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import sys
+import time
+
+sys.path.append(".")
+
+from conftest import make_agent
+
+OUTPUT = json.dumps({
+    "current_state": {"evaluation_previous_goal": "Success", "important_contents": "",
+                      "thought": "fill the form [1] {2}", "next_goal": "submit"},
+    "action": [{"scroll_down": {}}, {"go_back": {}}, {"done": {"text": "finished", "success": True}}],
+})
+
+
+def test_parser_yields_actions_as_they_complete():
+    from src.utils.stream_json import StreamingActionParser
+
+    parser = StreamingActionParser()
+    text = f"```json\n{OUTPUT}\n```"
+    completed = []
+    for i in range(0, len(text), 5):
+        for action in parser.feed(text[i:i + 5]):
+            # 记录每个action完成时已接收的文本长度
+            completed.append((action, len(parser.text)))
+    assert [action for action, _ in completed] == json.loads(OUTPUT)["action"]
+    assert completed[0][1] < len(text) - 40
+
+
+class FakeStreamingLLM:
+    """逐块输出模型回复，每块之间有延迟"""
+
+    def __init__(self, text, chunk_size=8, delay=0.01):
+        self.text = text
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.finished_at = None
+
+    async def astream(self, messages):
+        from langchain_core.messages import AIMessageChunk
+
+        for i in range(0, len(self.text), self.chunk_size):
+            await asyncio.sleep(self.delay)
+            yield AIMessageChunk(content=self.text[i:i + self.chunk_size])
+        self.finished_at = time.time()
+
+
+def test_first_action_runs_while_model_is_generating():
+    llm = FakeStreamingLLM(OUTPUT)
+    agent = make_agent(llm)
+
+    model_output, results = asyncio.run(agent.get_next_action_streaming([]))
+
+    assert [next(iter(action)) for action in agent.controller.executed] == ["scroll_down", "go_back", "done"]
+    # 第一个动作在模型输出结束之前就已执行
+    assert agent.controller.executed_at[0] < llm.finished_at
+    assert len(model_output.action) == 3
+    assert results[-1].is_done
+    # 完整的回复写入消息历史
+    assert agent.message_manager.state.history.messages[-1].message.content == OUTPUT
+
+
+def test_actions_and_model_call_are_timed():
+    llm = FakeStreamingLLM(OUTPUT)
+    agent = make_agent(llm)
+
+    asyncio.run(agent.get_next_action_streaming([]))
+    # 模型调用、解析和每个动作都有各自的耗时记录
+    phases = {key[0] for key in agent.profiler.run_stats.summary()}
+    assert {"llm", "parse", "action:scroll_down", "action:go_back", "action:done"} <= phases
+
+    results = asyncio.run(agent.multi_act(agent.AgentOutput.model_validate(json.loads(OUTPUT)).action))
+    assert [result.extracted_content for result in results] == ["scroll_down", "go_back", "done"]
+    assert agent.profiler.run_stats.summary()[("action:go_back",)]["count"] == 2
+
+
+class FailingStreamingLLM(FakeStreamingLLM):
+    """输出一部分后连接中断"""
+
+    def __init__(self, text, fail_after, **kwargs):
+        super().__init__(text, **kwargs)
+        self.fail_after = fail_after
+
+    async def astream(self, messages):
+        sent = 0
+        async for chunk in super().astream(messages):
+            yield chunk
+            sent += len(chunk.content)
+            if sent > self.fail_after:
+                raise ConnectionError("stream interrupted")
+
+
+def test_executed_actions_survive_a_failed_stream():
+    import pytest
+
+    # 第一个动作完整输出之后中断
+    llm = FailingStreamingLLM(OUTPUT, fail_after=OUTPUT.index('{"go_back"'))
+    agent = make_agent(llm)
+    agent.state.last_result = []
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(agent.get_next_action_streaming([]))
+    # 已执行的动作结果保留下来，下一步知道页面已经变化
+    assert [next(iter(action)) for action in agent.controller.executed] == ["scroll_down"]
+    assert [result.extracted_content for result in agent.state.last_result] == ["scroll_down"]
+
+
+if __name__ == "__main__":
+    test_parser_yields_actions_as_they_complete()
+    test_first_action_runs_while_model_is_generating()
+    test_actions_and_model_call_are_timed()
+    test_executed_actions_survive_a_failed_stream()